@@ -6,7 +6,8 @@ Dashboard Flask - Projeto Integrador IV (PI4v10) - Dengue Sertãozinho
 - Uso: Estatísticas descritivas e visualizações
 
 🤖 MODELO:
-- Arquivo: models/modelo_reglog_otimizado.pkl
+- Arquivo: versão ativa do registro (models/registro/, ver registro_modelos.py);
+  sem versão ativa, models/modelo_reglog_otimizado.pkl
 - Tipo: Regressão Logística otimizada com Optuna
 - Treinamento: 15/11/2025 13:39:45
 - Features: 14 (selecionadas via Feature Importance + Correlação + Chi²)
@@ -21,53 +22,336 @@ Dashboard Flask - Projeto Integrador IV (PI4v10) - Dengue Sertãozinho
 - Usuário fornece 5 sintomas: FEBRE, MIALGIA, CEFALEIA, VOMITO, EXANTEMA
 - Sistema calcula SEVERITY_SCORE e preenche outras 9 features com valores padrão
 - Modelo faz predição com as 14 features completas
+- /api/predict/batch: lote de pacientes (JSON ou CSV) pontuado em uma única matriz N×14
+- /api/modelos: versão ativa e sombra; a sombra é pontuada junto, só para comparação
+- /metrics: latência por rota e por etapa e tempos de carga (Prometheus, ver metricas.py)
+- /api/ingestao: notificações novas acrescentadas sem recarregar o dataset (ver ingestao.py)
+- /api/data/export: linhas de uma visão filtrada em CSV ou Parquet, em streaming (ver exportacao.py)
+- /api/data/serie: séries diárias, por SE e por mês, médias móveis e ano anterior (ver serie_temporal.py)
 '''
 
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, render_template, jsonify, request, Response, g
 import pandas as pd
-import joblib
 import numpy as np
+import hashlib
+import hmac
 import os
+import threading
+import time
+from types import SimpleNamespace
+
+from cubo_agregado import CuboAgregado
+from dados import (
+    CSV_PATH, anexar, anexar_derivadas, assinatura_arquivo, carregar_dataset, derivar_features
+)
+from estatisticas import CacheRespostas
+from exportacao import MIMETYPES, preparar_exportacao
+from indice_bitmap import IndiceBitmap, filtro_do_cubo
+from ingestao import (
+    assinatura_indice, caminho_incrementos, carregar_lotes, ingerir, ler_indice, lotes_validos
+)
+from metricas import (
+    METRICAS_ATIVAS, REQUISICOES, etapa, exportar, iniciar_publicador, registrar_carga,
+    registrar_modelo
+)
+from features_modelo import montar_matriz
+from predicao import MAX_REGISTROS_LOTE, ler_registros, gerar_resposta_lote, identificadores
+from serie_temporal import SerieTemporal
+from registro_modelos import (
+    ComparacaoSombra, assinatura_ponteiros, carregar_legado, carregar_versao, cronometrar,
+    ler_ponteiro, listar_versoes
+)
 
 app = Flask(__name__)
 
 # --- Configurações do Modelo ---
+# O modelo servido vem do registro (registro_modelos.py, ponteiro ativo.json);
+# sem versão ativa, a API serve o modelo legado abaixo
 MODEL_PATH = "models/modelo_reglog_otimizado.pkl"
 SCALER_PATH = "models/scaler_final.pkl"
+CONFIG_MODELO_PATH = "config_modelo.json"
 
-# Features esperadas pelo modelo (14 features selecionadas)
-MODEL_FEATURES = [
-    'DIAS_SINTOMA_NOTIFIC_TEMP', 'TRIMESTRE', 'MES', 'DIAS_SINTOMA_NOTIFIC',
-    'TEM_COMORBIDADE', 'NU_ANO', 'QTD_IGNORADOS', 'SEVERITY_SCORE',
-    'IDADE', 'ANO', 'HEPATOPAT_BIN', 'COMORBIDADE_SCORE',
-    'DIABETES_BIN', 'RENAL_BIN'
-]
+# O endpoint sempre pontuou as features sem normalização; APLICAR_SCALER=1
+# passa a aplicar o StandardScaler do treino (fundido nos pesos do pontuador).
+# Vale só para o modelo legado: versões do registro trazem "aplicar_scaler" nos metadados
+APLICAR_SCALER = os.getenv("APLICAR_SCALER", "0") == "1"
 
-# Features coletadas do usuário (5 sintomas principais)
-USER_INPUT_FEATURES = ['FEBRE', 'MIALGIA', 'CEFALEIA', 'VOMITO', 'EXANTEMA']
+# Intervalo mínimo (segundos) entre verificações dos ponteiros ativo/sombra do registro
+INTERVALO_VERIFICACAO_MODELOS = float(os.getenv("INTERVALO_VERIFICACAO_MODELOS", "5"))
+
+# Modo tabela: as 32 respostas possíveis dos 5 sintomas são pré-computadas na carga
+PREDICAO_TABELA = os.getenv("PREDICAO_TABELA", "1") == "1"
+
+# As 14 features do modelo são montadas por features_modelo.py, o mesmo
+# módulo que o treino usa
 
 # --- Carregamento de Dados ---
 
 # 1. Dataset de Sertãozinho (para estatísticas e visualizações)
-print("Carregando dataset de Sertãozinho para estatísticas...")
-try:
-    df_stats = pd.read_csv("data/df_dengue_tratado.csv")
-    df_stats["DT_NOTIFIC"] = pd.to_datetime(df_stats["DT_NOTIFIC"])
-    df_stats["DT_SIN_PRI"] = pd.to_datetime(df_stats["DT_SIN_PRI"])
-    df_stats["NU_ANO"] = df_stats["DT_NOTIFIC"].dt.year
-    print(f"   ✓ Dataset de estatísticas carregado: {len(df_stats):,} registros")
-except FileNotFoundError:
-    print("ERRO: df_dengue_tratado.csv não encontrado.")
-    df_stats = pd.DataFrame()
-
-# 2. Modelo Preditivo
-print(f"Carregando modelo preditivo de {MODEL_PATH}...")
-try:
-    model = joblib.load(MODEL_PATH)
-    print(f"   ✓ Modelo carregado: {type(model).__name__}")
-except Exception as e:
-    print(f"ERRO ao carregar o modelo: {e}")
-    model = None
+
+# Intervalo mínimo (segundos) entre verificações de troca do CSV em disco (e de lotes novos)
+INTERVALO_VERIFICACAO_DADOS = float(os.getenv("INTERVALO_VERIFICACAO_DADOS", "5"))
+
+# Token do POST /api/ingestao (Authorization: Bearer <token>); sem ele a rota fica desligada
+INGESTAO_TOKEN = os.getenv("INGESTAO_TOKEN")
+
+
+def carregar_estado_dados():
+    '''
+    Carrega o dataset e tudo o que depende dele como um único snapshot.
+
+    Retorna um SimpleNamespace com df_stats, df_derivadas, cubo, bitmaps
+    (índice de filtros), serie (índice temporal), respostas (estatísticas pré-computadas), a assinatura e a versão do CSV e os
+    lotes de ingestão já aplicados. Os handlers pegam `estado_dados` uma
+    vez por request; uma recarga troca a referência inteira, então nenhum
+    request mistura duas versões do dataset.
+    '''
+    print("Carregando dataset de Sertãozinho para estatísticas...")
+    try:
+        # Usa o cache colunar (python dados.py) quando corresponde ao CSV atual
+        inicio = time.perf_counter()
+        df_stats, info_dados = carregar_dataset(CSV_PATH)
+        registrar_carga("dataset", time.perf_counter() - inicio)
+        print(f"   ✓ Dataset de estatísticas carregado ({info_dados['origem']}): {len(df_stats):,} registros")
+        if info_dados["memoria_antes"] is not None:
+            print(f"   ✓ Memória: {info_dados['memoria_antes'] / 1e6:.1f} MB -> "
+                  f"{info_dados['memoria_depois'] / 1e6:.1f} MB (categorias + datas int32)")
+        else:
+            print(f"   ✓ Memória: {info_dados['memoria_depois'] / 1e6:.1f} MB")
+    except FileNotFoundError:
+        print(f"ERRO: {CSV_PATH} não encontrado.")
+        return SimpleNamespace(df_stats=pd.DataFrame(), df_derivadas=pd.DataFrame(), cubo=None,
+                               bitmaps=None, serie=None, respostas=None, assinatura=assinatura_arquivo(CSV_PATH),
+                               versao=None, lotes=0, assinatura_incrementos=None)
+
+    # Features derivadas (mês, faixa etária, hospitalizado) calculadas uma vez: os
+    # handlers só leem df_stats e df_derivadas, nunca escrevem neles
+    inicio = time.perf_counter()
+    df_derivadas = derivar_features(df_stats)
+    registrar_carga("features_derivadas", time.perf_counter() - inicio)
+
+    # Cubo de agregados para /api/data/filtered (sem varrer df_stats por request)
+    inicio = time.perf_counter()
+    cubo = CuboAgregado(df_stats, df_derivadas)
+    registrar_carga("cubo", time.perf_counter() - inicio)
+    print(f"   ✓ Cubo de agregados construído: {cubo.casos.size:,} células")
+
+    # Bitmaps por valor para filtros além dos do dashboard (sintomas, comorbidades, E/OU)
+    inicio = time.perf_counter()
+    bitmaps = IndiceBitmap(df_stats, df_derivadas)
+    registrar_carga("bitmaps", time.perf_counter() - inicio)
+    print(f"   ✓ Índice de bitmaps construído: {sum(len(b) for b in bitmaps.bitmaps.values())} bitmaps")
+
+    # Somas acumuladas por dia de notificação para /api/data/serie
+    inicio = time.perf_counter()
+    serie = SerieTemporal(df_stats["DT_NOTIFIC"], df_derivadas["HOSPITALIZADO"])
+    registrar_carga("serie_temporal", time.perf_counter() - inicio)
+    print(f"   ✓ Índice temporal construído: {len(serie.diarios['casos']):,} dias")
+
+    # Payloads dos endpoints /api/data/* calculados uma vez por versão do dataset
+    inicio = time.perf_counter()
+    respostas = CacheRespostas.calcular(info_dados["versao"], df_stats, df_derivadas, app.json.dumps)
+    registrar_carga("estatisticas", time.perf_counter() - inicio)
+    print(f"   ✓ Estatísticas pré-computadas (versão do dataset {info_dados['versao'][:12]})")
+
+    estado = SimpleNamespace(df_stats=df_stats, df_derivadas=df_derivadas, cubo=cubo,
+                             bitmaps=bitmaps, serie=serie, respostas=respostas, assinatura=info_dados["assinatura"],
+                             versao=info_dados["versao"], lotes=0, assinatura_incrementos=None)
+    try:
+        return aplicar_incrementos(estado)
+    except Exception as e:
+        print(f"ERRO ao aplicar os lotes de {caminho_incrementos(CSV_PATH)}: {e}")
+        return estado
+
+
+def aplicar_incrementos(estado):
+    '''
+    Novo snapshot com os lotes publicados (ingestao.py) que `estado` ainda não tem.
+
+    Só os arquivos dos lotes novos são lidos: df_stats, df_derivadas, o
+    cubo, os bitmaps e o índice temporal recebem apenas as linhas novas, e as estatísticas do dashboard
+    saem do cubo atualizado. `estado` não é alterado.
+    '''
+    assinatura = assinatura_indice(CSV_PATH)
+    pasta = caminho_incrementos(CSV_PATH)
+    lotes = lotes_validos(ler_indice(pasta), estado.versao)
+    if estado.cubo is None:
+        return estado
+    if len(lotes) < estado.lotes:
+        # Índice recomeçado sobre o mesmo CSV (pasta de lotes apagada): carga completa
+        print("Lotes de ingestão removidos; recarregando o dataset...")
+        return carregar_estado_dados()
+    if len(lotes) == estado.lotes:
+        return SimpleNamespace(**{**vars(estado), "assinatura_incrementos": assinatura})
+
+    inicio = time.perf_counter()
+    novos_lotes = lotes[estado.lotes:]
+    df_stats, novos = anexar(estado.df_stats, carregar_lotes(novos_lotes, pasta))
+    acrescimo = derivar_features(novos)
+    df_derivadas = anexar_derivadas(estado.df_derivadas, acrescimo)
+    cubo = estado.cubo.acrescentar(novos, acrescimo)
+    bitmaps = estado.bitmaps.acrescentar(novos, acrescimo)
+    serie = estado.serie.acrescentar(novos["DT_NOTIFIC"], acrescimo["HOSPITALIZADO"])
+    # Versão (ETag) = CSV base + último lote aplicado
+    versao = hashlib.sha256(f"{estado.versao}:{lotes[-1]['arquivo']}".encode()).hexdigest()
+    respostas = CacheRespostas.do_cubo(versao, cubo, app.json.dumps)
+    registrar_carga("incremento", time.perf_counter() - inicio)
+    print(f"   ✓ {len(novos_lotes)} lote(s) de ingestão aplicado(s): +{len(novos):,} registros "
+          f"({len(df_stats):,} no total)")
+    return SimpleNamespace(df_stats=df_stats, df_derivadas=df_derivadas, cubo=cubo,
+                           bitmaps=bitmaps, serie=serie, respostas=respostas, assinatura=estado.assinatura,
+                           versao=estado.versao, lotes=len(lotes), assinatura_incrementos=assinatura)
+
+
+estado_dados = carregar_estado_dados()
+_lock_recarga = threading.Lock()
+_ultima_verificacao = time.monotonic()
+
+
+def verificar_atualizacao_dados():
+    '''
+    Retorna o snapshot atual, recarregando-o se o CSV foi substituído ou
+    aplicando os lotes novos se o índice de ingestão mudou.
+
+    A checagem são dois os.stat, feitos no máximo a cada
+    INTERVALO_VERIFICACAO_DADOS segundos.
+    '''
+    global estado_dados, _ultima_verificacao
+    if time.monotonic() - _ultima_verificacao < INTERVALO_VERIFICACAO_DADOS:
+        return estado_dados
+    with _lock_recarga:
+        if time.monotonic() - _ultima_verificacao >= INTERVALO_VERIFICACAO_DADOS:
+            _ultima_verificacao = time.monotonic()
+            if assinatura_arquivo(CSV_PATH) != estado_dados.assinatura:
+                print("Dataset alterado em disco; recarregando estatísticas...")
+                estado_dados = carregar_estado_dados()
+            elif assinatura_indice(CSV_PATH) != estado_dados.assinatura_incrementos:
+                try:
+                    estado_dados = aplicar_incrementos(estado_dados)
+                except Exception as e:
+                    print(f"ERRO ao aplicar os lotes de {caminho_incrementos(CSV_PATH)}: {e}")
+    return estado_dados
+
+# 2. Modelo Preditivo (registro de modelos com troca a quente)
+
+def carregar_papel(papel, carregados):
+    '''
+    Carrega o modelo apontado pelo papel ("ativo" ou "sombra").
+
+    `carregados` (versão -> ModeloServido) evita recarregar uma versão já
+    em memória, como a sombra promovida a ativa. Sem ativo.json, o ativo é
+    o modelo legado; sem sombra.json, não há sombra.
+    '''
+    versao = ler_ponteiro(papel)
+    if versao is None and papel == "sombra":
+        return None
+    if versao in carregados or (versao is None and "legado" in carregados):
+        return carregados[versao or "legado"]
+    inicio = time.perf_counter()
+    if versao is None:
+        print(f"Carregando modelo preditivo de {MODEL_PATH}...")
+        modelo = carregar_legado(MODEL_PATH, SCALER_PATH if APLICAR_SCALER else None,
+                                 CONFIG_MODELO_PATH, com_tabela=PREDICAO_TABELA)
+    else:
+        print(f"Carregando modelo {papel} do registro: {versao}...")
+        modelo = carregar_versao(versao, com_tabela=PREDICAO_TABELA)
+    registrar_carga(f"modelo_{papel}", time.perf_counter() - inicio)
+    return modelo
+
+
+def carregar_estado_modelos(anterior=None):
+    '''
+    Snapshot dos modelos: ativo, sombra e a comparação entre eles.
+
+    Uma versão que falha ao carregar não derruba a API: o papel mantém o
+    modelo anterior (ou fica sem modelo, na primeira carga).
+    '''
+    assinatura = assinatura_ponteiros()
+    carregados = {modelo.versao: modelo for modelo in (getattr(anterior, "ativo", None),
+                                                       getattr(anterior, "sombra", None))
+                  if modelo is not None}
+    modelos = {}
+    for papel in ("ativo", "sombra"):
+        atual = getattr(anterior, papel, None)
+        try:
+            modelos[papel] = carregar_papel(papel, carregados)
+        except Exception as e:
+            print(f"ERRO ao carregar o modelo {papel}: {e}")
+            modelos[papel] = atual
+
+    ativo, sombra = modelos["ativo"], modelos["sombra"]
+    versoes = (ativo and ativo.versao, sombra and sombra.versao)
+    for papel, versao in zip(("ativo", "sombra"), versoes):
+        registrar_modelo(papel, versao)
+    comparacao = getattr(anterior, "comparacao", None)
+    if comparacao is None or (comparacao.ativo, comparacao.sombra) != versoes:
+        comparacao = ComparacaoSombra(*versoes)
+    return SimpleNamespace(ativo=ativo, sombra=sombra, comparacao=comparacao,
+                           assinatura=assinatura)
+
+
+estado_modelos = carregar_estado_modelos()
+_lock_modelos = threading.Lock()
+_ultima_verificacao_modelos = time.monotonic()
+
+
+def verificar_atualizacao_modelos():
+    '''
+    Retorna o snapshot atual, recarregando-o se um ponteiro do registro mudou.
+
+    Cada worker do gunicorn faz a própria verificação (no máximo a cada
+    INTERVALO_VERIFICACAO_MODELOS segundos) e troca o snapshot inteiro de
+    uma vez; requisições em andamento terminam com o modelo anterior.
+    '''
+    global estado_modelos, _ultima_verificacao_modelos
+    if time.monotonic() - _ultima_verificacao_modelos < INTERVALO_VERIFICACAO_MODELOS:
+        return estado_modelos
+    with _lock_modelos:
+        if time.monotonic() - _ultima_verificacao_modelos >= INTERVALO_VERIFICACAO_MODELOS:
+            _ultima_verificacao_modelos = time.monotonic()
+            if assinatura_ponteiros() != estado_modelos.assinatura:
+                print("Registro de modelos alterado; recarregando...")
+                estado_modelos = carregar_estado_modelos(estado_modelos)
+    return estado_modelos
+
+
+def comparar_sombra(estado, prever, p_ativo, tempo_ativo):
+    '''Pontua o mesmo pedido no modelo sombra e acumula a comparação (erros são ignorados).'''
+    if estado.sombra is None:
+        return
+    try:
+        with medir("sombra"):
+            p_sombra, tempo_sombra = cronometrar(prever, estado.sombra)
+        estado.comparacao.registrar(p_ativo, p_sombra, tempo_ativo, tempo_sombra)
+    except Exception as e:
+        print(f"AVISO: modelo sombra {estado.sombra.versao} falhou: {e}")
+
+# --- Instrumentação (metricas.py, exposta em /metrics) ---
+
+def medir(nome):
+    '''Span de uma etapa do handler atual: `with medir("predicao"): ...`.'''
+    return etapa(request.url_rule.rule, nome)
+
+
+if METRICAS_ATIVAS:
+    @app.before_request
+    def iniciar_cronometro():
+        g.inicio_requisicao = time.perf_counter()
+
+    @app.after_request
+    def medir_requisicao(response):
+        '''
+        Latência por rota (padrão da URL, não o caminho, para limitar as séries).
+
+        Em respostas em streaming (/api/predict/batch) mede até o início do envio.
+        '''
+        inicio = g.pop("inicio_requisicao", None)
+        if inicio is not None:
+            rota = request.url_rule.rule if request.url_rule is not None else "desconhecida"
+            REQUISICOES.observar(time.perf_counter() - inicio, rota, request.method,
+                                 str(response.status_code))
+            iniciar_publicador()
+        return response
 
 # --- Rotas da Aplicação ---
 
@@ -81,198 +365,154 @@ def dashboard():
     '''Renderiza o dashboard interativo.'''
     return render_template("dashboard.html")
 
-# --- API para Estatísticas (usa df_stats) ---
+# --- API para Estatísticas (payloads pré-computados por versão do dataset) ---
+
+def responder_estatistica(nome):
+    '''
+    Serve o payload pré-computado com ETag (304 se o cliente já tem a versão
+    atual), já comprimido em brotli/gzip quando o cliente aceita.
+    '''
+    estado = verificar_atualizacao_dados()
+    if estado.respostas is None:
+        return jsonify({"error": "Dados de estatísticas não carregados"}), 500
+
+    with medir("payload"):
+        corpo, codificacao, etag = estado.respostas.corpo(nome, request.accept_encodings)
+    response = app.response_class(corpo, mimetype=app.json.mimetype)
+    if codificacao:
+        response.content_encoding = codificacao
+    response.vary.add("Accept-Encoding")
+    response.set_etag(etag)
+    # no-cache: o navegador guarda a resposta mas revalida (If-None-Match) a cada uso
+    response.cache_control.public = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+@app.route("/api/data/dashboard")
+def data_dashboard():
+    '''Retorna todas as séries do dashboard num único payload (formato do /api/data/filtered).'''
+    return responder_estatistica("dashboard")
 
 @app.route("/api/data/summary")
 def data_summary():
     '''Retorna um resumo dos dados REAIS de Sertãozinho.'''
-    if df_stats.empty:
-        return jsonify({"error": "Dados de estatísticas não carregados"}), 500
-        
-    total_casos = len(df_stats)
-    casos_hospitalizados = len(df_stats[df_stats["HOSPITALIZ"] == "SIM"])
-    taxa_hospitalizacao = (casos_hospitalizados / total_casos) * 100 if total_casos > 0 else 0
-    
-    summary = {
-        "total_casos": total_casos,
-        "casos_hospitalizados": casos_hospitalizados,
-        "taxa_hospitalizacao": round(taxa_hospitalizacao, 2),
-        "idade_media": round(df_stats["IDADE"].mean(), 1),
-        "anos_cobertura": f"{df_stats['NU_ANO'].min()} - {df_stats['NU_ANO'].max()}"
-    }
-    return jsonify(summary)
+    return responder_estatistica("summary")
 
 @app.route("/api/data/casos_por_ano")
 def casos_por_ano():
     '''Retorna dados de casos por ano do dataset de Sertãozinho.'''
-    if df_stats.empty:
-        return jsonify({"error": "Dados de estatísticas não carregados"}), 500
-    casos_ano = df_stats["NU_ANO"].value_counts().sort_index()
-    data = {
-        "anos": casos_ano.index.tolist(),
-        "casos": casos_ano.values.tolist()
-    }
-    return jsonify(data)
+    return responder_estatistica("casos_por_ano")
 
 @app.route("/api/data/casos_por_mes")
 def casos_por_mes():
     '''Retorna dados de casos por mês do dataset de Sertãozinho.'''
-    if df_stats.empty:
-        return jsonify({"error": "Dados de estatísticas não carregados"}), 500
-    df_stats["MES_NOTIFIC"] = df_stats["DT_NOTIFIC"].dt.month
-    casos_mes = df_stats["MES_NOTIFIC"].value_counts().sort_index()
-    meses = ["Jan", "Fev", "Mar", "Abr", "Mai", "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez"]
-    data = {
-        "meses": [meses[i-1] for i in casos_mes.index],
-        "casos": casos_mes.values.tolist()
-    }
-    return jsonify(data)
+    return responder_estatistica("casos_por_mes")
 
 @app.route("/api/data/distribuicao_sexo")
 def distribuicao_sexo():
     '''Retorna dados de distribuição por sexo.'''
-    if df_stats.empty:
-        return jsonify({"error": "Dados de estatísticas não carregados"}), 500
-    sexo_counts = df_stats['CS_SEXO'].value_counts()
-    data = {
-        "labels": sexo_counts.index.tolist(),
-        "values": sexo_counts.values.tolist()
-    }
-    return jsonify(data)
+    return responder_estatistica("distribuicao_sexo")
 
 @app.route("/api/data/fenomeno_climatico")
 def fenomeno_climatico():
     '''Retorna dados de distribuição por fenômeno climático.'''
-    if df_stats.empty:
-        return jsonify({"error": "Dados de estatísticas não carregados"}), 500
-    fenomeno_counts = df_stats['FENOMENO'].value_counts()
-    data = {
-        "labels": fenomeno_counts.index.tolist(),
-        "values": fenomeno_counts.values.tolist()
-    }
-    return jsonify(data)
+    return responder_estatistica("fenomeno_climatico")
 
 @app.route("/api/data/hospitalizacao_por_idade")
 def hospitalizacao_por_idade():
     '''Retorna dados de hospitalização por faixa etária.'''
-    if df_stats.empty:
-        return jsonify({"error": "Dados de estatísticas não carregados"}), 500
-    bins = [0, 10, 20, 30, 40, 50, 60, 70, 80, 90, 120]
-    labels = ['0-10', '11-20', '21-30', '31-40', '41-50', '51-60', '61-70', '71-80', '81-90', '90+']
-    df_stats['faixa_etaria'] = pd.cut(df_stats['IDADE'], bins=bins, labels=labels, right=False)
-    
-    hosp_por_idade = df_stats[df_stats['HOSPITALIZ'] == 'SIM']['faixa_etaria'].value_counts().sort_index()
-    total_por_idade = df_stats['faixa_etaria'].value_counts().sort_index()
-    
-    data = {
-        "faixas": total_por_idade.index.tolist(),
-        "hospitalizados": hosp_por_idade.reindex(total_por_idade.index, fill_value=0).values.tolist(),
-        "total": total_por_idade.values.tolist()
-    }
-    return jsonify(data)
+    return responder_estatistica("hospitalizacao_por_idade")
 
 @app.route("/api/data/distribuicao_raca")
 def distribuicao_raca():
     '''Retorna dados de distribuição por raça.'''
-    if df_stats.empty:
-        return jsonify({"error": "Dados de estatísticas não carregados"}), 500
-    raca_counts = df_stats['CS_RACA'].value_counts()
-    data = {
-        "labels": raca_counts.index.tolist(),
-        "values": raca_counts.values.tolist()
-    }
-    return jsonify(data)
+    return responder_estatistica("distribuicao_raca")
 
 @app.route('/api/data/filtered', methods=['POST'])
 def get_filtered_data():
-    '''Retorna dados filtrados para o dashboard.'''
-    if df_stats.empty:
+    '''
+    Retorna dados filtrados para o dashboard.
+
+    Os filtros do dashboard (ano, fenômeno, sexo) saem do cubo
+    pré-agregado; qualquer outra coluna indexada e combinações E/OU/NÃO
+    saem do índice de bitmaps (ver indice_bitmap.py). Nos dois casos, sem
+    cópia nem varredura de linhas.
+    '''
+    estado = verificar_atualizacao_dados()
+    if estado.cubo is None:
         return jsonify({"error": "Dados de estatísticas não carregados"}), 500
-    filters = request.json
-    
-    filtered_df = df_stats.copy()
-    
-    if filters.get('anoInicial'):
-        filtered_df = filtered_df[filtered_df['NU_ANO'] >= int(filters['anoInicial'])]
-    if filters.get('anoFinal'):
-        filtered_df = filtered_df[filtered_df['NU_ANO'] <= int(filters['anoFinal'])]
-    if filters.get('fenomeno'):
-        filtered_df = filtered_df[filtered_df['FENOMENO'] == filters['fenomeno']]
-    if filters.get('sexo'):
-        filtered_df = filtered_df[filtered_df['CS_SEXO'] == filters['sexo']]
-
-    # Recalcular todos os dados para os gráficos com base no df filtrado
-    # Summary
-    total_casos = len(filtered_df)
-    casos_hospitalizados = len(filtered_df[filtered_df["HOSPITALIZ"] == "SIM"])
-    taxa_hospitalizacao = (casos_hospitalizados / total_casos) * 100 if total_casos > 0 else 0
-    idade_media = round(filtered_df["IDADE"].mean(), 1) if total_casos > 0 else 0
-
-    summary = {
-        "total_casos": total_casos,
-        "casos_hospitalizados": casos_hospitalizados,
-        "taxa_hospitalizacao": round(taxa_hospitalizacao, 2),
-        "idade_media": idade_media
-    }
-
-    # Casos por Ano
-    casos_ano = filtered_df["NU_ANO"].value_counts().sort_index()
-    casos_por_ano_data = {
-        "anos": casos_ano.index.tolist(),
-        "casos": casos_ano.values.tolist()
-    }
-
-    # Distribuição por Sexo
-    sexo_counts = filtered_df['CS_SEXO'].value_counts()
-    distribuicao_sexo_data = {
-        "labels": sexo_counts.index.tolist(),
-        "values": sexo_counts.values.tolist()
-    }
-
-    # Casos por Mês
-    filtered_df["MES_NOTIFIC"] = filtered_df["DT_NOTIFIC"].dt.month
-    casos_mes = filtered_df["MES_NOTIFIC"].value_counts().sort_index()
-    meses = ["Jan", "Fev", "Mar", "Abr", "Mai", "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez"]
-    casos_por_mes_data = {
-        "meses": [meses[i-1] for i in casos_mes.index],
-        "casos": casos_mes.values.tolist()
-    }
-
-    # Fenômeno Climático
-    fenomeno_counts = filtered_df['FENOMENO'].value_counts()
-    fenomeno_climatico_data = {
-        "labels": fenomeno_counts.index.tolist(),
-        "values": fenomeno_counts.values.tolist()
-    }
-
-    # Hospitalização por Idade
-    bins = [0, 10, 20, 30, 40, 50, 60, 70, 80, 90, 120]
-    labels = ['0-10', '11-20', '21-30', '31-40', '41-50', '51-60', '61-70', '71-80', '81-90', '90+']
-    filtered_df['faixa_etaria'] = pd.cut(filtered_df['IDADE'], bins=bins, labels=labels, right=False)
-    hosp_por_idade = filtered_df[filtered_df['HOSPITALIZ'] == 'SIM']['faixa_etaria'].value_counts().sort_index()
-    total_por_idade = filtered_df['faixa_etaria'].value_counts().sort_index()
-    hospitalizacao_idade_data = {
-        "faixas": total_por_idade.index.tolist(),
-        "hospitalizados": hosp_por_idade.reindex(total_por_idade.index, fill_value=0).values.tolist(),
-        "total": total_por_idade.values.tolist()
-    }
-
-    # Distribuição por Raça
-    raca_counts = filtered_df['CS_RACA'].value_counts()
-    distribuicao_raca_data = {
-        "labels": raca_counts.index.tolist(),
-        "values": raca_counts.values.tolist()
-    }
+    with medir("json"):
+        filters = request.json or {}
+    if not isinstance(filters, dict):
+        return jsonify({"error": "Envie os filtros como um objeto JSON"}), 400
 
-    return jsonify({
-        "summary": summary,
-        "casosPorAno": casos_por_ano_data,
-        "distribuicaoSexo": distribuicao_sexo_data,
-        "casosPorMes": casos_por_mes_data,
-        "fenomenoClimatico": fenomeno_climatico_data,
-        "hospitalizacaoIdade": hospitalizacao_idade_data,
-        "racaDistribution": distribuicao_raca_data
-    })
+    try:
+        with medir("filtro"):
+            if filtro_do_cubo(filters):
+                resultado = estado.cubo.consultar(filters)
+            else:
+                resultado = estado.bitmaps.consultar(filters)
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    with medir("serializacao"):
+        return jsonify(resultado)
+
+@app.route('/api/data/export', methods=['POST'])
+def exportar_filtrado():
+    '''
+    Linhas da coorte de um /api/data/filtered, enviadas em streaming.
+
+    Corpo: o mesmo JSON de filtros. Query string: formato (csv ou parquet)
+    e colunas (lista separada por vírgulas; padrão: colunas do CSV).
+    '''
+    estado = verificar_atualizacao_dados()
+    if estado.cubo is None:
+        return jsonify({"error": "Dados de estatísticas não carregados"}), 500
+    filtros = request.get_json(silent=True) or {}
+    if not isinstance(filtros, dict):
+        return jsonify({"error": "Envie os filtros como um objeto JSON"}), 400
+    formato = request.args.get("formato", "csv")
+    colunas = [c.strip() for c in request.args.get("colunas", "").split(",") if c.strip()]
+    try:
+        with medir("filtro"):
+            gerador, linhas = preparar_exportacao(estado.df_stats, estado.df_derivadas, estado.bitmaps,
+                                                  filtros, formato, colunas)
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 501
+
+    response = Response(gerador, mimetype=MIMETYPES[formato])
+    response.headers["Content-Disposition"] = f"attachment; filename=notificacoes.{formato}"
+    response.headers["X-Total-Registros"] = str(linhas)
+    return response
+
+@app.route("/api/data/serie")
+def serie_casos():
+    '''
+    Série temporal de casos e hospitalizações (ver serie_temporal.py).
+
+    Parâmetros: inicio e fim (AAAA-MM-DD; padrão: todo o período),
+    granularidade (dia, semana epidemiológica ou mes; padrão semana),
+    media_movel (janela em períodos) e comparar_ano_anterior (1/true).
+    '''
+    estado = verificar_atualizacao_dados()
+    if estado.serie is None:
+        return jsonify({"error": "Dados de estatísticas não carregados"}), 500
+    argumentos = request.args
+    try:
+        with medir("filtro"):
+            resultado = estado.serie.consultar(
+                inicio=argumentos.get("inicio") or None,
+                fim=argumentos.get("fim") or None,
+                granularidade=argumentos.get("granularidade", "semana"),
+                media_movel=argumentos.get("media_movel", type=int),
+                comparar_ano_anterior=argumentos.get("comparar_ano_anterior", "").lower() in ("1", "true", "sim"),
+            )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    with medir("serializacao"):
+        return jsonify(resultado)
 
 # --- API para Predição (usa o modelo retreinado) ---
 
@@ -285,49 +525,23 @@ def predict():
     Input do usuário: 5 sintomas principais (FEBRE, MIALGIA, CEFALEIA, VOMITO, EXANTEMA)
     Outras features: Preenchidas com valores médios/padrão
     '''
-    if model is None:
+    estado = verificar_atualizacao_modelos()
+    if estado.ativo is None:
         return jsonify({"error": "Modelo não carregado"}), 500
 
     try:
-        data = request.json
-
-        # Coletar os 5 sintomas do usuário
-        febre = 1 if data.get("febre", "NÃO").upper() == "SIM" else 0
-        mialgia = 1 if data.get("mialgia", "NÃO").upper() == "SIM" else 0
-        cefaleia = 1 if data.get("cefaleia", "NÃO").upper() == "SIM" else 0
-        vomito = 1 if data.get("vomito", "NÃO").upper() == "SIM" else 0
-        exantema = 1 if data.get("exantema", "NÃO").upper() == "SIM" else 0
-
-        # Criar array com as 14 features esperadas pelo modelo
-        # Ordem: DIAS_SINTOMA_NOTIFIC_TEMP, TRIMESTRE, MES, DIAS_SINTOMA_NOTIFIC, TEM_COMORBIDADE,
-        #        NU_ANO, QTD_IGNORADOS, SEVERITY_SCORE, IDADE, ANO, HEPATOPAT_BIN, COMORBIDADE_SCORE, DIABETES_BIN, RENAL_BIN
-
-        # Calcular SEVERITY_SCORE baseado nos sintomas
-        severity = exantema * 1 + vomito * 3 + mialgia * 1 + cefaleia * 1 + febre * 1
-
-        # Valores padrão/médios para as outras features
-        X_input = np.array([[
-            2,          # DIAS_SINTOMA_NOTIFIC_TEMP (média: 2 dias)
-            1,          # TRIMESTRE (1 = verão, período de maior incidência)
-            3,          # MES (março, pico de casos)
-            2,          # DIAS_SINTOMA_NOTIFIC
-            0,          # TEM_COMORBIDADE (0 = não tem)
-            2024,       # NU_ANO
-            0,          # QTD_IGNORADOS
-            severity,   # SEVERITY_SCORE (calculado baseado nos sintomas)
-            35,         # IDADE (média: 35 anos)
-            2024,       # ANO
-            0,          # HEPATOPAT_BIN (0 = não)
-            0,          # COMORBIDADE_SCORE
-            0,          # DIABETES_BIN (0 = não)
-            0           # RENAL_BIN (0 = não)
-        ]])
-
-        # Fazer predição
-        prediction_proba = model.predict_proba(X_input)
-        prob_hospitalizacao = prediction_proba[0][1]  # Probabilidade da classe 1 (SIM)
-
-        return jsonify({"probabilidade_hospitalizacao": round(prob_hospitalizacao * 100, 2)})
+        with medir("json"):
+            data = request.json
+
+        # Tabela de sintomas quando a entrada está na grade; senão, vetor de 14
+        # features (features_modelo.py) no pontuador NumPy
+        with medir("predicao"):
+            prob_hospitalizacao, tempo = cronometrar(estado.ativo.prever_registro, data)
+        comparar_sombra(estado, lambda modelo: modelo.prever_registro(data),
+                        prob_hospitalizacao, tempo)
+
+        with medir("serializacao"):
+            return jsonify({"probabilidade_hospitalizacao": round(prob_hospitalizacao * 100, 2)})
 
     except Exception as e:
         import traceback
@@ -336,6 +550,132 @@ def predict():
             "traceback": traceback.format_exc()
         }), 500
 
+@app.route("/api/predict/tabela")
+def predict_tabela():
+    '''
+    Tabela com todas as predições possíveis para os 5 sintomas.
+
+    O frontend pode guardá-la em cache e responder localmente; o ETag muda
+    apenas quando o modelo (e portanto a tabela) muda.
+    '''
+    ativo = verificar_atualizacao_modelos().ativo
+    if ativo is None or ativo.tabela is None:
+        return jsonify({"error": "Tabela de predições não disponível"}), 500
+
+    response = jsonify(ativo.tabela.como_json())
+    response.set_etag(ativo.tabela.versao)
+    response.cache_control.public = True
+    response.cache_control.max_age = 3600
+    return response.make_conditional(request)
+
+@app.route("/api/predict/batch", methods=["POST"])
+def predict_batch():
+    '''
+    Predição em lote: JSON (lista de registros) ou CSV (upload "arquivo" ou text/csv).
+
+    Todos os registros viram uma única matriz N×14, pontuada com uma só
+    chamada vetorizada. A resposta é enviada em streaming: NDJSON para
+    entrada JSON, CSV para entrada CSV.
+    '''
+    estado = verificar_atualizacao_modelos()
+    if estado.ativo is None:
+        return jsonify({"error": "Modelo não carregado"}), 500
+
+    try:
+        with medir("leitura"):
+            registros, formato = ler_registros(request)
+    except Exception as e:
+        return jsonify({"error": f"Entrada inválida: {str(e)}"}), 400
+
+    if len(registros) > MAX_REGISTROS_LOTE:
+        return jsonify({"error": f"Máximo de {MAX_REGISTROS_LOTE:,} registros por lote"}), 413
+
+    try:
+        with medir("matriz"):
+            X_lote = montar_matriz(registros)
+        if len(registros):
+            with medir("predicao"):
+                probabilidades, tempo = cronometrar(estado.ativo.prever_probabilidades, X_lote)
+            comparar_sombra(estado, lambda modelo: modelo.prever_probabilidades(X_lote),
+                            probabilidades, tempo)
+        else:
+            probabilidades = np.empty(0)
+    except Exception as e:
+        return jsonify({"error": f"Erro na predição: {str(e)}"}), 500
+
+    mimetype = "text/csv" if formato == "csv" else "application/x-ndjson"
+    return Response(
+        gerar_resposta_lote(identificadores(registros), probabilidades, formato),
+        mimetype=mimetype
+    )
+
+@app.route("/api/ingestao", methods=["POST"])
+def ingestao():
+    '''
+    Ingestão incremental de notificações (JSON ou CSV, como no /api/predict/batch).
+
+    Exige `Authorization: Bearer <INGESTAO_TOKEN>`. As linhas novas (sem
+    duplicatas) são publicadas como um lote em ingestao.py; este worker as
+    aplica na hora e os demais na próxima verificação (no máximo
+    INTERVALO_VERIFICACAO_DADOS segundos depois). Se a aplicação falhar
+    depois da publicação, a resposta ainda é 200, com um "aviso".
+    '''
+    global estado_dados
+    if not INGESTAO_TOKEN:
+        return jsonify({"error": "Ingestão pela API desligada (defina INGESTAO_TOKEN)"}), 404
+    autorizacao = request.headers.get("Authorization", "").encode()
+    if not hmac.compare_digest(autorizacao, f"Bearer {INGESTAO_TOKEN}".encode()):
+        return jsonify({"error": "Não autorizado"}), 401
+
+    try:
+        with medir("leitura"):
+            registros, _ = ler_registros(request)
+    except Exception as e:
+        return jsonify({"error": f"Entrada inválida: {str(e)}"}), 400
+    if len(registros) > MAX_REGISTROS_LOTE:
+        return jsonify({"error": f"Máximo de {MAX_REGISTROS_LOTE:,} registros por lote"}), 413
+
+    try:
+        with medir("ingestao"):
+            resumo = ingerir(registros, CSV_PATH, origem="api")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except FileNotFoundError:
+        return jsonify({"error": "Dataset base não encontrado"}), 500
+
+    # O lote já foi publicado: uma falha ao aplicá-lo aqui não é erro do
+    # pedido (repeti-lo só daria duplicatas); fica para a próxima verificação
+    try:
+        with medir("aplicacao"), _lock_recarga:
+            estado_dados = aplicar_incrementos(estado_dados)
+    except Exception as e:
+        print(f"ERRO ao aplicar o lote {resumo.get('lote')}: {e}")
+        return jsonify({**resumo, "total_registros": len(estado_dados.df_stats),
+                        "aviso": f"Lote publicado, mas não aplicado neste worker ({e}); "
+                                 "será aplicado na próxima verificação dos dados"})
+    return jsonify({**resumo, "total_registros": len(estado_dados.df_stats)})
+
+@app.route("/api/modelos")
+def modelos():
+    '''
+    Modelo ativo, modelo sombra, versões do registro e a comparação
+    ativo x sombra acumulada neste worker (latência e diferença das saídas).
+    '''
+    estado = verificar_atualizacao_modelos()
+    return jsonify({
+        "ativo": estado.ativo.resumo() if estado.ativo is not None else None,
+        "sombra": estado.sombra.resumo() if estado.sombra is not None else None,
+        "comparacao": estado.comparacao.como_json() if estado.sombra is not None else None,
+        "versoes": listar_versoes(),
+    })
+
+@app.route("/metrics")
+def metrics():
+    '''Métricas no formato do Prometheus (latência por rota e por etapa, tempos de carga).'''
+    if not METRICAS_ATIVAS:
+        return jsonify({"error": "Métricas desligadas (METRICAS=0)"}), 404
+    return Response(exportar(), mimetype="text/plain; version=0.0.4")
+
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 5000))
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Benchmark reprodutível da API Flask (gunicorn) com bases sintéticas.
+
+Para cada tamanho pedido (ex.: 33k, 1M, 10M linhas):
+1. Monta a base em <BENCH_DIR> (reaproveitada se já existir):
+   - BENCH_BASE=sintetica (padrão): pacote colunar gerado direto pelo
+     sinan_sintetico.py, sem CSV e sem depender da base real
+   - BENCH_BASE=reamostrada: CSV com as linhas do data/df_dengue_tratado.csv
+     reamostradas com semente fixa, mais o cache colunar (python dados.py)
+2. Sobe o gunicorn com gunicorn.conf.py apontando para a base (CSV_DADOS)
+3. Dispara BENCH_CLIENTES clientes concorrentes (conexões keep-alive) em
+   cada rota: /api/predict, /api/data/filtered e cada /api/data/*
+4. Registra p50/p95/p99, vazão e erros por rota, o tempo de subida e a
+   memória (RSS e PSS) do master e de cada worker, antes e depois da carga
+
+O relatório é um JSON com chaves ordenadas, para comparar entre commits:
+    python benchmark_api.py comparar antes.json depois.json
+
+Uso:
+    python benchmark_api.py [tamanhos] [relatorio.json]
+    python benchmark_api.py 33k,1M benchmark_api.json
+
+Variáveis de ambiente:
+    BENCH_CLIENTES      clientes concorrentes (padrão 8)
+    BENCH_REQUISICOES   requisições por cliente em cada rota (padrão 100)
+    BENCH_WORKERS       workers do gunicorn (padrão 2)
+    BENCH_BASE          sintetica (padrão) ou reamostrada
+    BENCH_DIR           onde ficam as bases sintéticas (padrão bench_dados)
+    BENCH_TIMEOUT       segundos para o app subir (padrão 900)
+"""
+
+import http.client
+import json
+import os
+import platform
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from estatisticas import ESTATISTICAS
+from features_modelo import USER_INPUT_FEATURES
+from sinan_sintetico import GeradorSinan, gerar_cache, ler_tamanho
+
+CSV_ORIGEM = "data/df_dengue_tratado.csv"
+BENCH_CLIENTES = int(os.getenv("BENCH_CLIENTES", "8"))
+BENCH_REQUISICOES = int(os.getenv("BENCH_REQUISICOES", "100"))
+BENCH_WORKERS = int(os.getenv("BENCH_WORKERS", "2"))
+BENCH_DIR = os.getenv("BENCH_DIR", "bench_dados")
+BENCH_TIMEOUT = float(os.getenv("BENCH_TIMEOUT", "900"))
+BENCH_BASE = os.getenv("BENCH_BASE", "sintetica")
+
+SEED = 42
+LINHAS_POR_BLOCO = 500_000
+
+ROTAS_GET = [f"/api/data/{nome}" for nome in ["dashboard", *ESTATISTICAS]]
+
+FILTROS = [
+    {},
+    {"anoInicial": "2010"},
+    {"anoInicial": "2005", "anoFinal": "2012", "sexo": "M"},
+    {"fenomeno": "La Niña"},
+    {"fenomeno": "El Niño", "sexo": "F", "anoFinal": "2015"},
+]
+
+
+# --- Bases ---
+
+def gerar_base_sintetica(n_linhas, pasta=BENCH_DIR, seed=SEED):
+    '''Pacote colunar sintético (sinan_sintetico.py); retorna o caminho a passar em CSV_DADOS.'''
+    caminho = os.path.join(pasta, f"sinan_{n_linhas}.csv")
+    cache = os.path.join(pasta, f"sinan_{n_linhas}.cache")
+    if not os.path.isdir(cache):
+        os.makedirs(pasta, exist_ok=True)
+        gerar_cache(n_linhas, cache, GeradorSinan(seed=seed))
+    return caminho
+
+
+def gerar_base(n_linhas, pasta=BENCH_DIR, origem=CSV_ORIGEM, seed=SEED):
+    '''
+    CSV com n_linhas reamostradas (com reposição) da base real.
+
+    Escrito em blocos de LINHAS_POR_BLOCO linhas, então 10M de linhas não
+    precisam caber em memória. A mesma semente gera sempre o mesmo arquivo.
+    '''
+    caminho = os.path.join(pasta, f"df_dengue_{n_linhas}.csv")
+    if os.path.exists(caminho):
+        return caminho
+
+    os.makedirs(pasta, exist_ok=True)
+    base = pd.read_csv(origem)
+    rng = np.random.default_rng(seed)
+    temporario = caminho + ".tmp"
+    with open(temporario, "w", newline="") as f:
+        for inicio in range(0, n_linhas, LINHAS_POR_BLOCO):
+            n = min(LINHAS_POR_BLOCO, n_linhas - inicio)
+            bloco = base.iloc[rng.integers(0, len(base), n)]
+            bloco.to_csv(f, header=(inicio == 0), index=False)
+    os.replace(temporario, caminho)
+    return caminho
+
+
+def construir_cache(caminho):
+    '''Cache colunar da base (passo de build do deploy), num processo separado.'''
+    subprocess.run([sys.executable, "dados.py", caminho], check=True, stdout=subprocess.DEVNULL)
+
+
+# --- Servidor ---
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def subir_servidor(caminho, porta, workers=BENCH_WORKERS, timeout=BENCH_TIMEOUT,
+                   aplicacao=("app:app",), variaveis=None):
+    '''
+    Sobe o gunicorn e espera o /api/data/summary responder; retorna (processo, segundos).
+
+    `aplicacao` são os últimos argumentos do gunicorn (ex.: worker ASGI e
+    servico_async:app) e `variaveis`, variáveis de ambiente extras.
+    '''
+    ambiente = {**os.environ, "CSV_DADOS": caminho, "PORT": str(porta),
+                "WEB_CONCURRENCY": str(workers), **(variaveis or {})}
+    log = open(os.path.join(BENCH_DIR, f"gunicorn_{porta}.log"), "w")
+    processo = subprocess.Popen(["gunicorn", "-c", "gunicorn.conf.py", *aplicacao],
+                                env=ambiente, stdout=log, stderr=subprocess.STDOUT)
+    log.close()   # o gunicorn herdou o descritor
+    inicio = time.perf_counter()
+    while time.perf_counter() - inicio < timeout:
+        if processo.poll() is not None:
+            raise RuntimeError(f"gunicorn encerrou ao subir (ver {log.name})")
+        try:
+            conexao = http.client.HTTPConnection("127.0.0.1", porta, timeout=5)
+            conexao.request("GET", "/api/data/summary")
+            if conexao.getresponse().status == 200:
+                return processo, time.perf_counter() - inicio
+        except OSError:
+            pass
+        time.sleep(0.5)
+    parar_servidor(processo)
+    raise TimeoutError(f"App não respondeu em {timeout:.0f}s")
+
+
+def parar_servidor(processo):
+    processo.send_signal(signal.SIGTERM)
+    try:
+        processo.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        processo.kill()
+
+
+def _memoria_processo(pid):
+    '''RSS e PSS (MB) via /proc; PSS divide as páginas compartilhadas entre os processos.'''
+    memoria = {}
+    for arquivo, campo, chave in [("status", "VmRSS:", "rss_mb"), ("smaps_rollup", "Pss:", "pss_mb")]:
+        try:
+            with open(f"/proc/{pid}/{arquivo}") as f:
+                for linha in f:
+                    if linha.startswith(campo):
+                        memoria[chave] = round(int(linha.split()[1]) / 1024, 1)
+                        break
+        except OSError:
+            memoria[chave] = None
+    return memoria
+
+
+def memoria_workers(pid_master):
+    '''Memória do master e de cada worker (filhos do master), ordenados por pid.'''
+    filhos = []
+    for nome in os.listdir("/proc"):
+        if not nome.isdigit():
+            continue
+        try:
+            with open(f"/proc/{nome}/stat") as f:
+                # campo 4 (ppid), depois do nome do comando entre parênteses
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid_master:
+            filhos.append(int(nome))
+    return {
+        "master": _memoria_processo(pid_master),
+        "workers": [_memoria_processo(pid) for pid in sorted(filhos)],
+    }
+
+
+# --- Carga ---
+
+def requisicoes_rota(rota, n, cliente):
+    '''Lista de (método, corpo) para `n` requisições de um cliente.'''
+    if rota == "/api/predict":
+        pedidos = []
+        for i in range(n):
+            k = (i + cliente * 7) % 32
+            corpo = {s.lower(): ("SIM" if (k >> j) & 1 else "NÃO")
+                     for j, s in enumerate(USER_INPUT_FEATURES)}
+            if i % 4 == 3:
+                corpo["idade"] = 20 + (i * 13) % 70   # fora da tabela: caminho do vetor
+            pedidos.append(("POST", json.dumps(corpo)))
+        return pedidos
+    if rota == "/api/data/filtered":
+        return [("POST", json.dumps(FILTROS[(i + cliente) % len(FILTROS)])) for i in range(n)]
+    return [("GET", None)] * n
+
+
+def _cliente(porta, rota, pedidos, latencias, erros):
+    conexao = http.client.HTTPConnection("127.0.0.1", porta, timeout=120)
+    cabecalhos = {"Content-Type": "application/json", "Accept-Encoding": "gzip"}
+    for metodo, corpo in pedidos:
+        inicio = time.perf_counter()
+        try:
+            conexao.request(metodo, rota, body=corpo, headers=cabecalhos)
+            resposta = conexao.getresponse()
+            resposta.read()
+            if resposta.status != 200:
+                erros.append(resposta.status)
+        except (OSError, http.client.HTTPException) as e:
+            erros.append(type(e).__name__)
+            conexao.close()
+            conexao = http.client.HTTPConnection("127.0.0.1", porta, timeout=120)
+            continue
+        latencias.append(time.perf_counter() - inicio)
+    conexao.close()
+
+
+def medir_rota(porta, rota, clientes=BENCH_CLIENTES, requisicoes=BENCH_REQUISICOES):
+    '''Latências e vazão de uma rota com `clientes` conexões concorrentes.'''
+    # Aquecimento (uma requisição por cliente, fora da medição)
+    for cliente in range(clientes):
+        _cliente(porta, rota, requisicoes_rota(rota, 1, cliente), [], [])
+
+    latencias, erros = [], []
+    threads = [threading.Thread(target=_cliente,
+                                args=(porta, rota, requisicoes_rota(rota, requisicoes, c), latencias, erros))
+               for c in range(clientes)]
+    inicio = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duracao = time.perf_counter() - inicio
+
+    ms = np.array(latencias) * 1000
+    resultado = {
+        "requisicoes": len(latencias) + len(erros),
+        "erros": len(erros),
+        "vazao_rps": round(len(latencias) / duracao, 1),
+    }
+    if len(ms):
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        resultado.update({"p50_ms": round(p50, 3), "p95_ms": round(p95, 3), "p99_ms": round(p99, 3),
+                          "media_ms": round(ms.mean(), 3), "max_ms": round(ms.max(), 3)})
+    return resultado
+
+
+def medir_tamanho(n_linhas):
+    print(f"\n📦 Base: {n_linhas:,} linhas")
+    inicio = time.perf_counter()
+    if BENCH_BASE == "reamostrada":
+        caminho = gerar_base(n_linhas)
+        construir_cache(caminho)
+    else:
+        caminho = gerar_base_sintetica(n_linhas)
+    print(f"   ✓ Base {BENCH_BASE}: {caminho} ({time.perf_counter() - inicio:.1f}s)")
+
+    porta = porta_livre()
+    processo, subida = subir_servidor(caminho, porta)
+    print(f"   ✓ gunicorn ({BENCH_WORKERS} workers) pronto em {subida:.1f}s na porta {porta}")
+    try:
+        memoria_antes = memoria_workers(processo.pid)
+        rotas = {}
+        for rota in ["/api/predict", "/api/data/filtered", *ROTAS_GET]:
+            rotas[rota] = r = medir_rota(porta, rota)
+            print(f"   {rota:<38s} p50 {r.get('p50_ms', float('nan')):8.2f} ms | "
+                  f"p99 {r.get('p99_ms', float('nan')):8.2f} ms | {r['vazao_rps']:8.1f} req/s"
+                  + (f" | ❌ {r['erros']} erros" if r["erros"] else ""))
+        memoria_depois = memoria_workers(processo.pid)
+    finally:
+        parar_servidor(processo)
+
+    return {
+        "linhas": n_linhas,
+        "subida_s": round(subida, 2),
+        "memoria_mb": {"apos_subida": memoria_antes, "apos_carga": memoria_depois},
+        "rotas": rotas,
+    }
+
+
+def versao_codigo():
+    '''Commit atual (com "-sujo" se há alterações não commitadas).'''
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+        sujo = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                              capture_output=True, text=True).stdout.strip()
+        return commit + ("-sujo" if sujo else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(antes, depois):
+    '''Tabela de variação (%) de p50/p95/p99 e vazão entre dois relatórios.'''
+    with open(antes) as f:
+        a = json.load(f)
+    with open(depois) as f:
+        b = json.load(f)
+    print(f"Comparando {a.get('commit')} -> {b.get('commit')}")
+    for tamanho in sorted(set(a["resultados"]) & set(b["resultados"]), key=int):
+        print(f"\n📦 {int(tamanho):,} linhas")
+        print(f"   {'rota':<38s} {'p50':>8s} {'p95':>8s} {'p99':>8s} {'req/s':>8s}")
+        rotas_a, rotas_b = a["resultados"][tamanho]["rotas"], b["resultados"][tamanho]["rotas"]
+        for rota in sorted(set(rotas_a) & set(rotas_b)):
+            variacoes = []
+            for metrica in ["p50_ms", "p95_ms", "p99_ms", "vazao_rps"]:
+                va, vb = rotas_a[rota].get(metrica), rotas_b[rota].get(metrica)
+                variacoes.append(f"{(vb - va) / va * 100:+7.1f}%" if va and vb is not None else f"{'-':>8s}")
+            print(f"   {rota:<38s} {' '.join(variacoes)}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "comparar":
+        comparar(sys.argv[2], sys.argv[3])
+        sys.exit(0)
+
+    tamanhos = [ler_tamanho(t) for t in (sys.argv[1] if len(sys.argv) > 1 else "33k").split(",")]
+    saida = sys.argv[2] if len(sys.argv) > 2 else "benchmark_api.json"
+
+    print("=" * 80)
+    print("BENCHMARK - API Flask (gunicorn) com bases sintéticas")
+    print("=" * 80)
+    print(f"Tamanhos: {', '.join(f'{n:,}' for n in tamanhos)} | clientes: {BENCH_CLIENTES} | "
+          f"requisições/cliente/rota: {BENCH_REQUISICOES} | workers: {BENCH_WORKERS}")
+
+    relatorio = {
+        "commit": versao_codigo(),
+        "data": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "ambiente": {"python": platform.python_version(), "nucleos": os.cpu_count(),
+                     "plataforma": platform.platform()},
+        "config": {"clientes": BENCH_CLIENTES, "requisicoes_por_cliente": BENCH_REQUISICOES,
+                   "workers": BENCH_WORKERS, "seed": SEED, "base": BENCH_BASE},
+        "resultados": {str(n): medir_tamanho(n) for n in tamanhos},
+    }
+
+    temporario = saida + ".tmp"
+    with open(temporario, "w") as f:
+        json.dump(relatorio, f, indent=2, sort_keys=True, ensure_ascii=False)
+    os.replace(temporario, saida)
+    print(f"\n💾 Relatório: {saida}")
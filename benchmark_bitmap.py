@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Benchmark do índice de bitmaps (indice_bitmap.py) contra máscaras do pandas.
+
+Sobre uma base sintética de N linhas (a mesma do benchmark_api.py), cada
+filtro é respondido de duas formas:
+- pandas: uma máscara booleana por condição sobre o DataFrame inteiro,
+  df[mascara] (cópia das linhas) e value_counts por gráfico, como o
+  /api/data/filtered fazia antes do cubo
+- bitmaps: AND/OR/NOT de bitmaps e popcount por categoria
+
+Mede a seleção sozinha (contagem de linhas) e o payload completo, confere
+que as duas formas selecionam as mesmas linhas e o mesmo resumo, e sai
+com código 1 se alguma divergir.
+
+Uso:
+    python benchmark_bitmap.py [n_linhas]
+"""
+
+import statistics
+import sys
+import time
+
+import numpy as np
+
+from benchmark_api import gerar_base_sintetica
+from dados import carregar_dataset, derivar_features
+from indice_bitmap import IndiceBitmap
+from sinan_sintetico import ler_tamanho
+
+N_LINHAS = ler_tamanho(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+REPETICOES = 15
+
+FILTROS = {
+    "dashboard (ano, fenômeno, sexo)": {
+        "anoInicial": 2010, "anoFinal": 2020, "fenomeno": "El Niño", "sexo": "F"},
+    "3 sintomas": {"FEBRE": "SIM", "MIALGIA": "SIM", "CEFALEIA": "SIM"},
+    "comorbidades (OU)": {"ou": [{"DIABETES": "SIM"}, {"RENAL": "SIM"}, {"HEPATOPAT": "SIM"}]},
+    "raça + idosos + hospitalizados": {
+        "CS_RACA": ["PRETA", "PARDA"], "faixa_etaria": ["61-70", "71-80", "81-90", "90+"],
+        "HOSPITALIZ": "SIM"},
+    "aninhado com NÃO": {
+        "INTENS_FENOM": ["FORTE", "MUITO FORTE"], "nao": {"FENOMENO": "Neutro"},
+        "ou": [{"FEBRE": "SIM", "EXANTEMA": "SIM"}, {"PETEQUIA_N": "SIM"}]},
+}
+
+APELIDOS = {"fenomeno": "FENOMENO", "sexo": "CS_SEXO"}
+
+
+# --- Referência: máscaras do pandas ---
+
+def mascara_pandas(df, filtro):
+    '''Uma passada booleana sobre o DataFrame inteiro por condição.'''
+    mascara = np.ones(len(df), dtype=bool)
+    for chave, valor in filtro.items():
+        if chave == "ou":
+            mascara &= np.logical_or.reduce([mascara_pandas(df, parte) for parte in valor])
+        elif chave == "e":
+            mascara &= np.logical_and.reduce([mascara_pandas(df, parte) for parte in valor])
+        elif chave == "nao":
+            mascara &= ~mascara_pandas(df, valor)
+        elif chave == "anoInicial":
+            mascara &= (df["NU_ANO"] >= int(valor)).to_numpy()
+        elif chave == "anoFinal":
+            mascara &= (df["NU_ANO"] <= int(valor)).to_numpy()
+        else:
+            valores = valor if isinstance(valor, list) else [valor]
+            mascara &= df[APELIDOS.get(chave, chave)].isin(valores).to_numpy()
+    return mascara
+
+
+def payload_pandas(df, filtro):
+    '''Cópia das linhas filtradas e value_counts por gráfico.'''
+    filtrado = df[mascara_pandas(df, filtro)]
+    total = len(filtrado)
+    return {
+        "summary": {
+            "total_casos": total,
+            "casos_hospitalizados": int((filtrado["HOSPITALIZ"] == "SIM").sum()),
+            "idade_media": round(filtrado["IDADE"].mean(), 1) if total else 0,
+        },
+        "casosPorAno": filtrado["NU_ANO"].value_counts().sort_index(),
+        "casosPorMes": filtrado["MES_NOTIFIC"].value_counts().sort_index(),
+        "distribuicaoSexo": filtrado["CS_SEXO"].value_counts(),
+        "fenomenoClimatico": filtrado["FENOMENO"].value_counts(),
+        "racaDistribution": filtrado["CS_RACA"].value_counts(),
+        "hospitalizacaoIdade": filtrado.groupby(["faixa_etaria", "HOSPITALIZ"], observed=False).size(),
+    }
+
+
+def medir(funcao):
+    '''Mediana em ms de REPETICOES chamadas (após uma de aquecimento).'''
+    funcao()
+    tempos = []
+    for _ in range(REPETICOES):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+
+print("=" * 88)
+print("BENCHMARK - Filtros multidimensionais: máscaras do pandas x índice de bitmaps")
+print("=" * 88)
+
+print(f"\n1. Base sintética de {N_LINHAS:,} linhas")
+df, _ = carregar_dataset(gerar_base_sintetica(N_LINHAS))
+derivadas = derivar_features(df)
+# A referência filtra num único DataFrame com as colunas derivadas (mês, faixa etária)
+completo = df.join(derivadas[["MES_NOTIFIC", "faixa_etaria"]])
+
+print("\n2. Construção do índice")
+inicio = time.perf_counter()
+indice = IndiceBitmap(df, derivadas)
+duracao = time.perf_counter() - inicio
+n_bitmaps = sum(len(b) for b in indice.bitmaps.values())
+tamanho = sum(b.nbytes for b in indice.bitmaps.values())
+print(f"   {n_bitmaps} bitmaps ({tamanho / 1e6:.1f} MB) em {duracao:.2f}s")
+
+print(f"\n3. Consultas (mediana de {REPETICOES} execuções, ms)")
+print(f"   {'filtro':<34s} {'linhas':>9s} | {'seleção pandas':>14s} {'bitmaps':>8s} {'ganho':>6s}"
+      f" | {'payload pandas':>14s} {'bitmaps':>8s} {'ganho':>6s}")
+iguais = True
+for nome, filtro in FILTROS.items():
+    mascara = mascara_pandas(completo, filtro)
+    referencia = payload_pandas(completo, filtro)
+    resposta = indice.consultar(filtro)
+    confere = (np.array_equal(indice.posicoes(filtro), np.flatnonzero(mascara))
+               and resposta["summary"]["total_casos"] == referencia["summary"]["total_casos"]
+               and resposta["summary"]["casos_hospitalizados"] == referencia["summary"]["casos_hospitalizados"]
+               and resposta["summary"]["idade_media"] == referencia["summary"]["idade_media"])
+    iguais &= confere
+
+    selecao_pandas = medir(lambda: len(completo[mascara_pandas(completo, filtro)]))
+    selecao_bitmap = medir(lambda: indice.contar(filtro))
+    payload_pd = medir(lambda: payload_pandas(completo, filtro))
+    payload_bitmap = medir(lambda: indice.consultar(filtro))
+    print(f"   {'✅' if confere else '❌'} {nome:<31s} {int(mascara.sum()):>9,} | "
+          f"{selecao_pandas:14.2f} {selecao_bitmap:8.2f} {selecao_pandas / selecao_bitmap:5.1f}x | "
+          f"{payload_pd:14.2f} {payload_bitmap:8.2f} {payload_pd / payload_bitmap:5.1f}x")
+
+print(f"\n4. {'✅' if iguais else '❌'} Bitmaps e pandas selecionam as mesmas linhas")
+print("\n" + "=" * 88)
+sys.exit(0 if iguais else 1)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmark do módulo de features (features_modelo.py).
+
+Gera N registros brutos no formato do SINAN (sintomas SIM/NÃO/IGNORADO,
+comorbidades, datas e idade), mede linhas/s de montar_matriz (caminho
+vetorizado) e de montar_vetor (caminho escalar, 1 paciente) e confere que
+os dois produzem a mesma matriz.
+
+Uso:
+    python benchmark_features.py [n_linhas]
+"""
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from features_modelo import CAMPOS_BINARIOS, MODEL_FEATURES, montar_matriz, montar_vetor
+
+N_LINHAS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+N_ESCALAR = min(N_LINHAS, 20_000)
+
+
+def gerar_registros(n, seed=42):
+    '''Registros sintéticos com a mesma forma do CSV do SINAN.'''
+    rng = np.random.default_rng(seed)
+    dados = {
+        campo: rng.choice(np.array(["SIM", "NÃO", "IGNORADO"], dtype=object), n, p=[0.3, 0.6, 0.1])
+        for campo in CAMPOS_BINARIOS
+    }
+    notificacao = np.datetime64("2015-01-01") + rng.integers(0, 3650, n).astype("timedelta64[D]")
+    sintomas = notificacao - rng.integers(0, 15, n).astype("timedelta64[D]")
+    dados["DT_NOTIFIC"] = np.datetime_as_string(notificacao).astype(object)
+    dados["DT_SIN_PRI"] = np.datetime_as_string(sintomas).astype(object)
+    dados["IDADE"] = rng.integers(0, 95, n).astype(float)
+    return pd.DataFrame(dados)
+
+
+print("=" * 60)
+print("BENCHMARK - Features do modelo (features_modelo.py)")
+print("=" * 60)
+
+print(f"\n1. Gerando {N_LINHAS:,} registros brutos...")
+df = gerar_registros(N_LINHAS)
+
+print("\n2. montar_matriz (vetorizado)")
+inicio = time.perf_counter()
+X = montar_matriz(df)
+duracao = time.perf_counter() - inicio
+print(f"   Matriz {X.shape[0]:,} x {X.shape[1]} em {duracao:.2f}s: {N_LINHAS / duracao:,.0f} linhas/s")
+
+print(f"\n3. montar_vetor (1 paciente por chamada, {N_ESCALAR:,} chamadas)")
+registros = df.head(N_ESCALAR).to_dict("records")
+inicio = time.perf_counter()
+X_escalar = np.vstack([montar_vetor(r) for r in registros])
+duracao = time.perf_counter() - inicio
+print(f"   {N_ESCALAR / duracao:,.0f} linhas/s ({duracao / N_ESCALAR * 1e6:.1f} µs por paciente)")
+
+iguais = np.array_equal(X[:N_ESCALAR], X_escalar)
+print(f"\n4. {'✅' if iguais else '❌'} Caminhos vetorizado e escalar idênticos")
+for j, feature in enumerate(MODEL_FEATURES):
+    print(f"   {feature:<26s} média: {X[:, j].mean():10.3f}")
+
+print("\n" + "=" * 60)
+sys.exit(0 if iguais else 1)
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Vazão x latência de cauda do /api/predict com micro-lotes (servico_async.py).
+
+Sobe o gunicorn uma vez por configuração, sobre a mesma base sintética do
+benchmark_api.py:
+- "flask": app Flask com workers síncronos (referência)
+- "async janela=J maximo=M": servico_async.py com worker ASGI (uvicorn),
+  MICROLOTE_JANELA_MS=J e MICROLOTE_MAXIMO=M
+
+Em cada uma, BENCH_CLIENTES clientes asyncio (uma conexão keep-alive cada,
+em ciclo fechado: o próximo pedido só sai depois da resposta) mandam
+BENCH_REQUISICOES pedidos ao /api/predict. O relatório traz p50/p95/p99,
+vazão e, no serviço assíncrono, o tamanho médio dos lotes formados
+(GET /api/microlote; com mais de um worker, é o de um deles).
+
+Uso:
+    python benchmark_microlote.py [relatorio.json]
+
+Variáveis de ambiente:
+    BENCH_CLIENTES      conexões concorrentes (padrão 32)
+    BENCH_REQUISICOES   pedidos por conexão em cada configuração (padrão 200)
+    BENCH_WORKERS       workers do gunicorn (padrão 1)
+    BENCH_LINHAS        linhas da base sintética (padrão 33k)
+    BENCH_JANELAS_MS    janelas testadas (padrão 0,1,2,5)
+    BENCH_MAXIMOS       tamanhos máximos de lote testados (padrão 8,64)
+"""
+
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+from benchmark_api import (
+    gerar_base_sintetica, parar_servidor, porta_livre, requisicoes_rota,
+    subir_servidor, versao_codigo
+)
+from sinan_sintetico import ler_tamanho
+
+BENCH_CLIENTES = int(os.getenv("BENCH_CLIENTES", "32"))
+BENCH_REQUISICOES = int(os.getenv("BENCH_REQUISICOES", "200"))
+BENCH_WORKERS = int(os.getenv("BENCH_WORKERS", "1"))
+BENCH_LINHAS = ler_tamanho(os.getenv("BENCH_LINHAS", "33k"))
+BENCH_JANELAS_MS = [float(j) for j in os.getenv("BENCH_JANELAS_MS", "0,1,2,5").split(",")]
+BENCH_MAXIMOS = [int(m) for m in os.getenv("BENCH_MAXIMOS", "8,64").split(",")]
+
+WORKER_ASGI = "uvicorn.workers.UvicornWorker"
+
+
+# --- Cliente HTTP/1.1 mínimo (asyncio, keep-alive) ---
+
+class Conexao:
+    '''Conexão keep-alive; reabre quando o servidor responde "Connection: close" (worker síncrono).'''
+
+    def __init__(self, porta):
+        self.porta = porta
+        self.leitor = self.escritor = None
+
+    async def pedir(self, metodo, rota, corpo=b""):
+        if self.escritor is None:
+            self.leitor, self.escritor = await asyncio.open_connection("127.0.0.1", self.porta)
+        self.escritor.write(f"{metodo} {rota} HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+                            f"Content-Type: application/json\r\nContent-Length: {len(corpo)}\r\n\r\n"
+                            .encode() + corpo)
+        await self.escritor.drain()
+        linhas = (await self.leitor.readuntil(b"\r\n\r\n")).decode("latin-1").lower().split("\r\n")
+        cabecalhos = dict(linha.split(": ", 1) for linha in linhas[1:] if ": " in linha)
+        resposta = await self.leitor.readexactly(int(cabecalhos["content-length"]))
+        if cabecalhos.get("connection") == "close":
+            self.fechar()
+        return int(linhas[0].split()[1]), resposta
+
+    def fechar(self):
+        if self.escritor is not None:
+            self.escritor.close()
+            self.leitor = self.escritor = None
+
+
+async def _cliente(porta, pedidos, latencias, erros):
+    conexao = Conexao(porta)
+    try:
+        for _, corpo in pedidos:
+            inicio = time.perf_counter()
+            status, _ = await conexao.pedir("POST", "/api/predict", corpo.encode())
+            if status != 200:
+                erros.append(status)
+                continue
+            latencias.append(time.perf_counter() - inicio)
+    finally:
+        conexao.fechar()
+
+
+async def _consultar(porta, rota):
+    conexao = Conexao(porta)
+    try:
+        status, corpo = await conexao.pedir("GET", rota)
+        return json.loads(corpo) if status == 200 else None
+    finally:
+        conexao.fechar()
+
+
+async def _carga(porta, clientes, requisicoes):
+    # Aquecimento (alguns pedidos por conexão, fora da medição)
+    await asyncio.gather(*[_cliente(porta, requisicoes_rota("/api/predict", 5, c), [], [])
+                           for c in range(clientes)])
+    antes = await _consultar(porta, "/api/microlote")
+
+    latencias, erros = [], []
+    inicio = time.perf_counter()
+    await asyncio.gather(*[_cliente(porta, requisicoes_rota("/api/predict", requisicoes, c),
+                                    latencias, erros)
+                           for c in range(clientes)])
+    duracao = time.perf_counter() - inicio
+    depois = await _consultar(porta, "/api/microlote")
+
+    ms = np.array(latencias) * 1000
+    resultado = {
+        "requisicoes": len(latencias) + len(erros),
+        "erros": len(erros),
+        "vazao_rps": round(len(latencias) / duracao, 1),
+    }
+    if len(ms):
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        resultado.update({"p50_ms": round(p50, 3), "p95_ms": round(p95, 3), "p99_ms": round(p99, 3),
+                          "max_ms": round(ms.max(), 3)})
+    if antes is not None and depois is not None and depois["pid"] == antes["pid"]:
+        lotes = depois["lotes"] - antes["lotes"]
+        if lotes:
+            resultado["tamanho_medio_lote"] = round((depois["predicoes"] - antes["predicoes"]) / lotes, 2)
+            resultado["maior_lote"] = depois["maior_lote"]
+    return resultado
+
+
+def medir_configuracao(caminho, aplicacao, variaveis=None):
+    porta = porta_livre()
+    processo, _ = subir_servidor(caminho, porta, workers=BENCH_WORKERS,
+                                 aplicacao=aplicacao, variaveis=variaveis)
+    try:
+        return asyncio.run(_carga(porta, BENCH_CLIENTES, BENCH_REQUISICOES))
+    finally:
+        parar_servidor(processo)
+
+
+def configuracoes():
+    yield "flask", ("app:app",), None
+    for janela in BENCH_JANELAS_MS:
+        for maximo in BENCH_MAXIMOS:
+            yield (f"async janela={janela:g}ms maximo={maximo}",
+                   ("-k", WORKER_ASGI, "servico_async:app"),
+                   {"MICROLOTE_JANELA_MS": str(janela), "MICROLOTE_MAXIMO": str(maximo)})
+
+
+if __name__ == "__main__":
+    saida = sys.argv[1] if len(sys.argv) > 1 else "benchmark_microlote.json"
+
+    print("=" * 80)
+    print("BENCHMARK - /api/predict: Flask síncrono x serviço assíncrono com micro-lotes")
+    print("=" * 80)
+    print(f"Base: {BENCH_LINHAS:,} linhas | clientes: {BENCH_CLIENTES} | "
+          f"pedidos/cliente: {BENCH_REQUISICOES} | workers: {BENCH_WORKERS}")
+    caminho = gerar_base_sintetica(BENCH_LINHAS)
+
+    resultados = {}
+    for nome, aplicacao, variaveis in configuracoes():
+        resultados[nome] = r = medir_configuracao(caminho, aplicacao, variaveis)
+        lote = f" | lote médio {r['tamanho_medio_lote']:6.2f}" if "tamanho_medio_lote" in r else ""
+        print(f"   {nome:<32s} p50 {r.get('p50_ms', float('nan')):7.2f} ms | "
+              f"p99 {r.get('p99_ms', float('nan')):7.2f} ms | {r['vazao_rps']:8.1f} req/s{lote}"
+              + (f" | ❌ {r['erros']} erros" if r["erros"] else ""))
+
+    relatorio = {
+        "commit": versao_codigo(),
+        "data": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "ambiente": {"python": platform.python_version(), "nucleos": os.cpu_count(),
+                     "plataforma": platform.platform()},
+        "config": {"clientes": BENCH_CLIENTES, "requisicoes_por_cliente": BENCH_REQUISICOES,
+                   "workers": BENCH_WORKERS, "linhas": BENCH_LINHAS},
+        "resultados": resultados,
+    }
+
+    temporario = saida + ".tmp"
+    with open(temporario, "w") as f:
+        json.dump(relatorio, f, indent=2, sort_keys=True, ensure_ascii=False)
+    os.replace(temporario, saida)
+    print(f"\n💾 Relatório: {saida}")
@@ -0,0 +1,327 @@
+'''
+Cubo de agregados pré-computado para o dashboard de Sertãozinho.
+
+O cubo é construído uma única vez na carga do dataset. Cada célula guarda,
+para uma combinação de (NU_ANO, FENOMENO, CS_SEXO, mês, faixa etária,
+CS_RACA, HOSPITALIZ):
+- a quantidade de casos
+- a soma e a contagem de IDADE (para a idade média)
+
+Qualquer combinação de filtros do dashboard é respondida fatiando e somando
+esse array denso, sem varrer as linhas de df_stats e sem copiar o DataFrame.
+Notificações ingeridas depois (ingestao.py) são somadas com acrescentar(),
+sem reconstruir o cubo.
+'''
+
+import numpy as np
+import pandas as pd
+
+from dados import MESES, FAIXAS_LABELS
+
+# Ordem dos eixos do cubo
+DIMENSOES = ['NU_ANO', 'FENOMENO', 'CS_SEXO', 'MES_NOTIFIC', 'faixa_etaria', 'CS_RACA', 'HOSPITALIZ']
+EIXO = {dim: i for i, dim in enumerate(DIMENSOES)}
+
+
+def codificar(valores, categorias=None):
+    '''
+    Converte uma coluna em códigos inteiros.
+
+    Retorna (codigos, categorias). Valores ausentes recebem o último código
+    (len(categorias)), que entra nos totais mas não aparece nas distribuições,
+    assim como o value_counts() do pandas descarta NaN.
+    '''
+    if categorias is None:
+        codigos, uniques = pd.factorize(valores, sort=False)
+        categorias = list(uniques)
+    else:
+        codigos = pd.Categorical(valores, categories=categorias).codes.astype(np.int64)
+    codigos = np.where(codigos < 0, len(categorias), codigos)
+    return codigos, categorias
+
+
+def inteiro_do_filtro(chave, valor):
+    '''Valor numérico de um filtro (anoInicial, anoFinal, ano, mês) como inteiro.
+
+    Listas, objetos, textos não numéricos e números com parte fracionária
+    (2010.7) viram ValueError (400 na API).
+    '''
+    if isinstance(valor, bool) or not isinstance(valor, (str, int, float)):
+        raise ValueError(f"{chave} deve ser um número inteiro")
+    if isinstance(valor, float) and not valor.is_integer():
+        raise ValueError(f"{chave} deve ser um número inteiro")
+    try:
+        return int(valor)
+    except ValueError:
+        raise ValueError(f"{chave} deve ser um número inteiro") from None
+
+
+def categorias_fixas(dim, valores):
+    '''Categorias dos eixos ordenados (anos, meses, faixas) em ordem crescente; None nos demais.'''
+    if dim == 'NU_ANO':
+        return sorted(valores.dropna().unique().tolist())
+    if dim == 'MES_NOTIFIC':
+        return list(range(1, 13))
+    if dim == 'faixa_etaria':
+        return FAIXAS_LABELS
+    return None
+
+
+def mesclar_categorias(dim, atuais, valores):
+    '''
+    Categorias de `dim` depois de acrescentar `valores`: anos em ordem
+    crescente, as demais categorias novas no fim, na ordem em que aparecem,
+    como se o eixo fosse construído do zero com todas as linhas.
+    '''
+    if dim == 'NU_ANO':
+        return sorted(set(atuais) | set(valores.dropna().unique().tolist()))
+    if dim in ('MES_NOTIFIC', 'faixa_etaria'):
+        return atuais
+    vistos = set(atuais)
+    return atuais + [v for v in pd.unique(valores.dropna()) if v not in vistos]
+
+
+def _colunas(df, derivadas):
+    return {
+        'NU_ANO': df['NU_ANO'],
+        'FENOMENO': df['FENOMENO'],
+        'CS_SEXO': df['CS_SEXO'],
+        'MES_NOTIFIC': derivadas['MES_NOTIFIC'],
+        'faixa_etaria': derivadas['faixa_etaria'],
+        'CS_RACA': df['CS_RACA'],
+        'HOSPITALIZ': df['HOSPITALIZ'],
+    }
+
+
+def _somar(codigos, shape, idade):
+    '''(casos, soma_idade, n_idade) das linhas com os códigos dados, no formato `shape`.'''
+    indice = np.ravel_multi_index(codigos, shape)
+    tamanho = int(np.prod(shape))
+    idade = idade.to_numpy(dtype=float)
+    idade_valida = ~np.isnan(idade)
+
+    casos = np.bincount(indice, minlength=tamanho).astype(np.int32).reshape(shape)
+    soma_idade = np.bincount(
+        indice, weights=np.where(idade_valida, idade, 0.0), minlength=tamanho
+    ).reshape(shape)
+    n_idade = np.bincount(
+        indice, weights=idade_valida, minlength=tamanho
+    ).astype(np.int32).reshape(shape)
+    return casos, soma_idade, n_idade
+
+
+class CuboAgregado:
+    '''Agregados de df_stats indexados pelas 7 dimensões do dashboard.'''
+
+    def __init__(self, df, derivadas):
+        '''`derivadas` é a camada de dados.derivar_features (mês e faixa etária).'''
+        colunas = _colunas(df, derivadas)
+        codigos = []
+        self.categorias = {}
+        for dim in DIMENSOES:
+            cod, cats = codificar(colunas[dim], categorias_fixas(dim, colunas[dim]))
+            codigos.append(cod)
+            self.categorias[dim] = cats
+
+        # +1 em cada eixo para o slot de valores ausentes
+        self.shape = tuple(len(self.categorias[dim]) + 1 for dim in DIMENSOES)
+        self.casos, self.soma_idade, self.n_idade = _somar(codigos, self.shape, df['IDADE'])
+        self._congelar()
+
+    def _congelar(self):
+        # Somente leitura: com o preload do gunicorn as páginas ficam compartilhadas entre workers
+        for array in (self.casos, self.soma_idade, self.n_idade):
+            array.flags.writeable = False
+
+    def acrescentar(self, df, derivadas):
+        '''
+        Novo cubo com as linhas de `df` somadas às já agregadas (ingestão incremental).
+
+        O custo é proporcional às linhas novas e ao número de células, não ao
+        dataset inteiro. Valores que o cubo ainda não tinha (um ano novo, um
+        fenômeno novo) ganham uma posição no eixo (mesclar_categorias). O
+        cubo atual não muda (requests em andamento continuam lendo o snapshot anterior).
+        '''
+        colunas = _colunas(df, derivadas)
+        categorias, mapas = {}, []
+        for dim in DIMENSOES:
+            atuais = self.categorias[dim]
+            cats = mesclar_categorias(dim, atuais, colunas[dim])
+            categorias[dim] = cats
+            # posição de cada índice atual (inclusive o slot de ausentes) no novo eixo
+            posicoes = {valor: i for i, valor in enumerate(cats)}
+            mapas.append(np.array([posicoes[valor] for valor in atuais] + [len(cats)]))
+
+        novo = object.__new__(CuboAgregado)
+        novo.categorias = categorias
+        novo.shape = tuple(len(categorias[dim]) + 1 for dim in DIMENSOES)
+        codigos = [codificar(colunas[dim], categorias[dim])[0] for dim in DIMENSOES]
+        acrescimos = _somar(codigos, novo.shape, df['IDADE'])
+        selecao = np.ix_(*mapas)
+        for nome, acrescimo in zip(('casos', 'soma_idade', 'n_idade'), acrescimos):
+            atual = getattr(self, nome)
+            if novo.shape != self.shape:
+                expandido = np.zeros(novo.shape, dtype=atual.dtype)
+                expandido[selecao] = atual
+                atual = expandido
+            setattr(novo, nome, atual + acrescimo)
+        novo._congelar()
+        return novo
+
+    # --- Consulta ---
+
+    def _fatias(self, filtros):
+        '''Traduz o JSON de filtros do dashboard em índices por eixo.'''
+        fatias = [slice(None)] * len(DIMENSOES)
+
+        anos = np.array(self.categorias['NU_ANO'], dtype=float)
+        selecao_anos = np.ones(len(anos), dtype=bool)
+        filtra_ano = False
+        if filtros.get('anoInicial'):
+            selecao_anos &= anos >= inteiro_do_filtro('anoInicial', filtros['anoInicial'])
+            filtra_ano = True
+        if filtros.get('anoFinal'):
+            selecao_anos &= anos <= inteiro_do_filtro('anoFinal', filtros['anoFinal'])
+            filtra_ano = True
+        if filtra_ano:
+            # O slot de ano ausente nunca satisfaz uma comparação
+            fatias[EIXO['NU_ANO']] = np.flatnonzero(selecao_anos)
+
+        for chave, dim in (('fenomeno', 'FENOMENO'), ('sexo', 'CS_SEXO')):
+            valor = filtros.get(chave)
+            if valor:
+                cats = self.categorias[dim]
+                fatias[EIXO[dim]] = [cats.index(valor)] if valor in cats else []
+        return fatias
+
+    def _recorte(self, filtros):
+        '''
+        Aplica os filtros eixo a eixo com np.take.
+
+        Retorna o sub-cubo de casos, a soma e a contagem de idades, e os
+        índices originais mantidos em cada eixo (None = eixo inteiro).
+        '''
+        casos, soma, n = self.casos, self.soma_idade, self.n_idade
+        indices = []
+        for eixo, fatia in enumerate(self._fatias(filtros)):
+            if isinstance(fatia, slice):
+                indices.append(None)
+                continue
+            casos = np.take(casos, fatia, axis=eixo)
+            soma = np.take(soma, fatia, axis=eixo)
+            n = np.take(n, fatia, axis=eixo)
+            indices.append(np.asarray(fatia, dtype=np.int64))
+        return casos, soma, n, indices
+
+    def _marginal(self, casos, indices, dim):
+        '''Soma o sub-cubo em todos os eixos exceto `dim`, no tamanho original do eixo.'''
+        eixo = EIXO[dim]
+        eixos = tuple(i for i in range(len(DIMENSOES)) if i != eixo)
+        parcial = casos.sum(axis=eixos)
+        if indices[eixo] is None:
+            return parcial
+        total = np.zeros(self.shape[eixo], dtype=parcial.dtype)
+        total[indices[eixo]] = parcial
+        return total
+
+    def consultar(self, filtros):
+        '''Retorna o payload completo do /api/data/filtered.'''
+        casos, soma, n, indices = self._recorte(filtros)
+        marginais = {dim: self._marginal(casos, indices, dim) for dim in DIMENSOES_PAYLOAD}
+
+        # Faixa etária x hospitalização (todas as faixas, inclusive vazias, como no pd.cut)
+        eixos = tuple(i for i in range(len(DIMENSOES))
+                      if i not in (EIXO['faixa_etaria'], EIXO['HOSPITALIZ']))
+        faixa_hosp = casos.sum(axis=eixos)
+        if indices[EIXO['HOSPITALIZ']] is not None:
+            completo = np.zeros((faixa_hosp.shape[0], self.shape[EIXO['HOSPITALIZ']]), dtype=faixa_hosp.dtype)
+            completo[:, indices[EIXO['HOSPITALIZ']]] = faixa_hosp
+            faixa_hosp = completo
+
+        return montar_payload(self.categorias, int(casos.sum()), marginais, faixa_hosp,
+                              float(soma.sum()), int(n.sum()))
+
+
+# Dimensões com uma série própria no payload do /api/data/filtered
+DIMENSOES_PAYLOAD = ['NU_ANO', 'MES_NOTIFIC', 'CS_SEXO', 'FENOMENO', 'CS_RACA', 'HOSPITALIZ']
+
+
+def _contagens(categorias, totais):
+    '''Equivalente a value_counts(): ordena por contagem decrescente.'''
+    totais = totais[:len(categorias)]
+    ordem = np.argsort(-totais, kind='stable')
+    ordem = [i for i in ordem if totais[i] > 0]
+    return [categorias[i] for i in ordem], [int(totais[i]) for i in ordem]
+
+
+def montar_payload(categorias, total_casos, marginais, faixa_hosp, soma_idade, n_idade):
+    '''
+    Payload do /api/data/filtered a partir das contagens de uma seleção.
+
+    `marginais` traz, para cada dimensão de DIMENSOES_PAYLOAD, os casos por
+    categoria (na ordem de `categorias`; posições além delas são
+    ignoradas) e `faixa_hosp`, os casos por faixa etária x HOSPITALIZ.
+    Usado pelo cubo e pelo índice de bitmaps (indice_bitmap.py), que assim
+    respondem no mesmo formato e com os mesmos desempates.
+    '''
+    # Summary
+    cats_hosp = categorias['HOSPITALIZ']
+    hosp_totais = marginais['HOSPITALIZ']
+    casos_hospitalizados = int(hosp_totais[cats_hosp.index('SIM')]) if 'SIM' in cats_hosp else 0
+    taxa_hospitalizacao = (casos_hospitalizados / total_casos) * 100 if total_casos > 0 else 0
+    idade_media = round(soma_idade / n_idade, 1) if total_casos > 0 and n_idade > 0 else 0
+
+    summary = {
+        "total_casos": total_casos,
+        "casos_hospitalizados": casos_hospitalizados,
+        "taxa_hospitalizacao": round(taxa_hospitalizacao, 2),
+        "idade_media": idade_media
+    }
+
+    # Casos por Ano (ordenado por ano, apenas anos com casos)
+    por_ano = marginais['NU_ANO']
+    anos = [(ano, int(por_ano[i])) for i, ano in enumerate(categorias['NU_ANO']) if por_ano[i] > 0]
+    casos_por_ano_data = {
+        "anos": [int(ano) for ano, _ in anos],
+        "casos": [qtd for _, qtd in anos]
+    }
+
+    # Casos por Mês
+    por_mes = marginais['MES_NOTIFIC']
+    meses = [(i, int(por_mes[i])) for i in range(12) if por_mes[i] > 0]
+    casos_por_mes_data = {
+        "meses": [MESES[i] for i, _ in meses],
+        "casos": [qtd for _, qtd in meses]
+    }
+
+    labels, values = _contagens(categorias['CS_SEXO'], marginais['CS_SEXO'])
+    distribuicao_sexo_data = {"labels": labels, "values": values}
+
+    labels, values = _contagens(categorias['FENOMENO'], marginais['FENOMENO'])
+    fenomeno_climatico_data = {"labels": labels, "values": values}
+
+    labels, values = _contagens(categorias['CS_RACA'], marginais['CS_RACA'])
+    distribuicao_raca_data = {"labels": labels, "values": values}
+
+    # Hospitalização por Idade
+    n_faixas = len(FAIXAS_LABELS)
+    total_por_idade = faixa_hosp[:n_faixas].sum(axis=1)
+    if 'SIM' in cats_hosp:
+        hosp_por_idade = faixa_hosp[:n_faixas, cats_hosp.index('SIM')]
+    else:
+        hosp_por_idade = np.zeros(n_faixas, dtype=np.int64)
+    hospitalizacao_idade_data = {
+        "faixas": list(FAIXAS_LABELS),
+        "hospitalizados": [int(v) for v in hosp_por_idade],
+        "total": [int(v) for v in total_por_idade]
+    }
+
+    return {
+        "summary": summary,
+        "casosPorAno": casos_por_ano_data,
+        "distribuicaoSexo": distribuicao_sexo_data,
+        "casosPorMes": casos_por_mes_data,
+        "fenomenoClimatico": fenomeno_climatico_data,
+        "hospitalizacaoIdade": hospitalizacao_idade_data,
+        "racaDistribution": distribuicao_raca_data
+    }
@@ -0,0 +1,411 @@
+'''
+Carregamento do dataset de Sertãozinho: esquema compacto e cache colunar.
+
+O DataFrame carregado é compacto, guiado por ESQUEMA:
+- colunas categóricas (sexo, raça, fenômeno, sintomas SIM/NÃO/IGNORADO...)
+  viram pandas Categorical, então `df[col] == "SIM"` compara códigos inteiros
+- datas viram int32 com dias desde 1970-01-01 (ver ano_de_dias/mes_de_dias)
+- numéricas mantêm o dtype original
+
+O CSV (data/df_dengue_tratado.csv) é convertido uma vez em um pacote de
+arrays NumPy no mesmo formato, um .npy por coluna (categorias como códigos
+int8/int16/int32 + lista de categorias), que cada worker abre com mmap em
+vez de re-parsear o CSV e as datas.
+
+O manifesto guarda tamanho, mtime e SHA-256 do CSV de origem; se o CSV
+mudar, o cache é considerado vencido e o loader volta a ler o CSV.
+
+Construir o cache (passo de build):
+    python dados.py [caminho_csv]
+'''
+
+import hashlib
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# CSV_DADOS permite apontar o app para outro arquivo (ex.: base sintética do benchmark_api.py)
+CSV_PATH = os.getenv("CSV_DADOS", "data/df_dengue_tratado.csv")
+
+# Colunas de data do SINAN
+COLUNAS_DATA = ["DT_NOTIFIC", "DT_SIN_PRI"]
+
+# Campos SIM/NÃO/IGNORADO
+SINTOMAS = ["FEBRE", "MIALGIA", "CEFALEIA", "VOMITO", "EXANTEMA", "PETEQUIA_N"]
+COMORBIDADES = ["DIABETES", "HEMATOLOG", "HEPATOPAT", "RENAL"]
+
+# Tipo de cada coluna conhecida do dataset tratado. Colunas de texto fora do
+# esquema também viram categoria quando têm poucos valores distintos.
+ESQUEMA = {
+    "DT_NOTIFIC": "data",
+    "DT_SIN_PRI": "data",
+    "IDADE": "numero",
+    "CS_SEXO": "categoria",
+    "CS_RACA": "categoria",
+    "FENOMENO": "categoria",
+    "INTENS_FENOM": "categoria",
+    "HOSPITALIZ": "categoria",
+    **{coluna: "categoria" for coluna in SINTOMAS + COMORBIDADES},
+}
+
+# Rótulos dos meses e faixas etárias usados nos gráficos do dashboard
+MESES = ["Jan", "Fev", "Mar", "Abr", "Mai", "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez"]
+FAIXAS_BINS = [0, 10, 20, 30, 40, 50, 60, 70, 80, 90, 120]
+FAIXAS_LABELS = ['0-10', '11-20', '21-30', '31-40', '41-50', '51-60', '61-70', '71-80', '81-90', '90+']
+
+# Fração máxima de valores distintos para converter texto fora do esquema em categoria
+MAX_FRACAO_CATEGORIAS = 0.5
+
+# Versão do formato do pacote (mudar invalida caches antigos)
+VERSAO_FORMATO = 2
+
+# Marca de data ausente nas colunas de data (int32)
+DATA_AUSENTE = np.iinfo(np.int32).min
+
+
+def assinatura_arquivo(path):
+    '''(tamanho, mtime_ns) do arquivo, ou None se não existir: detecta troca do CSV sem lê-lo.'''
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def caminho_cache(csv_path):
+    '''Diretório do cache colunar ao lado do CSV (ex.: data/df_dengue_tratado.cache/).'''
+    return os.path.splitext(csv_path)[0] + ".cache"
+
+
+def checksum_arquivo(path, tamanho_bloco=1 << 20):
+    '''SHA-256 do arquivo, lido em blocos.'''
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def _dtype_codigos(n_categorias):
+    '''Menor inteiro com sinal que comporta os códigos (-1 = ausente).'''
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categorias < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def datas_para_dias(serie):
+    '''Converte uma coluna de datas em int32 (dias desde 1970-01-01; ausente = DATA_AUSENTE).'''
+    datas = pd.to_datetime(serie)
+    dias = datas.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]").astype(np.int64)
+    dias[datas.isna().to_numpy()] = DATA_AUSENTE
+    return dias.astype(np.int32)
+
+
+def dias_para_datas(dias):
+    '''Inverso de datas_para_dias: DatetimeIndex com NaT nas datas ausentes.'''
+    dias = np.asarray(dias, dtype=np.int64)
+    datas = dias.astype("datetime64[D]").astype("datetime64[ns]")
+    datas[dias == DATA_AUSENTE] = np.datetime64("NaT")
+    return pd.DatetimeIndex(datas)
+
+
+def ano_de_dias(dias):
+    '''Ano de cada data em dias (int16; float com NaN se houver datas ausentes).'''
+    anos = dias_para_datas(dias).year
+    return anos.to_numpy(dtype=np.int16) if not anos.hasnans else anos.to_numpy(dtype=float)
+
+
+def mes_de_dias(dias):
+    '''Mês (1-12) de cada data em dias (int8; float com NaN se houver datas ausentes).'''
+    meses = dias_para_datas(dias).month
+    return meses.to_numpy(dtype=np.int8) if not meses.hasnans else meses.to_numpy(dtype=float)
+
+
+def _tipo_coluna(nome, serie):
+    '''Tipo da coluna segundo ESQUEMA, com inferência para colunas desconhecidas.'''
+    if nome in ESQUEMA:
+        return ESQUEMA[nome]
+    if pd.api.types.is_numeric_dtype(serie) or pd.api.types.is_bool_dtype(serie):
+        return "numero"
+    if serie.nunique(dropna=True) <= MAX_FRACAO_CATEGORIAS * max(len(serie), 1):
+        return "categoria"
+    return "texto"
+
+
+def compactar(df):
+    '''Aplica ESQUEMA a um DataFrame lido do CSV: categorias e datas em dias int32.'''
+    compacto = {}
+    for nome in df.columns:
+        serie = df[nome]
+        tipo = _tipo_coluna(nome, serie)
+        if tipo == "data":
+            compacto[nome] = datas_para_dias(serie)
+        elif tipo == "categoria":
+            codigos, categorias = pd.factorize(serie, sort=True)
+            compacto[nome] = pd.Categorical.from_codes(codigos, categories=categorias)
+        else:
+            compacto[nome] = serie.to_numpy()
+    return pd.DataFrame(compacto, index=pd.RangeIndex(len(df)))
+
+
+def memoria(df):
+    '''Bytes ocupados pelo DataFrame (inclui o conteúdo das strings).'''
+    return int(df.memory_usage(deep=True).sum())
+
+
+def ler_csv(csv_path):
+    '''Leitura do CSV (caminho ou arquivo aberto) como o app sempre fez, com as datas parseadas.'''
+    df = pd.read_csv(csv_path)
+    for coluna in COLUNAS_DATA:
+        if coluna in df.columns:
+            df[coluna] = pd.to_datetime(df[coluna])
+    return df
+
+
+def construir_cache(csv_path=CSV_PATH):
+    '''Converte o CSV no pacote colunar e retorna o caminho do manifesto.'''
+    destino = caminho_cache(csv_path)
+    temporario = destino + ".tmp"
+    os.makedirs(temporario, exist_ok=True)
+
+    stat = os.stat(csv_path)
+    df = ler_csv(csv_path)
+
+    colunas = []
+    for i, nome in enumerate(df.columns):
+        serie = df[nome]
+        arquivo = f"col_{i:03d}.npy"
+        tipo = _tipo_coluna(nome, serie)
+        if tipo == "data":
+            np.save(os.path.join(temporario, arquivo), datas_para_dias(serie))
+            colunas.append({"nome": nome, "tipo": "data", "arquivo": arquivo})
+        elif tipo == "categoria":
+            codigos, categorias = pd.factorize(serie, sort=True)
+            codigos = codigos.astype(_dtype_codigos(len(categorias)))
+            np.save(os.path.join(temporario, arquivo), codigos)
+            colunas.append({"nome": nome, "tipo": "categoria", "arquivo": arquivo,
+                            "categorias": categorias.tolist()})
+        elif tipo == "numero":
+            np.save(os.path.join(temporario, arquivo), serie.to_numpy())
+            colunas.append({"nome": nome, "tipo": "numero", "arquivo": arquivo})
+        else:
+            # Texto livre de alta cardinalidade: guardado como objeto (sem mmap)
+            np.save(os.path.join(temporario, arquivo), serie.to_numpy(dtype=object), allow_pickle=True)
+            colunas.append({"nome": nome, "tipo": "texto", "arquivo": arquivo})
+
+    manifesto = {
+        "versao_formato": VERSAO_FORMATO,
+        "origem": {
+            "arquivo": os.path.basename(csv_path),
+            "tamanho": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": checksum_arquivo(csv_path),
+        },
+        "n_linhas": len(df),
+        "colunas": colunas,
+    }
+    with open(os.path.join(temporario, "manifesto.json"), "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, indent=2, ensure_ascii=False)
+
+    # Publica o pacote inteiro de uma vez: leitores nunca veem um cache pela metade
+    if os.path.isdir(destino):
+        antigo = destino + ".old"
+        os.replace(destino, antigo)
+        os.replace(temporario, destino)
+        for nome in os.listdir(antigo):
+            os.remove(os.path.join(antigo, nome))
+        os.rmdir(antigo)
+    else:
+        os.replace(temporario, destino)
+    return os.path.join(destino, "manifesto.json")
+
+
+def ler_manifesto(csv_path=CSV_PATH):
+    '''Manifesto do cache, ou None se não existir.'''
+    caminho = os.path.join(caminho_cache(csv_path), "manifesto.json")
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def cache_atualizado(manifesto, csv_path=CSV_PATH):
+    '''
+    O cache corresponde ao CSV atual?
+
+    Tamanho e mtime iguais bastam (checagem barata); se o mtime mudou mas o
+    tamanho não, compara o SHA-256 para não rejeitar um CSV apenas "tocado".
+    '''
+    if manifesto is None or manifesto.get("versao_formato") != VERSAO_FORMATO:
+        return False
+    if not os.path.exists(csv_path):
+        # Sem o CSV, o cache é a única fonte disponível
+        return True
+    origem = manifesto["origem"]
+    stat = os.stat(csv_path)
+    if stat.st_size != origem["tamanho"]:
+        return False
+    if stat.st_mtime_ns == origem["mtime_ns"]:
+        return True
+    return checksum_arquivo(csv_path) == origem["sha256"]
+
+
+def carregar_cache(csv_path=CSV_PATH, manifesto=None):
+    '''Monta o DataFrame compacto a partir do pacote colunar (arrays abertos com mmap).'''
+    manifesto = manifesto or ler_manifesto(csv_path)
+    pasta = caminho_cache(csv_path)
+
+    dados = {}
+    for coluna in manifesto["colunas"]:
+        caminho = os.path.join(pasta, coluna["arquivo"])
+        if coluna["tipo"] == "texto":
+            dados[coluna["nome"]] = np.load(caminho, allow_pickle=True)
+            continue
+        valores = np.load(caminho, mmap_mode="r")
+        if coluna["tipo"] == "categoria":
+            # Códigos já estão no formato do pandas (-1 = ausente)
+            dados[coluna["nome"]] = pd.Categorical.from_codes(
+                np.asarray(valores), categories=coluna["categorias"]
+            )
+        else:
+            dados[coluna["nome"]] = valores
+    # copy=False mantém as colunas apontando para o mmap: os workers do gunicorn
+    # compartilham as mesmas páginas do arquivo em vez de copiar o dataset
+    return pd.DataFrame(dados, index=pd.RangeIndex(manifesto["n_linhas"]), copy=False)
+
+
+def carregar_dataset(csv_path=CSV_PATH):
+    '''
+    Carrega o dataset de estatísticas compacto, usando o cache colunar quando válido.
+
+    Retorna (df, info) onde info traz "origem" ("cache" ou "csv"),
+    "versao" (SHA-256 do CSV de origem), "assinatura" (tamanho e mtime do
+    CSV no momento da carga), "memoria_antes" (bytes do DataFrame lido do
+    CSV, None quando veio do cache) e "memoria_depois". Levanta
+    FileNotFoundError se nem o CSV nem o cache existirem.
+    '''
+    assinatura = assinatura_arquivo(csv_path)
+    manifesto = ler_manifesto(csv_path)
+    if cache_atualizado(manifesto, csv_path):
+        df = carregar_cache(csv_path, manifesto)
+        info = {"origem": "cache", "versao": manifesto["origem"]["sha256"], "memoria_antes": None}
+    else:
+        bruto = ler_csv(csv_path)
+        info = {"origem": "csv", "versao": checksum_arquivo(csv_path), "memoria_antes": memoria(bruto)}
+        df = compactar(bruto)
+        del bruto
+    df["NU_ANO"] = ano_de_dias(df["DT_NOTIFIC"])
+    info["assinatura"] = assinatura
+    info["memoria_depois"] = memoria(df)
+    return df, info
+
+
+def derivar_features(df):
+    '''
+    Camada de features derivadas, calculada uma única vez na carga.
+
+    Retorna um DataFrame separado, alinhado ao índice de df, com as colunas
+    que os endpoints precisam (MES_NOTIFIC, faixa_etaria, HOSPITALIZADO).
+    Os arrays são marcados como somente leitura: os handlers apenas leem
+    essa camada e nunca escrevem no df compartilhado entre threads.
+    '''
+    mes = mes_de_dias(df["DT_NOTIFIC"])
+    faixa = pd.cut(df["IDADE"], bins=FAIXAS_BINS, labels=FAIXAS_LABELS, right=False)
+    hospitalizado = (df["HOSPITALIZ"] == "SIM").to_numpy(dtype=bool)
+    return _camada_derivada(mes, faixa, hospitalizado, df.index)
+
+
+def _camada_derivada(mes, faixa, hospitalizado, indice):
+    for array in (mes, hospitalizado):
+        array.flags.writeable = False
+    return pd.DataFrame({
+        "MES_NOTIFIC": mes,
+        "faixa_etaria": faixa,
+        "HOSPITALIZADO": hospitalizado,
+    }, index=indice, copy=False)
+
+
+# --- Acréscimo de linhas (ingestão incremental, ver ingestao.py) ---
+
+def anexar(df, bruto):
+    '''
+    Acrescenta ao DataFrame compacto as linhas lidas de um CSV (ler_csv).
+
+    Retorna (total, novos): `novos` tem só as linhas acrescentadas, no
+    esquema de `df` (mesmas categorias, índice continuando o de `df`).
+    Só as linhas novas são convertidas; as existentes são copiadas como
+    estão. Uma categoria nova (ex.: um valor de FENOMENO que não existia)
+    entra na lista ordenada e os códigos existentes são remapeados, então
+    o resultado é o mesmo de compactar o CSV inteiro.
+    '''
+    n_base, n_novos = len(df), len(bruto)
+    total, novos = {}, {}
+    for nome in df.columns:
+        if nome == "NU_ANO" and nome not in bruto.columns:
+            continue
+        coluna, valores = df[nome], bruto[nome]
+        if isinstance(coluna.dtype, pd.CategoricalDtype):
+            categorias = coluna.cat.categories
+            codigos = coluna.cat.codes.to_numpy()
+            extras = pd.Index(valores.dropna().unique()).difference(categorias)
+            if len(extras):
+                todas = categorias.append(extras).sort_values()
+                # -1 (ausente) continua -1: último elemento do mapa
+                codigos = np.append(todas.get_indexer(categorias), -1)[codigos]
+                categorias = todas
+            dtype = _dtype_codigos(len(categorias))
+            codigos_novos = categorias.get_indexer(valores).astype(dtype)
+            novos[nome] = pd.Categorical.from_codes(codigos_novos, categories=categorias)
+            total[nome] = pd.Categorical.from_codes(
+                np.concatenate([codigos.astype(dtype), codigos_novos]), categories=categorias)
+            continue
+        if ESQUEMA.get(nome) == "data":
+            novos[nome] = datas_para_dias(valores)
+        elif pd.api.types.is_numeric_dtype(coluna):
+            novos[nome] = pd.to_numeric(valores, errors="coerce").to_numpy()
+        else:
+            novos[nome] = valores.to_numpy(dtype=object)
+        total[nome] = np.concatenate([coluna.to_numpy(), novos[nome]])
+
+    if "NU_ANO" in df.columns and "NU_ANO" not in novos:
+        novos["NU_ANO"] = ano_de_dias(novos["DT_NOTIFIC"])
+        total["NU_ANO"] = np.concatenate([df["NU_ANO"].to_numpy(), novos["NU_ANO"]])
+
+    colunas = list(df.columns)
+    total = pd.DataFrame({nome: total[nome] for nome in colunas},
+                         index=pd.RangeIndex(n_base + n_novos), copy=False)
+    novos = pd.DataFrame({nome: novos[nome] for nome in colunas},
+                         index=pd.RangeIndex(n_base, n_base + n_novos), copy=False)
+    return total, novos
+
+
+def anexar_derivadas(derivadas, acrescimo):
+    '''Concatena à camada existente a das linhas novas (derivar_features(novos)).'''
+    return _camada_derivada(
+        np.concatenate([derivadas["MES_NOTIFIC"].to_numpy(), acrescimo["MES_NOTIFIC"].to_numpy()]),
+        pd.concat([derivadas["faixa_etaria"], acrescimo["faixa_etaria"]]),
+        np.concatenate([derivadas["HOSPITALIZADO"].to_numpy(), acrescimo["HOSPITALIZADO"].to_numpy()]),
+        derivadas.index.append(acrescimo.index),
+    )
+
+
+if __name__ == "__main__":
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else CSV_PATH
+    print(f"Construindo cache colunar de {csv_path}...")
+    inicio = time.perf_counter()
+    manifesto_path = construir_cache(csv_path)
+    print(f"   ✓ Cache salvo em {os.path.dirname(manifesto_path)} ({time.perf_counter() - inicio:.2f}s)")
+
+    inicio = time.perf_counter()
+    bruto = ler_csv(csv_path)
+    tempo_csv = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    compacto = carregar_cache(csv_path)
+    tempo_cache = time.perf_counter() - inicio
+    print(f"   Leitura do CSV: {tempo_csv:.3f}s | leitura do cache: {tempo_cache:.3f}s")
+    print(f"   Memória: {memoria(bruto) / 1e6:.1f} MB (CSV) -> {memoria(compacto) / 1e6:.1f} MB (compacto)")
@@ -0,0 +1,193 @@
+'''
+Estatísticas do dashboard e cache de respostas por versão do dataset.
+
+Os endpoints /api/data/* (summary, casos_por_ano, casos_por_mes, ...) só
+mudam quando o CSV muda ou um lote é ingerido (ingestao.py). Cada payload é
+calculado uma vez por versão do dataset, serializado e servido com ETag;
+clientes que reenviam o ETag em If-None-Match recebem 304 sem corpo.
+
+O /api/data/dashboard junta todas as séries num único payload (mesmo
+formato do /api/data/filtered), para o dashboard carregar com um request só.
+Os corpos também são guardados já comprimidos em gzip (e brotli, se o
+pacote estiver instalado), então a compressão não é refeita por request.
+'''
+
+import gzip
+import hashlib
+
+try:
+    import brotli
+except ImportError:  # opcional: sem brotli os corpos saem só em gzip
+    brotli = None
+
+from dados import MESES
+
+
+def calcular_summary(df_stats, df_derivadas):
+    '''Resumo dos dados REAIS de Sertãozinho.'''
+    total_casos = len(df_stats)
+    casos_hospitalizados = int(df_derivadas["HOSPITALIZADO"].sum())
+    taxa_hospitalizacao = (casos_hospitalizados / total_casos) * 100 if total_casos > 0 else 0
+
+    return {
+        "total_casos": total_casos,
+        "casos_hospitalizados": casos_hospitalizados,
+        "taxa_hospitalizacao": round(taxa_hospitalizacao, 2),
+        "idade_media": round(df_stats["IDADE"].mean(), 1),
+        "anos_cobertura": f"{df_stats['NU_ANO'].min()} - {df_stats['NU_ANO'].max()}"
+    }
+
+
+def calcular_casos_por_ano(df_stats, df_derivadas):
+    '''Casos por ano do dataset de Sertãozinho.'''
+    casos_ano = df_stats["NU_ANO"].value_counts().sort_index()
+    return {
+        "anos": casos_ano.index.tolist(),
+        "casos": casos_ano.values.tolist()
+    }
+
+
+def calcular_casos_por_mes(df_stats, df_derivadas):
+    '''Casos por mês do dataset de Sertãozinho.'''
+    casos_mes = df_derivadas["MES_NOTIFIC"].value_counts().sort_index()
+    return {
+        "meses": [MESES[int(i) - 1] for i in casos_mes.index],
+        "casos": casos_mes.values.tolist()
+    }
+
+
+def _distribuicao(serie):
+    contagens = serie.value_counts()
+    return {
+        "labels": contagens.index.tolist(),
+        "values": contagens.values.tolist()
+    }
+
+
+def calcular_distribuicao_sexo(df_stats, df_derivadas):
+    '''Distribuição por sexo.'''
+    return _distribuicao(df_stats['CS_SEXO'])
+
+
+def calcular_fenomeno_climatico(df_stats, df_derivadas):
+    '''Distribuição por fenômeno climático.'''
+    return _distribuicao(df_stats['FENOMENO'])
+
+
+def calcular_distribuicao_raca(df_stats, df_derivadas):
+    '''Distribuição por raça.'''
+    return _distribuicao(df_stats['CS_RACA'])
+
+
+def calcular_hospitalizacao_por_idade(df_stats, df_derivadas):
+    '''Hospitalização por faixa etária.'''
+    faixa_etaria = df_derivadas['faixa_etaria']
+    hosp_por_idade = faixa_etaria[df_derivadas['HOSPITALIZADO']].value_counts().sort_index()
+    total_por_idade = faixa_etaria.value_counts().sort_index()
+
+    return {
+        "faixas": total_por_idade.index.tolist(),
+        "hospitalizados": hosp_por_idade.reindex(total_por_idade.index, fill_value=0).values.tolist(),
+        "total": total_por_idade.values.tolist()
+    }
+
+
+# Nome da rota (/api/data/<nome>) -> função que calcula o payload
+ESTATISTICAS = {
+    "summary": calcular_summary,
+    "casos_por_ano": calcular_casos_por_ano,
+    "casos_por_mes": calcular_casos_por_mes,
+    "distribuicao_sexo": calcular_distribuicao_sexo,
+    "fenomeno_climatico": calcular_fenomeno_climatico,
+    "hospitalizacao_por_idade": calcular_hospitalizacao_por_idade,
+    "distribuicao_raca": calcular_distribuicao_raca,
+}
+
+# Chave no payload do /api/data/dashboard (formato do /api/data/filtered) -> rota
+CHAVES_DASHBOARD = {
+    "summary": "summary",
+    "casosPorAno": "casos_por_ano",
+    "distribuicaoSexo": "distribuicao_sexo",
+    "casosPorMes": "casos_por_mes",
+    "fenomenoClimatico": "fenomeno_climatico",
+    "hospitalizacaoIdade": "hospitalizacao_por_idade",
+    "racaDistribution": "distribuicao_raca",
+}
+
+
+def calcular_do_cubo(cubo):
+    '''
+    Os mesmos payloads de ESTATISTICAS, tirados do cubo de agregados.
+
+    Usado depois de uma ingestão incremental (ingestao.py): o cubo já foi
+    atualizado só com as linhas novas, e somar as suas células custa o
+    mesmo para 33 mil ou 10 milhões de linhas.
+    '''
+    dashboard = cubo.consultar({})
+    payloads = {nome: dashboard[chave] for chave, nome in CHAVES_DASHBOARD.items()}
+    anos = dashboard["casosPorAno"]["anos"]
+    payloads["summary"] = {**dashboard["summary"],
+                           "anos_cobertura": f"{anos[0]} - {anos[-1]}" if anos else "-"}
+    return payloads
+
+
+# Codificações pré-comprimidas, em ordem de preferência
+CODIFICACOES = ("br", "gzip")
+
+
+def comprimir(corpo):
+    '''Retorna {codificação: bytes} com as versões comprimidas menores que o corpo.'''
+    versoes = {"gzip": gzip.compress(corpo, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        versoes["br"] = brotli.compress(corpo, quality=11)
+    return {cod: dados for cod, dados in versoes.items() if len(dados) < len(corpo)}
+
+
+class CacheRespostas:
+    '''
+    Payloads JSON pré-serializados de uma versão do dataset.
+
+    `versao` identifica o dataset (SHA-256 do CSV); o ETag de cada payload
+    combina a versão com o nome da rota, então muda automaticamente quando
+    o arquivo de dados é substituído. `comprimidos[nome]` guarda as versões
+    gzip/brotli de cada corpo.
+    '''
+
+    def __init__(self, versao, payloads, serializar):
+        self.versao = versao
+        self.payloads = payloads
+        self.corpos = {}
+        self.comprimidos = {}
+        self.etags = {}
+        for nome, payload in payloads.items():
+            self.corpos[nome] = serializar(payload).encode("utf-8")
+            self.comprimidos[nome] = comprimir(self.corpos[nome])
+            self.etags[nome] = hashlib.sha256(f"{versao}:{nome}".encode()).hexdigest()[:20]
+
+    def corpo(self, nome, accept_encodings):
+        '''
+        Escolhe o corpo conforme o Accept-Encoding do cliente.
+
+        Retorna (corpo, codificação, etag); a codificação é None para o JSON
+        sem compressão. Cada codificação tem seu próprio ETag, já que os
+        bytes são diferentes.
+        '''
+        for cod in CODIFICACOES:
+            if cod in self.comprimidos[nome] and accept_encodings.quality(cod) > 0:
+                return self.comprimidos[nome][cod], cod, f"{self.etags[nome]}-{cod}"
+        return self.corpos[nome], None, self.etags[nome]
+
+    @classmethod
+    def calcular(cls, versao, df_stats, df_derivadas, serializar):
+        '''Calcula todas as ESTATISTICAS para o dataset carregado.'''
+        payloads = {nome: funcao(df_stats, df_derivadas) for nome, funcao in ESTATISTICAS.items()}
+        # Pacote do dashboard reaproveita as séries já calculadas
+        payloads["dashboard"] = {chave: payloads[nome] for chave, nome in CHAVES_DASHBOARD.items()}
+        return cls(versao, payloads, serializar)
+
+    @classmethod
+    def do_cubo(cls, versao, cubo, serializar):
+        '''Como calcular(), mas a partir do cubo de agregados (ver calcular_do_cubo).'''
+        payloads = calcular_do_cubo(cubo)
+        payloads["dashboard"] = {chave: payloads[nome] for chave, nome in CHAVES_DASHBOARD.items()}
+        return cls(versao, payloads, serializar)
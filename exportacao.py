@@ -0,0 +1,143 @@
+'''
+Exportação das notificações por trás de uma visão do /api/data/filtered.
+
+O mesmo JSON de filtros do /api/data/filtered seleciona as linhas de
+df_stats pelo índice de bitmaps (indice_bitmap.py), inclusive as
+ingeridas depois da carga. A resposta é gerada bloco a bloco: cada bloco copia só as colunas
+pedidas das TAMANHO_BLOCO_EXPORTACAO linhas seguintes, serializa e é
+descartado. A memória extra fica em um bloco (mais as posições
+selecionadas, 8 bytes por linha), seja qual for o tamanho da coorte.
+
+Formatos:
+- csv: mesmo layout do data/df_dengue_tratado.csv (datas AAAA-MM-DD)
+- parquet: um row group por bloco; precisa do pyarrow (opcional)
+'''
+
+import io
+
+import pandas as pd
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # opcional: sem pyarrow só há exportação em CSV
+    pyarrow = None
+
+from dados import COLUNAS_DATA, dias_para_datas
+
+FORMATOS = ("csv", "parquet")
+
+MIMETYPES = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+# Linhas por bloco da resposta (e por row group no Parquet)
+TAMANHO_BLOCO_EXPORTACAO = 10_000
+
+# Colunas calculadas na carga que não fazem parte do CSV de origem; só saem
+# quando pedidas explicitamente
+COLUNAS_CALCULADAS = ["NU_ANO"]
+
+
+def colunas_exportacao(df, derivadas, pedidas=None):
+    '''
+    Projeção: as colunas pedidas, na ordem pedida, de df_stats ou da camada
+    derivada. Sem `pedidas`, todas as colunas do CSV de origem.
+    '''
+    if not pedidas:
+        return [coluna for coluna in df.columns if coluna not in COLUNAS_CALCULADAS]
+    pedidas = list(dict.fromkeys(pedidas))
+    desconhecidas = [c for c in pedidas if c not in df.columns and c not in derivadas.columns]
+    if desconhecidas:
+        raise ValueError(f"Colunas desconhecidas: {', '.join(map(str, desconhecidas))}")
+    return pedidas
+
+
+def _bloco(df, derivadas, colunas, posicoes):
+    '''DataFrame com as colunas projetadas só das linhas em `posicoes` (datas como datetime).'''
+    bloco = {}
+    for coluna in colunas:
+        origem = df if coluna in df.columns else derivadas
+        valores = origem[coluna].take(posicoes)
+        if coluna in COLUNAS_DATA:
+            valores = pd.Series(dias_para_datas(valores.to_numpy()), index=valores.index)
+        bloco[coluna] = valores
+    return pd.DataFrame(bloco, columns=colunas)
+
+
+def _blocos(df, derivadas, colunas, posicoes):
+    for inicio in range(0, len(posicoes), TAMANHO_BLOCO_EXPORTACAO):
+        yield _bloco(df, derivadas, colunas, posicoes[inicio:inicio + TAMANHO_BLOCO_EXPORTACAO])
+
+
+def gerar_csv(df, derivadas, colunas, posicoes):
+    '''CSV em blocos: cabeçalho e depois TAMANHO_BLOCO_EXPORTACAO linhas por vez.'''
+    yield ",".join(colunas) + "\n"
+    for bloco in _blocos(df, derivadas, colunas, posicoes):
+        yield bloco.to_csv(index=False, header=False, date_format="%Y-%m-%d", lineterminator="\n")
+
+
+class _Saida(io.RawIOBase):
+    '''Destino do ParquetWriter que guarda os bytes escritos até o gerador entregá-los.'''
+
+    def __init__(self):
+        self.partes = []
+        self.posicao = 0
+
+    def writable(self):
+        return True
+
+    def write(self, dados):
+        self.partes.append(bytes(dados))
+        self.posicao += len(dados)
+        return len(dados)
+
+    def tell(self):
+        return self.posicao
+
+    def esvaziar(self):
+        dados = b"".join(self.partes)
+        self.partes = []
+        return dados
+
+
+def _tabela_arrow(bloco, esquema=None):
+    '''Bloco em tabela Arrow: categorias como dicionário, datas como date32.'''
+    arrays = []
+    for coluna in bloco.columns:
+        valores = bloco[coluna]
+        if coluna in COLUNAS_DATA:
+            valores = valores.to_numpy(dtype="datetime64[D]")
+        arrays.append(pyarrow.array(valores, from_pandas=True))
+    tabela = pyarrow.Table.from_arrays(arrays, names=list(bloco.columns))
+    return tabela if esquema is None else tabela.cast(esquema)
+
+
+def gerar_parquet(df, derivadas, colunas, posicoes):
+    '''Parquet em blocos: cada bloco vira um row group, entregue assim que é escrito.'''
+    # O esquema sai de um bloco vazio, para valer também numa coorte vazia
+    esquema = _tabela_arrow(_bloco(df, derivadas, colunas, posicoes[:0])).schema
+    saida = _Saida()
+    escritor = pyarrow.parquet.ParquetWriter(saida, esquema)
+    try:
+        for bloco in _blocos(df, derivadas, colunas, posicoes):
+            escritor.write_table(_tabela_arrow(bloco, esquema))
+            yield saida.esvaziar()
+    finally:
+        escritor.close()
+    yield saida.esvaziar()
+
+
+def preparar_exportacao(df, derivadas, bitmaps, filtros, formato="csv", colunas=None):
+    '''
+    Valida o pedido e retorna (gerador, n_linhas).
+
+    A seleção e a projeção são validadas antes de o gerador começar, então
+    erros de entrada (ValueError) viram 400 e não uma resposta truncada.
+    '''
+    if formato not in FORMATOS:
+        raise ValueError(f"formato deve ser um de: {', '.join(FORMATOS)}")
+    if formato == "parquet" and pyarrow is None:
+        raise RuntimeError("Exportação em Parquet requer o pacote pyarrow")
+    colunas = colunas_exportacao(df, derivadas, colunas)
+    posicoes = bitmaps.posicoes(filtros)
+    gerar = gerar_parquet if formato == "parquet" else gerar_csv
+    return gerar(df, derivadas, colunas, posicoes), len(posicoes)
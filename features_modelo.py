@@ -0,0 +1,234 @@
+'''
+Features do modelo a partir de registros no formato do SINAN.
+
+Módulo único usado pelo treino (pipeline_treino.py) e pela API (app.py,
+predicao.py): as mesmas regras geram o SEVERITY_SCORE, os scores de
+comorbidade, as features temporais e a matriz N×14 de MODEL_FEATURES,
+seja para 1 paciente ou para milhões de linhas.
+
+Campos brutos aceitos (maiúsculas ou minúsculas):
+- sintomas/comorbidades SIM/NÃO/IGNORADO: FEBRE, MIALGIA, CEFALEIA, VOMITO,
+  EXANTEMA, PETEQUIA_N, DIABETES, HEMATOLOG, HEPATOPAT, RENAL
+- datas DT_NOTIFIC e DT_SIN_PRI (AAAA-MM-DD)
+- qualquer coluna de MODEL_FEATURES (ex.: "IDADE": 70)
+
+Para cada feature vale, nesta ordem: o valor informado no registro, o
+valor derivado dos campos brutos e, por fim, VALORES_PADRAO.
+
+Benchmark (linhas/s):
+    python benchmark_features.py [n_linhas]
+'''
+
+from datetime import datetime
+import math
+
+import numpy as np
+import pandas as pd
+
+# Features esperadas pelo modelo (14 features selecionadas)
+MODEL_FEATURES = [
+    'DIAS_SINTOMA_NOTIFIC_TEMP', 'TRIMESTRE', 'MES', 'DIAS_SINTOMA_NOTIFIC',
+    'TEM_COMORBIDADE', 'NU_ANO', 'QTD_IGNORADOS', 'SEVERITY_SCORE',
+    'IDADE', 'ANO', 'HEPATOPAT_BIN', 'COMORBIDADE_SCORE',
+    'DIABETES_BIN', 'RENAL_BIN'
+]
+
+# Features coletadas do usuário no dashboard (5 sintomas principais)
+USER_INPUT_FEATURES = ['FEBRE', 'MIALGIA', 'CEFALEIA', 'VOMITO', 'EXANTEMA']
+
+# Sintomas contados em QTD_IGNORADOS e SINTOMAS_SCORE
+SINTOMAS_PRINCIPAIS = ['FEBRE', 'MIALGIA', 'CEFALEIA', 'VOMITO', 'EXANTEMA']
+
+# Campos SIM/NÃO/IGNORADO que viram <CAMPO>_BIN
+CAMPOS_BINARIOS = [
+    'FEBRE', 'MIALGIA', 'CEFALEIA', 'VOMITO', 'EXANTEMA',
+    'PETEQUIA_N', 'DIABETES', 'HEMATOLOG', 'HEPATOPAT', 'RENAL'
+]
+
+COMORBIDADES = ['DIABETES', 'HEMATOLOG', 'HEPATOPAT', 'RENAL']
+
+# ⭐ SEVERITY_SCORE (pesos clínicos baseados em OMS)
+PESOS_SEVERIDADE = {
+    'PETEQUIA_N': 5,    # Sangramento = muito grave
+    'VOMITO': 3,        # Vômito = grave
+    'HEPATOPAT': 3,     # Hepatopatia = grave
+    'HEMATOLOG': 3,     # Hematológico = grave
+    'RENAL': 3,         # Renal = grave
+    'DIABETES': 2,      # Diabetes = moderado
+    'EXANTEMA': 1,      # Erupção = leve
+    'MIALGIA': 1,       # Mialgia = leve
+    'CEFALEIA': 1,      # Cefaleia = leve
+}
+
+CAMPOS_DATA = ['DT_NOTIFIC', 'DT_SIN_PRI']
+
+# Valores padrão/médios para as features não informadas nem deriváveis
+VALORES_PADRAO = {
+    'DIAS_SINTOMA_NOTIFIC_TEMP': 2,   # média: 2 dias
+    'TRIMESTRE': 1,                   # verão, período de maior incidência
+    'MES': 3,                         # março, pico de casos
+    'DIAS_SINTOMA_NOTIFIC': 2,
+    'TEM_COMORBIDADE': 0,
+    'NU_ANO': 2024,
+    'QTD_IGNORADOS': 0,
+    'SEVERITY_SCORE': 0,
+    'IDADE': 35,                      # média: 35 anos
+    'ANO': 2024,
+    'HEPATOPAT_BIN': 0,
+    'COMORBIDADE_SCORE': 0,
+    'DIABETES_BIN': 0,
+    'RENAL_BIN': 0,
+}
+
+# Todo campo de entrada que altera a matriz (usado pela TabelaPredicao)
+CAMPOS_ENTRADA = set(MODEL_FEATURES) | set(CAMPOS_BINARIOS) | set(CAMPOS_DATA)
+
+
+# --- Caminho vetorizado (DataFrame, N linhas) ---
+
+def _igual(df, campo, valor):
+    '''df[campo] == valor (sem diferenciar maiúsculas), comparando só os valores distintos.'''
+    if campo not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    codigos, unicos = pd.factorize(df[campo])
+    alvo = np.array([str(u).strip().upper() == valor for u in unicos] + [False])
+    return alvo[codigos]   # código -1 (ausente) cai no False final
+
+
+def _data(df, campo):
+    if campo not in df.columns:
+        return pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns]")
+    serie = df[campo]
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie
+    return pd.to_datetime(serie, errors='coerce', format='ISO8601')
+
+
+def contar_ignorados(df):
+    '''QTD_IGNORADOS: quantos dos sintomas principais estão como IGNORADO.'''
+    return sum(_igual(df, sintoma, "IGNORADO").astype(int) for sintoma in SINTOMAS_PRINCIPAIS)
+
+
+def features_derivadas(df):
+    '''
+    Features derivadas dos campos brutos, vetorizadas.
+
+    Retorna um DataFrame (mesmo índice de df) com <CAMPO>_BIN,
+    SEVERITY_SCORE, SINTOMAS_SCORE, COMORBIDADE_SCORE, TEM_COMORBIDADE,
+    QTD_IGNORADOS e as features temporais (NaN quando a data falta).
+    '''
+    derivadas = {}
+    for campo in CAMPOS_BINARIOS:
+        derivadas[f'{campo}_BIN'] = _igual(df, campo, "SIM").astype(int)
+
+    derivadas['SEVERITY_SCORE'] = sum(derivadas[f'{campo}_BIN'] * peso
+                                      for campo, peso in PESOS_SEVERIDADE.items())
+    derivadas['SINTOMAS_SCORE'] = sum(derivadas[f'{s}_BIN'] for s in SINTOMAS_PRINCIPAIS)
+    derivadas['COMORBIDADE_SCORE'] = sum(derivadas[f'{c}_BIN'] for c in COMORBIDADES)
+    derivadas['TEM_COMORBIDADE'] = (derivadas['COMORBIDADE_SCORE'] > 0).astype(int)
+    derivadas['QTD_IGNORADOS'] = contar_ignorados(df)
+
+    notificacao = _data(df, 'DT_NOTIFIC')
+    sintomas = _data(df, 'DT_SIN_PRI')
+    derivadas['MES'] = notificacao.dt.month.to_numpy()
+    derivadas['ANO'] = notificacao.dt.year.to_numpy()
+    derivadas['NU_ANO'] = derivadas['ANO']
+    derivadas['TRIMESTRE'] = notificacao.dt.quarter.to_numpy()
+    derivadas['DIAS_SINTOMA_NOTIFIC'] = (notificacao - sintomas).dt.days.to_numpy()
+    derivadas['DIAS_SINTOMA_NOTIFIC_TEMP'] = derivadas['DIAS_SINTOMA_NOTIFIC']
+    return pd.DataFrame(derivadas, index=df.index)
+
+
+def montar_matriz(registros):
+    '''
+    Converte registros de pacientes em uma matriz N×14 na ordem de MODEL_FEATURES.
+
+    `registros` é um DataFrame, uma lista de dicts ou um único dict.
+    '''
+    if isinstance(registros, dict):
+        registros = [registros]
+    if isinstance(registros, pd.DataFrame):
+        df = registros.rename(columns=lambda c: str(c).upper())
+        if df.columns.has_duplicates:
+            # "febre" e "FEBRE" na mesma tabela: vale o primeiro valor não nulo
+            df = pd.DataFrame({c: df.loc[:, df.columns == c].bfill(axis=1).iloc[:, 0]
+                               for c in df.columns.unique()})
+    else:
+        df = pd.DataFrame.from_records([{str(k).upper(): v for k, v in r.items()} for r in registros])
+    derivadas = features_derivadas(df)
+
+    X = np.empty((len(df), len(MODEL_FEATURES)), dtype=float)
+    for j, feature in enumerate(MODEL_FEATURES):
+        if feature in derivadas.columns:
+            valores = derivadas[feature].to_numpy(dtype=float)
+        else:
+            valores = np.full(len(df), np.nan)
+        if feature in df.columns:
+            informados = pd.to_numeric(df[feature], errors='coerce').to_numpy(dtype=float)
+            valores = np.where(np.isnan(informados), valores, informados)
+        X[:, j] = np.where(np.isnan(valores), VALORES_PADRAO[feature], valores)
+    return X
+
+
+# --- Caminho escalar (1 paciente, sem pandas) ---
+
+def _texto(valor):
+    return "" if valor is None else str(valor).strip().upper()
+
+
+def _data_escalar(valor):
+    try:
+        return datetime.fromisoformat(str(valor))
+    except (TypeError, ValueError):
+        return None
+
+
+def _numero(valor):
+    try:
+        numero = float(valor)
+    except (TypeError, ValueError):
+        return math.nan
+    return numero
+
+
+def montar_vetor(registro):
+    '''
+    Versão de montar_matriz para um único paciente, sem passar pelo pandas.
+
+    Usada no /api/predict, onde criar um DataFrame custaria mais que a
+    própria predição. Retorna um array 1D com as 14 features, idêntico à
+    linha correspondente de montar_matriz.
+    '''
+    registro = {str(k).upper(): v for k, v in registro.items()}
+    # Só os campos presentes no registro são lidos (os ausentes contam como NÃO)
+    sim = {campo for campo in CAMPOS_BINARIOS if campo in registro and _texto(registro[campo]) == "SIM"}
+    comorbidade = sum(1 for c in COMORBIDADES if c in sim)
+
+    derivadas = {
+        'SEVERITY_SCORE': sum(peso for campo, peso in PESOS_SEVERIDADE.items() if campo in sim),
+        'COMORBIDADE_SCORE': comorbidade,
+        'TEM_COMORBIDADE': int(comorbidade > 0),
+        'QTD_IGNORADOS': sum(1 for s in SINTOMAS_PRINCIPAIS
+                             if s in registro and _texto(registro[s]) == "IGNORADO"),
+        'HEPATOPAT_BIN': int('HEPATOPAT' in sim),
+        'DIABETES_BIN': int('DIABETES' in sim),
+        'RENAL_BIN': int('RENAL' in sim),
+    }
+    if 'DT_NOTIFIC' in registro:
+        notificacao = _data_escalar(registro['DT_NOTIFIC'])
+        if notificacao is not None:
+            derivadas['MES'] = notificacao.month
+            derivadas['ANO'] = derivadas['NU_ANO'] = notificacao.year
+            derivadas['TRIMESTRE'] = (notificacao.month - 1) // 3 + 1
+            sintomas = _data_escalar(registro.get('DT_SIN_PRI'))
+            if sintomas is not None:
+                derivadas['DIAS_SINTOMA_NOTIFIC'] = (notificacao - sintomas).days
+                derivadas['DIAS_SINTOMA_NOTIFIC_TEMP'] = derivadas['DIAS_SINTOMA_NOTIFIC']
+
+    valores = []
+    for feature in MODEL_FEATURES:
+        valor = _numero(registro[feature]) if feature in registro else math.nan
+        if math.isnan(valor):
+            valor = derivadas.get(feature, VALORES_PADRAO[feature])
+        valores.append(valor)
+    return np.array(valores, dtype=float)
@@ -0,0 +1,71 @@
+'''
+Configuração do gunicorn com dataset e modelo compartilhados entre workers.
+
+Com preload_app, o processo master importa app.py uma única vez (dataset,
+cubo de agregados, modelo e tabela de predições) e só então faz fork dos
+workers. Os buffers NumPy são somente leitura, então as páginas ficam
+compartilhadas por copy-on-write em vez de duplicadas por worker. Quando o
+cache colunar existe (python dados.py), as colunas são mmap do arquivo e o
+page cache do sistema já é compartilhado por todos os processos.
+
+Uso:
+    gunicorn -c gunicorn.conf.py app:app
+
+Variáveis de ambiente:
+    PORT              porta (padrão 5000)
+    WEB_CONCURRENCY   número de workers (padrão 2)
+    GUNICORN_THREADS  threads por worker (padrão 1)
+    METRICAS_DIR      diretório onde os workers publicam as métricas, para o
+                      /metrics somar todos eles (ver metricas.py); o master
+                      o limpa ao subir e guarda os contadores dos workers
+                      que terminam
+'''
+
+import gc
+import os
+
+import metricas
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "1"))
+
+# Carrega o app no master antes do fork (dados compartilhados via copy-on-write)
+preload_app = True
+
+
+def on_starting(server):
+    '''Chamado no master ao subir: apaga as métricas de uma execução anterior.'''
+    metricas.limpar_diretorio()
+
+
+def when_ready(server):
+    '''
+    Chamado no master depois do preload e antes de criar os workers.
+
+    gc.freeze() move todos os objetos já carregados para uma geração
+    permanente: o coletor de lixo dos workers não os percorre e, portanto,
+    não escreve nos seus cabeçalhos, o que quebraria o compartilhamento
+    das páginas.
+    '''
+    gc.freeze()
+    server.log.info("Dataset e modelo pré-carregados no master; objetos congelados para o fork")
+
+
+def worker_exit(server, worker):
+    '''Chamado no worker ao encerrar: publica as métricas do último intervalo.'''
+    try:
+        metricas.publicar()
+    except OSError as e:
+        server.log.warning(f"Métricas do worker {worker.pid} não publicadas: {e}")
+
+
+def child_exit(server, worker):
+    '''
+    Chamado no master quando um worker termina: os contadores dele vão para
+    o total dos workers encerrados, antes que o pid possa ser reaproveitado.
+    '''
+    try:
+        metricas.incorporar_worker(worker.pid)
+    except OSError as e:
+        server.log.warning(f"Métricas do worker {worker.pid} não incorporadas: {e}")
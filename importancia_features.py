@@ -0,0 +1,150 @@
+'''
+Importância de features com os modelos baseline (seção 7 do treino).
+
+Os três modelos (Regressão Logística, Random Forest e XGBoost) são
+ajustados ao mesmo tempo, um por processo, com um orçamento explícito de
+threads: a Regressão Logística usa 1 núcleo e o restante é dividido entre
+Random Forest e XGBoost (n_jobs), sem que os processos disputem mais
+núcleos do que existem. Com menos de 3 núcleos os modelos são ajustados um
+após o outro, cada um com todos os núcleos.
+
+Opcionalmente os modelos são ajustados numa subamostra estratificada
+(IMPORTANCIA_AMOSTRA, fração entre 0 e 1) — o ranking das features é
+estável com bem menos linhas que o treino balanceado inteiro.
+
+A tabela consolidada é gravada em <pasta>/importancias-<hash>.csv, onde o
+hash cobre a matriz de features, o target, os nomes das colunas e os
+parâmetros; se a matriz não mudou, a próxima execução só lê o CSV.
+
+Variáveis de ambiente:
+    IMPORTANCIA_NUCLEOS  núcleos para os três ajustes (padrão: todos)
+    IMPORTANCIA_AMOSTRA  fração da subamostra estratificada (padrão 1.0)
+'''
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+from xgboost import XGBClassifier
+
+IMPORTANCIA_NUCLEOS = int(os.getenv("IMPORTANCIA_NUCLEOS", str(os.cpu_count() or 1)))
+IMPORTANCIA_AMOSTRA = float(os.getenv("IMPORTANCIA_AMOSTRA", "1.0"))
+
+# Muda quando os modelos ou a consolidação mudam (invalida as tabelas salvas)
+VERSAO_IMPORTANCIA = 1
+
+MODELOS_BASELINE = ['Logistic Regression', 'Random Forest', 'XGBoost']
+
+
+def ajuste_paralelo(nucleos):
+    '''Os três modelos só rodam ao mesmo tempo se houver um núcleo para cada.'''
+    return nucleos >= len(MODELOS_BASELINE)
+
+
+def orcamento_threads(nucleos):
+    '''
+    Threads por modelo, sem passar de `nucleos` no total. Em paralelo: 1 para
+    a Regressão Logística, o resto dividido entre RF e XGBoost; em sequência,
+    todos os núcleos para cada modelo.
+    '''
+    nucleos = max(1, nucleos)
+    if not ajuste_paralelo(nucleos):
+        return {nome: nucleos for nome in MODELOS_BASELINE}
+    resto = nucleos - 1
+    return {
+        'Logistic Regression': 1,
+        'Random Forest': resto // 2,
+        'XGBoost': resto - resto // 2,
+    }
+
+
+def modelo_baseline(nome, random_state, n_jobs):
+    if nome == 'Logistic Regression':
+        return LogisticRegression(random_state=random_state, max_iter=1000)
+    if nome == 'Random Forest':
+        return RandomForestClassifier(n_estimators=100, random_state=random_state, n_jobs=n_jobs)
+    return XGBClassifier(n_estimators=100, random_state=random_state, eval_metric='logloss',
+                         n_jobs=n_jobs)
+
+
+def _ajustar(nome, X, y, random_state, n_jobs):
+    '''Ajusta um modelo baseline (em processo separado) e retorna a importância por feature.'''
+    model = modelo_baseline(nome, random_state, n_jobs)
+    model.fit(X, y)
+    if nome == 'Logistic Regression':
+        return nome, np.abs(model.coef_[0])
+    return nome, np.asarray(model.feature_importances_)
+
+
+def consolidar(feature_cols, importancias):
+    '''Normaliza cada modelo pelo seu máximo e ordena pela média.'''
+    consolidated = pd.DataFrame({'feature': feature_cols})
+    for name in MODELOS_BASELINE:
+        importance = importancias[name]
+        max_imp = importance.max()
+        consolidated[name] = importance / max_imp if max_imp > 0 else importance
+
+    consolidated['mean_importance'] = consolidated[MODELOS_BASELINE].mean(axis=1)
+    return consolidated.sort_values('mean_importance', ascending=False)
+
+
+def hash_matriz(X, y, feature_cols, params):
+    '''SHA-256 da matriz de features, do target, das colunas e dos parâmetros.'''
+    h = hashlib.sha256()
+    h.update(json.dumps({"colunas": list(feature_cols), "params": params,
+                         "versao": VERSAO_IMPORTANCIA}, sort_keys=True).encode("utf-8"))
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    h.update(str(X.shape).encode())
+    h.update(X.tobytes())
+    h.update(np.ascontiguousarray(y, dtype=np.int64).tobytes())
+    return h.hexdigest()
+
+
+def calcular_importancias(X, y, feature_cols, pasta, random_state=42,
+                          nucleos=IMPORTANCIA_NUCLEOS, fracao_amostra=IMPORTANCIA_AMOSTRA):
+    '''
+    Retorna a tabela consolidada de importâncias (ordenada pela média).
+
+    Reaproveita <pasta>/importancias-<hash>.csv quando a matriz e os
+    parâmetros são os mesmos de uma execução anterior.
+    '''
+    params = {"random_state": random_state, "fracao_amostra": fracao_amostra}
+    chave = hash_matriz(X, y, feature_cols, params)
+    arquivo = os.path.join(pasta, f"importancias-{chave[:16]}.csv")
+    if os.path.exists(arquivo):
+        print(f"♻️  Cache: {os.path.basename(arquivo)}")
+        return pd.read_csv(arquivo, index_col=0)
+
+    X = np.asarray(X)
+    y = np.asarray(y)
+    if fracao_amostra < 1.0:
+        X, _, y, _ = train_test_split(X, y, train_size=fracao_amostra,
+                                      random_state=random_state, stratify=y)
+        print(f"Subamostra estratificada: {len(X):,} linhas ({fracao_amostra:.0%})")
+
+    threads = orcamento_threads(nucleos)
+    modo = "em paralelo" if ajuste_paralelo(nucleos) else "em sequência"
+    print(f"Ajustando {modo}: " + ", ".join(f"{nome} ({threads[nome]} thread(s))"
+                                            for nome in MODELOS_BASELINE))
+    if ajuste_paralelo(nucleos):
+        with ProcessPoolExecutor(max_workers=len(MODELOS_BASELINE)) as pool:
+            futuros = [pool.submit(_ajustar, nome, X, y, random_state, threads[nome])
+                       for nome in MODELOS_BASELINE]
+            importancias = dict(f.result() for f in futuros)
+    else:
+        importancias = dict(_ajustar(nome, X, y, random_state, threads[nome])
+                            for nome in MODELOS_BASELINE)
+
+    consolidated = consolidar(feature_cols, importancias)
+
+    os.makedirs(pasta, exist_ok=True)
+    temporario = arquivo + ".tmp"
+    consolidated.to_csv(temporario)
+    os.replace(temporario, arquivo)
+    return consolidated
@@ -0,0 +1,239 @@
+'''
+Índice de bitmaps para filtros multidimensionais do dashboard.
+
+Na carga do dataset, cada valor de cada coluna indexada (ano, mês, faixa
+etária, sexo, raça, fenômeno e intensidade, hospitalização, sintomas e
+comorbidades) vira um bitmap com um bit por linha de df_stats, guardado
+em palavras uint64. Um filtro é respondido só com operações bit a bit:
+
+- vários valores da mesma coluna: OR dos bitmaps dos valores
+- condições diferentes: AND
+- {"ou": [...]}, {"e": [...]} e {"nao": {...}} combinam sub-filtros
+
+e os gráficos saem da contagem de bits (popcount) da seleção AND o bitmap
+de cada categoria, sem varrer nem copiar o DataFrame. A idade média é a
+única que lê uma coluna, e só nas linhas selecionadas.
+
+Exemplo (mulheres ou maiores de 60 anos com febre, em anos de El Niño):
+    {"FENOMENO": "El Niño", "FEBRE": "SIM",
+     "ou": [{"sexo": "F"}, {"faixa_etaria": ["61-70", "71-80", "81-90", "90+"]}]}
+
+Os filtros do dashboard (anoInicial, anoFinal, fenomeno, sexo) continuam
+valendo e, sozinhos e com valores simples, são respondidos pelo cubo
+(cubo_agregado.py), que dá o mesmo payload.
+'''
+
+import numpy as np
+
+from cubo_agregado import (
+    DIMENSOES_PAYLOAD, categorias_fixas, codificar, inteiro_do_filtro, mesclar_categorias,
+    montar_payload
+)
+from dados import COMORBIDADES, SINTOMAS
+
+# Colunas de df_stats e da camada derivada com um bitmap por valor
+COLUNAS_INDEXADAS = [
+    'NU_ANO', 'MES_NOTIFIC', 'faixa_etaria', 'CS_SEXO', 'CS_RACA', 'FENOMENO', 'INTENS_FENOM',
+    'HOSPITALIZ', *SINTOMAS, *COMORBIDADES,
+]
+
+# Chaves do filtro do dashboard, respondidas pelo cubo quando aparecem sozinhas
+FILTROS_CUBO = {'anoInicial', 'anoFinal', 'fenomeno', 'sexo'}
+APELIDOS = {'fenomeno': 'FENOMENO', 'sexo': 'CS_SEXO'}
+
+
+def filtro_do_cubo(filtros):
+    '''
+    True se o filtro só usa as chaves do dashboard com valores simples (o
+    cubo responde sem o índice). Listas de valores ({"sexo": ["F", "M"]})
+    vão para o índice, que faz o OR das categorias.
+    '''
+    return set(filtros) <= FILTROS_CUBO and all(
+        valor is None or isinstance(valor, (str, int, float)) for valor in filtros.values()
+    )
+
+
+if hasattr(np, 'bitwise_count'):
+    def _popcount(bitmaps):
+        '''Bits ligados em cada bitmap (soma na última dimensão).'''
+        return np.bitwise_count(bitmaps).sum(axis=-1, dtype=np.int64)
+else:  # NumPy < 2.0: sem bitwise_count, tabela de bits por byte
+    _BITS_POR_BYTE = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+    def _popcount(bitmaps):
+        '''Bits ligados em cada bitmap (soma na última dimensão).'''
+        return _BITS_POR_BYTE[np.ascontiguousarray(bitmaps).view(np.uint8)].sum(axis=-1, dtype=np.int64)
+
+
+def _palavras(n_linhas):
+    return -(-n_linhas // 64)
+
+
+def _empacotar(mascara, n_palavras):
+    '''Máscara booleana em bitmap de `n_palavras` uint64 (bits além das linhas zerados).'''
+    saida = np.zeros(n_palavras * 8, dtype=np.uint8)
+    bits = np.packbits(mascara)
+    saida[:len(bits)] = bits
+    return saida.view(np.uint64)
+
+
+def _acrescentar_bits(bitmap, n_linhas, mascara, n_palavras):
+    '''Bitmap de `n_linhas` seguido dos bits de `mascara` (ingestão incremental).'''
+    saida = np.zeros(n_palavras * 8, dtype=np.uint8)
+    antigos = -(-n_linhas // 8)
+    saida[:antigos] = bitmap.view(np.uint8)[:antigos]
+    # Os bits novos começam no meio de um byte quando n_linhas não é múltiplo de 8
+    deslocamento = n_linhas % 8
+    bits = np.packbits(np.concatenate([np.zeros(deslocamento, dtype=bool), mascara]))
+    inicio = n_linhas // 8
+    saida[inicio:inicio + len(bits)] |= bits
+    return saida.view(np.uint64)
+
+
+def _colunas(df, derivadas):
+    return {coluna: (derivadas[coluna] if coluna in derivadas.columns else df[coluna])
+            for coluna in COLUNAS_INDEXADAS}
+
+
+class IndiceBitmap:
+    '''Bitmaps por (coluna, valor) das linhas de df_stats.'''
+
+    def __init__(self, df, derivadas):
+        '''`derivadas` é a camada de dados.derivar_features (mês e faixa etária).'''
+        self.n_linhas = len(df)
+        n_palavras = _palavras(self.n_linhas)
+        self.categorias, self.bitmaps = {}, {}
+        for coluna, valores in _colunas(df, derivadas).items():
+            codigos, cats = codificar(valores, categorias_fixas(coluna, valores))
+            self.categorias[coluna] = cats
+            # Valores ausentes (último código) não entram em nenhum bitmap
+            self.bitmaps[coluna] = np.stack([_empacotar(codigos == i, n_palavras)
+                                             for i in range(len(cats))]) \
+                if cats else np.zeros((0, n_palavras), dtype=np.uint64)
+        self.idade = df['IDADE'].to_numpy(dtype=float)
+        self._congelar()
+
+    def _congelar(self):
+        self.todas = _empacotar(np.ones(self.n_linhas, dtype=bool), _palavras(self.n_linhas))
+        for array in (*self.bitmaps.values(), self.idade, self.todas):
+            array.flags.writeable = False
+
+    def acrescentar(self, df, derivadas):
+        '''
+        Novo índice com as linhas de `df` acrescentadas ao fim (ingestão incremental).
+
+        Os bits novos são anexados a cada bitmap sem reler as linhas antigas;
+        valores novos ganham um bitmap, com a mesma ordem de categorias do
+        cubo (mesclar_categorias). O índice atual não muda.
+        '''
+        novo = object.__new__(IndiceBitmap)
+        novo.n_linhas = self.n_linhas + len(df)
+        n_palavras = _palavras(novo.n_linhas)
+        novo.categorias, novo.bitmaps = {}, {}
+        vazio = np.zeros(_palavras(self.n_linhas), dtype=np.uint64)
+        for coluna, valores in _colunas(df, derivadas).items():
+            atuais = self.categorias[coluna]
+            cats = mesclar_categorias(coluna, atuais, valores)
+            codigos, _ = codificar(valores, cats)
+            posicoes = {valor: i for i, valor in enumerate(atuais)}
+            linhas = []
+            for i, valor in enumerate(cats):
+                antigo = self.bitmaps[coluna][posicoes[valor]] if valor in posicoes else vazio
+                linhas.append(_acrescentar_bits(antigo, self.n_linhas, codigos == i, n_palavras))
+            novo.categorias[coluna] = cats
+            novo.bitmaps[coluna] = np.stack(linhas) if linhas else np.zeros((0, n_palavras), dtype=np.uint64)
+        novo.idade = np.concatenate([self.idade, df['IDADE'].to_numpy(dtype=float)])
+        novo._congelar()
+        return novo
+
+    # --- Avaliação dos filtros ---
+
+    def _valores(self, coluna, valores):
+        '''OR dos bitmaps dos valores pedidos (valores inexistentes não selecionam nada).'''
+        cats = self.categorias[coluna]
+        numerica = coluna in ('NU_ANO', 'MES_NOTIFIC')
+        indices = []
+        for valor in (valores if isinstance(valores, list) else [valores]):
+            if numerica:
+                valor = inteiro_do_filtro(coluna, valor)
+            if valor in cats:
+                indices.append(cats.index(valor))
+        if not indices:
+            return np.zeros(_palavras(self.n_linhas), dtype=np.uint64)
+        return np.bitwise_or.reduce(self.bitmaps[coluna][indices], axis=0)
+
+    def _anos(self, condicao):
+        '''OR dos anos que satisfazem a condição (um ano ausente nunca a satisfaz).'''
+        anos = np.array(self.categorias['NU_ANO'], dtype=float)
+        indices = np.flatnonzero(condicao(anos))
+        if not len(indices):
+            return np.zeros(_palavras(self.n_linhas), dtype=np.uint64)
+        return np.bitwise_or.reduce(self.bitmaps['NU_ANO'][indices], axis=0)
+
+    def _avaliar(self, filtro):
+        if not isinstance(filtro, dict):
+            raise ValueError("Cada filtro deve ser um objeto JSON")
+        selecao = self.todas.copy()
+        for chave, valor in filtro.items():
+            if chave == 'nao':
+                selecao &= ~self._avaliar(valor) & self.todas
+                continue
+            # Como no dashboard, valores vazios ("", null, []) não filtram
+            if valor in ('', None, []):
+                continue
+            if chave in ('e', 'ou'):
+                if not isinstance(valor, list):
+                    raise ValueError(f"'{chave}' deve ser uma lista de filtros")
+                partes = np.stack([self._avaliar(parte) for parte in valor])
+                reduzir = np.bitwise_and if chave == 'e' else np.bitwise_or
+                selecao &= reduzir.reduce(partes, axis=0)
+            elif chave == 'anoInicial':
+                ano = inteiro_do_filtro(chave, valor)
+                selecao &= self._anos(lambda anos: anos >= ano)
+            elif chave == 'anoFinal':
+                ano = inteiro_do_filtro(chave, valor)
+                selecao &= self._anos(lambda anos: anos <= ano)
+            else:
+                coluna = APELIDOS.get(chave, chave)
+                if coluna not in self.bitmaps:
+                    raise ValueError(f"Filtro desconhecido: {chave}")
+                selecao &= self._valores(coluna, valor)
+        return selecao
+
+    def selecionar(self, filtros):
+        '''Bitmap (uint64) das linhas que satisfazem o filtro.'''
+        return self._avaliar(filtros)
+
+    def posicoes(self, filtros):
+        '''Posições das linhas selecionadas, em ordem crescente.'''
+        bits = np.unpackbits(self.selecionar(filtros).view(np.uint8), count=self.n_linhas)
+        return np.flatnonzero(bits)
+
+    def contar(self, filtros):
+        '''Quantidade de linhas selecionadas (popcount), sem montar o payload.'''
+        return int(_popcount(self.selecionar(filtros)))
+
+    # --- Payload ---
+
+    def _contagens(self, selecao, coluna):
+        '''Casos por categoria de `coluna` na seleção (popcount de seleção AND bitmap).'''
+        return _popcount(self.bitmaps[coluna] & selecao)
+
+    def consultar(self, filtros):
+        '''Retorna o payload completo do /api/data/filtered (mesmo formato do cubo).'''
+        selecao = self.selecionar(filtros)
+        total = int(_popcount(selecao))
+        marginais = {dim: self._contagens(selecao, dim) for dim in DIMENSOES_PAYLOAD}
+
+        # Faixa etária x hospitalização: popcount de seleção AND faixa AND HOSPITALIZ
+        por_faixa = self.bitmaps['faixa_etaria'] & selecao
+        faixa_hosp = _popcount(por_faixa[:, None, :] & self.bitmaps['HOSPITALIZ'][None, :, :])
+        # Faixa conhecida com HOSPITALIZ ausente ainda conta no total da faixa
+        faixa_hosp = np.column_stack([
+            faixa_hosp, _popcount(por_faixa) - faixa_hosp.sum(axis=1)
+        ])
+
+        idade = self.idade[np.flatnonzero(np.unpackbits(selecao.view(np.uint8), count=self.n_linhas))]
+        validas = ~np.isnan(idade)
+        return montar_payload(self.categorias, total, marginais, faixa_hosp,
+                              float(idade[validas].sum()), int(validas.sum()))
@@ -0,0 +1,369 @@
+'''
+Ingestão incremental de notificações novas, sem recarregar o dataset.
+
+As notificações semanais do SINAN entram como lotes acrescentados ao
+dataset base (CSV + cache colunar), numa pasta ao lado do CSV
+(data/df_dengue_tratado.incrementos/):
+
+    indice.json        lotes publicados, em ordem (o ponto de publicação)
+    lote_000001.csv    só as linhas novas de cada lote, já sem duplicatas
+    chaves_000001.npy  hashes das chaves de todas as notificações (base + lotes)
+    entrada/           pasta observada: CSVs deixados aqui são ingeridos
+    processados/       arquivos de entrada/ já ingeridos
+    rejeitados/        arquivos de entrada/ com erro (colunas, datas...)
+
+Ingerir um lote:
+1. lê só as linhas novas e confere as colunas com as do dataset
+2. descarta notificações já vistas (na base, num lote anterior ou repetidas
+   no próprio lote) pela chave da notificação, as colunas INGESTAO_CHAVE.
+   Sem essas colunas no dataset a ingestão é recusada: deduplicar por
+   outras colunas juntaria notificações diferentes com os mesmos dados
+3. grava o lote e o novo conjunto de chaves em arquivos novos e só então
+   troca o indice.json (temporário + os.replace). Quem lê o índice vê o
+   lote inteiro ou nada dele; uma falha no meio só deixa arquivos órfãos.
+
+Os workers do app conferem a assinatura do indice.json junto com a do CSV
+e aplicam apenas os lotes que ainda não têm (ver app.aplicar_incrementos):
+o DataFrame, as features derivadas e o cubo de agregados recebem só as
+linhas novas, e as séries do dashboard saem do cubo.
+
+O índice guarda o SHA-256 do CSV base: se o CSV for substituído por uma
+exportação completa nova, os lotes antigos deixam de valer. `consolidar`
+incorpora os lotes ao CSV e reconstrói o cache, quando eles se acumulam.
+
+Uso:
+    python ingestao.py <arquivo.csv> [...]   ingere os arquivos, em ordem
+    python ingestao.py observar              ingere o que chegar em entrada/
+    python ingestao.py consolidar            incorpora os lotes ao CSV base
+    python ingestao.py listar
+
+Em entrada/, copie o arquivo com outra extensão e renomeie para .csv só
+no fim da cópia, para não ser lido pela metade.
+
+Variáveis de ambiente:
+    INGESTAO_DIR         pasta dos lotes (padrão: CSV_DADOS com extensão .incrementos)
+    INGESTAO_CHAVE       colunas da chave da notificação, que o dataset precisa ter
+                         (padrão NU_NOTIFIC,ID_MUNICIP,DT_NOTIFIC)
+    INTERVALO_INGESTAO   segundos entre varreduras de entrada/ (padrão 10)
+'''
+
+import fcntl
+import glob
+import json
+import os
+import shutil
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from dados import (
+    COLUNAS_DATA, CSV_PATH, ESQUEMA, cache_atualizado, carregar_dataset, checksum_arquivo,
+    compactar, construir_cache, ler_csv, ler_manifesto
+)
+
+INGESTAO_DIR = os.getenv("INGESTAO_DIR")
+INGESTAO_CHAVE = os.getenv("INGESTAO_CHAVE", "NU_NOTIFIC,ID_MUNICIP,DT_NOTIFIC").split(",")
+INTERVALO_INGESTAO = float(os.getenv("INTERVALO_INGESTAO", "10"))
+
+ARQUIVO_INDICE = "indice.json"
+
+
+# --- Pasta de incrementos e índice ---
+
+def caminho_incrementos(csv_path=CSV_PATH):
+    return INGESTAO_DIR or os.path.splitext(csv_path)[0] + ".incrementos"
+
+
+def ler_indice(pasta):
+    '''Índice dos lotes publicados, ou None se ainda não houve ingestão.'''
+    caminho = os.path.join(pasta, ARQUIVO_INDICE)
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def assinatura_indice(csv_path=CSV_PATH):
+    '''(tamanho, mtime_ns) do indice.json: os workers detectam um lote novo sem lê-lo.'''
+    try:
+        stat = os.stat(os.path.join(caminho_incrementos(csv_path), ARQUIVO_INDICE))
+    except FileNotFoundError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def lotes_validos(indice, versao_base):
+    '''Lotes publicados sobre esta versão do CSV base (lotes de outra base não valem).'''
+    if indice is None or indice.get("base") != versao_base:
+        return []
+    return indice["lotes"]
+
+
+def versao_base(csv_path=CSV_PATH):
+    '''SHA-256 do CSV base, o mesmo "versao" de dados.carregar_dataset.'''
+    manifesto = ler_manifesto(csv_path)
+    if cache_atualizado(manifesto, csv_path):
+        return manifesto["origem"]["sha256"]
+    return checksum_arquivo(csv_path)
+
+
+def colunas_base(csv_path=CSV_PATH):
+    '''Colunas do dataset, na ordem do CSV (ou do cache, se só ele existir).'''
+    if os.path.exists(csv_path):
+        return pd.read_csv(csv_path, nrows=0).columns.tolist()
+    return [coluna["nome"] for coluna in ler_manifesto(csv_path)["colunas"]]
+
+
+def carregar_lotes(lotes, pasta):
+    '''Linhas dos lotes (só os arquivos pedidos), concatenadas, como lidas do CSV.'''
+    return pd.concat([ler_csv(os.path.join(pasta, lote["arquivo"])) for lote in lotes],
+                     ignore_index=True)
+
+
+def _gravar_json(caminho, conteudo):
+    temporario = caminho + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(conteudo, f, indent=2, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+
+@contextmanager
+def _trava(pasta):
+    '''Uma ingestão por vez (entre workers e processos): flock em <pasta>/.trava.'''
+    with open(os.path.join(pasta, ".trava"), "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+# --- Chave da notificação ---
+
+def colunas_chave(colunas):
+    '''INGESTAO_CHAVE; ValueError se o dataset não tiver alguma dessas colunas.'''
+    faltando = [coluna for coluna in INGESTAO_CHAVE if coluna not in colunas]
+    if faltando:
+        raise ValueError(f"O dataset não tem as colunas da chave da notificação: {', '.join(faltando)}. "
+                         "Defina INGESTAO_CHAVE com colunas que identifiquem cada notificação")
+    return list(INGESTAO_CHAVE)
+
+
+def chaves_notificacao(df, colunas):
+    '''
+    Hash de 64 bits da chave de cada notificação de um DataFrame compacto.
+
+    Números (inclusive datas em dias) viram float64 e categorias são
+    comparadas pelo valor, então a mesma notificação tem o mesmo hash no
+    cache da base e num lote lido de CSV.
+    '''
+    partes = {}
+    for coluna in colunas:
+        serie = df[coluna]
+        if pd.api.types.is_numeric_dtype(serie) and not isinstance(serie.dtype, pd.CategoricalDtype):
+            serie = serie.astype(np.float64)
+        partes[coluna] = serie
+    return pd.util.hash_pandas_object(pd.DataFrame(partes), index=False).to_numpy()
+
+
+def _chaves_existentes(pasta, indice, csv_path, colunas, chave):
+    '''
+    Chaves já vistas (ordenadas). Recalculadas a partir da base e dos lotes
+    se o índice não as tem ou se foram calculadas com outra INGESTAO_CHAVE.
+    '''
+    if indice.get("chaves") and indice.get("chave") == chave:
+        return np.load(os.path.join(pasta, indice["chaves"]))
+    print(f"Calculando as chaves das notificações de {csv_path} ({', '.join(chave)})...")
+    df, _ = carregar_dataset(csv_path)
+    partes = [chaves_notificacao(df, chave)]
+    for lote in indice["lotes"]:
+        bruto = normalizar(ler_csv(os.path.join(pasta, lote["arquivo"])), colunas)
+        partes.append(chaves_notificacao(compactar(bruto), chave))
+    return np.unique(np.concatenate(partes))
+
+
+def normalizar(bruto, colunas):
+    '''Só as colunas do dataset, com datas e números convertidos (entrada JSON ou CSV como texto).'''
+    nomes = {str(coluna).upper(): coluna for coluna in colunas}
+    bruto = bruto.rename(columns=lambda coluna: nomes.get(str(coluna).upper(), coluna))
+    faltando = [coluna for coluna in colunas if coluna not in bruto.columns]
+    if faltando:
+        raise ValueError(f"Colunas ausentes no lote: {', '.join(faltando)}")
+    bruto = bruto[colunas].copy()
+    for coluna in colunas:
+        if coluna in COLUNAS_DATA:
+            bruto[coluna] = pd.to_datetime(bruto[coluna])
+        elif ESQUEMA.get(coluna) == "numero":
+            bruto[coluna] = pd.to_numeric(bruto[coluna], errors="coerce")
+    return bruto.reset_index(drop=True)
+
+
+# --- Ingestão ---
+
+def ingerir(bruto, csv_path=CSV_PATH, origem=None):
+    '''
+    Ingere um lote (DataFrame lido de CSV ou JSON) e publica as linhas novas.
+
+    Retorna um resumo: recebidas, novas, duplicadas, a chave usada, o
+    arquivo do lote (None se nada era novo) e o total de lotes publicados.
+    Levanta ValueError se faltarem colunas (do lote ou da chave no
+    dataset) ou houver datas inválidas.
+    '''
+    pasta = caminho_incrementos(csv_path)
+    os.makedirs(pasta, exist_ok=True)
+    with _trava(pasta):
+        versao = versao_base(csv_path)
+        anterior = ler_indice(pasta)
+        indice = anterior
+        if indice is None or indice.get("base") != versao:
+            # Primeira ingestão, ou o CSV base foi trocado: recomeça os lotes
+            indice = {"base": versao, "lotes": [], "chaves": None,
+                      "sequencia": (anterior or {}).get("sequencia", 0)}
+        colunas = colunas_base(csv_path)
+        chave = colunas_chave(colunas)
+
+        try:
+            bruto = normalizar(bruto, colunas)
+            chaves = chaves_notificacao(compactar(bruto), chave)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Lote inválido: {e}") from e
+        existentes = _chaves_existentes(pasta, indice, csv_path, colunas, chave)
+
+        # Primeira ocorrência de cada chave no lote, e que ainda não foi vista
+        _, primeiras = np.unique(chaves, return_index=True)
+        manter = np.zeros(len(chaves), dtype=bool)
+        manter[primeiras] = True
+        posicoes = np.searchsorted(existentes, chaves)
+        vistas = posicoes < len(existentes)
+        vistas[vistas] = existentes[posicoes[vistas]] == chaves[vistas]
+        manter &= ~vistas
+
+        resumo = {"recebidas": len(bruto), "novas": int(manter.sum()),
+                  "duplicadas": int(len(bruto) - manter.sum()), "chave": chave, "lote": None}
+        if resumo["novas"]:
+            sequencia = indice["sequencia"] + 1
+            lote = f"lote_{sequencia:06d}.csv"
+            arquivo_chaves = f"chaves_{sequencia:06d}.npy"
+
+            temporario = os.path.join(pasta, lote + ".tmp")
+            bruto[manter].to_csv(temporario, index=False)
+            os.replace(temporario, os.path.join(pasta, lote))
+            temporario = os.path.join(pasta, arquivo_chaves + ".tmp")
+            with open(temporario, "wb") as f:
+                np.save(f, np.union1d(existentes, chaves[manter]))
+            os.replace(temporario, os.path.join(pasta, arquivo_chaves))
+
+            chaves_antigas = indice["chaves"]
+            indice = {**indice, "sequencia": sequencia, "chaves": arquivo_chaves, "chave": chave,
+                      "lotes": indice["lotes"] + [{
+                          "arquivo": lote,
+                          "linhas": resumo["novas"],
+                          "recebidas": resumo["recebidas"],
+                          "duplicadas": resumo["duplicadas"],
+                          "origem": origem,
+                          "data": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                      }]}
+            # Publicação: a partir daqui os workers veem o lote
+            _gravar_json(os.path.join(pasta, ARQUIVO_INDICE), indice)
+            if chaves_antigas and chaves_antigas != arquivo_chaves:
+                os.remove(os.path.join(pasta, chaves_antigas))
+            resumo["lote"] = lote
+        resumo["lotes"] = len(indice["lotes"])
+        return resumo
+
+
+def ingerir_arquivo(caminho, csv_path=CSV_PATH):
+    return ingerir(ler_csv(caminho), csv_path, origem=os.path.basename(caminho))
+
+
+def observar(csv_path=CSV_PATH, intervalo=INTERVALO_INGESTAO):
+    '''Ingere, em ordem de nome, os CSVs que aparecerem em <pasta>/entrada/.'''
+    pasta = caminho_incrementos(csv_path)
+    entrada, processados, rejeitados = (os.path.join(pasta, nome)
+                                        for nome in ("entrada", "processados", "rejeitados"))
+    for destino in (entrada, processados, rejeitados):
+        os.makedirs(destino, exist_ok=True)
+    print(f"Observando {entrada} (a cada {intervalo:g}s)...")
+    while True:
+        for caminho in sorted(glob.glob(os.path.join(entrada, "*.csv"))):
+            nome = os.path.basename(caminho)
+            try:
+                resumo = ingerir_arquivo(caminho, csv_path)
+            except (ValueError, pd.errors.ParserError) as e:
+                print(f"❌ {nome}: {e}")
+                os.replace(caminho, os.path.join(rejeitados, nome))
+                continue
+            print(f"✓ {nome}: {resumo['novas']:,} novas, {resumo['duplicadas']:,} duplicadas")
+            os.replace(caminho, os.path.join(processados, nome))
+        time.sleep(intervalo)
+
+
+def consolidar(csv_path=CSV_PATH):
+    '''
+    Incorpora os lotes ao CSV base e reconstrói o cache colunar.
+
+    O novo índice (sem lotes, base = SHA-256 do novo CSV) só é gravado
+    depois de o CSV ser trocado; entre uma coisa e outra, quem carregar
+    vê o CSV novo com o índice antigo, cuja base não confere, e ignora os
+    lotes, que já estão no CSV. As chaves continuam valendo.
+    '''
+    pasta = caminho_incrementos(csv_path)
+    os.makedirs(pasta, exist_ok=True)
+    with _trava(pasta):
+        indice = ler_indice(pasta)
+        lotes = lotes_validos(indice, versao_base(csv_path))
+        if not lotes:
+            print("Nenhum lote para consolidar")
+            return 0
+
+        temporario = csv_path + ".tmp"
+        shutil.copyfile(csv_path, temporario)
+        with open(temporario, "rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            final = f.read(1)
+            for lote in lotes:
+                with open(os.path.join(pasta, lote["arquivo"]), "rb") as origem:
+                    origem.readline()   # cabeçalho
+                    if final != b"\n":
+                        f.write(b"\n")
+                    conteudo = origem.read()
+                    f.write(conteudo)
+                    final = conteudo[-1:] or final
+        indice = {**indice, "base": checksum_arquivo(temporario), "lotes": []}
+        os.replace(temporario, csv_path)
+        _gravar_json(os.path.join(pasta, ARQUIVO_INDICE), indice)
+        for lote in lotes:
+            os.remove(os.path.join(pasta, lote["arquivo"]))
+    construir_cache(csv_path)
+    return sum(lote["linhas"] for lote in lotes)
+
+
+if __name__ == "__main__":
+    comando = sys.argv[1] if len(sys.argv) > 1 else "listar"
+
+    if comando == "observar":
+        observar()
+    elif comando == "consolidar":
+        linhas = consolidar()
+        if linhas:
+            print(f"✓ {linhas:,} linhas incorporadas a {CSV_PATH} (cache reconstruído)")
+    elif comando == "listar":
+        pasta = caminho_incrementos()
+        indice = ler_indice(pasta)
+        lotes = lotes_validos(indice, versao_base())
+        if indice is not None and not lotes and indice["lotes"]:
+            print(f"Os lotes de {pasta} são de outra versão do CSV base e não são aplicados")
+        print(f"{len(lotes)} lote(s) publicados em {pasta}")
+        for lote in lotes:
+            print(f"   {lote['arquivo']}  {lote['linhas']:>8,} novas  {lote['duplicadas']:>8,} duplicadas"
+                  f"  {lote['data']}  {lote.get('origem') or ''}")
+    else:
+        for caminho in sys.argv[1:]:
+            resumo = ingerir_arquivo(caminho)
+            print(f"✓ {os.path.basename(caminho)}: {resumo['recebidas']:,} recebidas, "
+                  f"{resumo['novas']:,} novas, {resumo['duplicadas']:,} duplicadas "
+                  f"({resumo['lotes']} lote(s) publicados)")
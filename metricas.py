@@ -0,0 +1,368 @@
+'''
+Métricas de latência no formato de exposição do Prometheus (sem dependências).
+
+- Histogramas por rota (dengue_http_requisicao_segundos) e por etapa
+  dentro dos handlers (dengue_etapa_segundos: leitura do JSON, consulta ao
+  cubo, predição, serialização...).
+- Medidores dos tempos de carga (dengue_carga_segundos: dataset, cubo,
+  estatísticas, modelos) e da versão servida de cada modelo.
+- Tamanho dos micro-lotes do serviço assíncrono (dengue_microlote_tamanho).
+- exportar() gera o texto do GET /metrics.
+
+Cada observação é um bisect nos limites dos buckets e três somas sob um
+lock (~1 µs). Com METRICAS=0 as etapas viram um contexto vazio e os hooks
+de request nem são registrados no app.
+
+Com vários workers do gunicorn, cada processo tem as suas métricas. Com
+METRICAS_DIR definido, cada worker publica as suas a cada
+INTERVALO_METRICAS segundos (thread própria, arquivo temporário +
+os.replace) em <METRICAS_DIR>/metricas-<pid>.json, e o /metrics de qualquer worker soma
+todos os arquivos. Medidores só contam workers em execução.
+
+No gunicorn (hooks em gunicorn.conf.py) o master apaga o diretório ao
+subir e, quando um worker termina, soma os histogramas dele a
+<METRICAS_DIR>/encerrados.json e apaga o arquivo do worker: os contadores
+nunca diminuem, o diretório não cresce com a reciclagem de workers e um
+worker novo que reaproveite o pid começa do zero.
+
+Variáveis de ambiente:
+    METRICAS             1 (padrão) liga a instrumentação; 0 desliga
+    METRICAS_DIR         diretório compartilhado entre workers (opcional)
+    INTERVALO_METRICAS   segundos entre publicações no METRICAS_DIR (padrão 5)
+'''
+
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos no METRICAS_DIR
+    fcntl = None
+
+METRICAS_ATIVAS = os.getenv("METRICAS", "1") == "1"
+METRICAS_DIR = os.getenv("METRICAS_DIR")
+INTERVALO_METRICAS = float(os.getenv("INTERVALO_METRICAS", "5"))
+
+# Histogramas somados dos workers já encerrados (METRICAS_DIR)
+ARQUIVO_ENCERRADOS = "encerrados.json"
+
+# Limites (segundos) dos buckets: de 100 µs a 10 s
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histograma:
+    '''Histograma com rótulos; cada série guarda [contagens por bucket, soma, total].'''
+
+    tipo = "histogram"
+
+    def __init__(self, nome, descricao, rotulos, buckets=BUCKETS):
+        self.nome = nome
+        self.descricao = descricao
+        self.rotulos = tuple(rotulos)
+        self.buckets = tuple(buckets)
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor, *valores_rotulos):
+        posicao = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self.series.get(valores_rotulos)
+            if serie is None:
+                serie = self.series[valores_rotulos] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            serie[0][posicao] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def copiar(self):
+        with self._lock:
+            return {rotulos: [list(contagens), soma, total]
+                    for rotulos, (contagens, soma, total) in self.series.items()}
+
+    @staticmethod
+    def somar(a, b):
+        return [[x + y for x, y in zip(a[0], b[0])], a[1] + b[1], a[2] + b[2]]
+
+    def linhas(self, series):
+        for rotulos, (contagens, soma, total) in sorted(series.items()):
+            base = list(zip(self.rotulos, rotulos))
+            acumulado = 0
+            for limite, contagem in zip(self.buckets + (float("inf"),), contagens):
+                acumulado += contagem
+                le = "+Inf" if limite == float("inf") else repr(limite)
+                yield f"{self.nome}_bucket{_rotulos(base + [('le', le)])} {acumulado}"
+            yield f"{self.nome}_sum{_rotulos(base)} {soma!r}"
+            yield f"{self.nome}_count{_rotulos(base)} {total}"
+
+
+class Medidor:
+    '''Valor instantâneo com rótulos (na soma entre workers vale o maior).'''
+
+    tipo = "gauge"
+
+    def __init__(self, nome, descricao, rotulos):
+        self.nome = nome
+        self.descricao = descricao
+        self.rotulos = tuple(rotulos)
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def definir(self, valor, *valores_rotulos):
+        with self._lock:
+            self.series[valores_rotulos] = float(valor)
+
+    def remover(self, *valores_rotulos):
+        with self._lock:
+            self.series.pop(valores_rotulos, None)
+
+    def copiar(self):
+        with self._lock:
+            return dict(self.series)
+
+    @staticmethod
+    def somar(a, b):
+        return max(a, b)
+
+    def linhas(self, series):
+        for rotulos, valor in sorted(series.items()):
+            yield f"{self.nome}{_rotulos(list(zip(self.rotulos, rotulos)))} {valor!r}"
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _rotulos(pares):
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{nome}="{_escapar(valor)}"' for nome, valor in pares) + "}"
+
+
+# --- Métricas do app ---
+
+REQUISICOES = Histograma(
+    "dengue_http_requisicao_segundos", "Latência das requisições por rota",
+    ("rota", "metodo", "status"))
+ETAPAS = Histograma(
+    "dengue_etapa_segundos", "Latência de cada etapa dentro dos handlers",
+    ("rota", "etapa"))
+CARGA = Medidor(
+    "dengue_carga_segundos", "Duração da última carga de dados/modelos", ("etapa",))
+MODELO = Medidor(
+    "dengue_modelo_info", "Versão servida de cada modelo (valor 1)", ("papel", "versao"))
+MICROLOTES = Histograma(
+    "dengue_microlote_tamanho", "Predições pontuadas por micro-lote (servico_async.py)", (),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512))
+
+METRICAS = [REQUISICOES, ETAPAS, CARGA, MODELO, MICROLOTES]
+
+
+class _Etapa:
+    '''Context manager que observa a duração do bloco em ETAPAS.'''
+
+    __slots__ = ("rota", "nome", "inicio")
+
+    def __init__(self, rota, nome):
+        self.rota = rota
+        self.nome = nome
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        ETAPAS.observar(time.perf_counter() - self.inicio, self.rota, self.nome)
+        return False
+
+
+_VAZIO = nullcontext()
+
+
+def etapa(rota, nome):
+    '''`with etapa("predict", "predicao"): ...` mede o bloco (não faz nada com METRICAS=0).'''
+    if not METRICAS_ATIVAS:
+        return _VAZIO
+    return _Etapa(rota, nome)
+
+
+def registrar_carga(nome, segundos):
+    CARGA.definir(segundos, nome)
+
+
+def registrar_modelo(papel, versao):
+    '''Mantém uma única série por papel em dengue_modelo_info.'''
+    for rotulos in list(MODELO.copiar()):
+        if rotulos[0] == papel:
+            MODELO.remover(*rotulos)
+    if versao is not None:
+        MODELO.definir(1, papel, versao)
+
+
+# --- Agregação entre workers (METRICAS_DIR) ---
+
+_lock_publicacao = threading.Lock()
+_publicador_pid = None
+
+
+def _serializar():
+    return {m.nome: [[list(rotulos), valor] for rotulos, valor in m.copiar().items()]
+            for m in METRICAS}
+
+
+def _arquivo_worker(pid):
+    return os.path.join(METRICAS_DIR, f"metricas-{pid}.json")
+
+
+def _gravar(arquivo, conteudo):
+    '''Grava JSON em arquivo temporário e publica com os.replace.'''
+    temporario = arquivo + ".tmp"
+    with open(temporario, "w") as f:
+        json.dump(conteudo, f)
+    os.replace(temporario, arquivo)
+
+
+def _ler(arquivo):
+    try:
+        with open(arquivo) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def publicar():
+    '''Grava as métricas deste worker em <METRICAS_DIR>/metricas-<pid>.json.'''
+    if not METRICAS_DIR:
+        return
+    with _lock_publicacao:
+        os.makedirs(METRICAS_DIR, exist_ok=True)
+        _gravar(_arquivo_worker(os.getpid()), _serializar())
+
+
+def _publicar_periodicamente():
+    while True:
+        time.sleep(INTERVALO_METRICAS)
+        try:
+            publicar()
+        except OSError as e:
+            print(f"AVISO: métricas não publicadas em {METRICAS_DIR}: {e}")
+
+
+def iniciar_publicador():
+    '''
+    Inicia (uma vez por processo) a thread que publica as métricas a cada
+    INTERVALO_METRICAS segundos. Chamada a cada request: depois do fork do
+    gunicorn, o pid muda e o worker ganha a sua própria thread.
+    '''
+    global _publicador_pid
+    if not METRICAS_DIR or _publicador_pid == os.getpid():
+        return
+    with _lock_publicacao:
+        if _publicador_pid == os.getpid():
+            return
+        _publicador_pid = os.getpid()
+    threading.Thread(target=_publicar_periodicamente, daemon=True).start()
+
+
+def _processo_vivo(arquivo):
+    pid = int(os.path.basename(arquivo)[len("metricas-"):-len(".json")])
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+@contextmanager
+def _trava(exclusiva):
+    '''
+    Trava entre processos no METRICAS_DIR: quem soma (compartilhada) nunca vê
+    um worker já incorporado a encerrados.json e ainda com o próprio arquivo.
+    '''
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(METRICAS_DIR, exist_ok=True)
+    with open(os.path.join(METRICAS_DIR, ".trava"), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusiva else fcntl.LOCK_SH)
+        yield
+
+
+def _acumular(total, conteudo, com_medidores):
+    '''Soma as séries de um arquivo publicado em `total` (nome -> {rótulos: valor}).'''
+    por_nome = {m.nome: m for m in METRICAS}
+    for nome, series in conteudo.items():
+        # Medidores (versão do modelo, tempos de carga) só dos workers em execução
+        if nome not in por_nome or (por_nome[nome].tipo == "gauge" and not com_medidores):
+            continue
+        for rotulos, valor in series:
+            rotulos = tuple(rotulos)
+            atual = total[nome].get(rotulos)
+            total[nome][rotulos] = valor if atual is None else por_nome[nome].somar(atual, valor)
+
+
+def incorporar_worker(pid):
+    '''
+    Soma os histogramas do worker encerrado `pid` aos de encerrados.json e
+    apaga o arquivo dele. Chamada pelo master do gunicorn (child_exit).
+    '''
+    if not METRICAS_DIR:
+        return
+    arquivo = _arquivo_worker(pid)
+    encerrados = os.path.join(METRICAS_DIR, ARQUIVO_ENCERRADOS)
+    with _trava(exclusiva=True):
+        conteudo = _ler(arquivo)
+        if conteudo is None:
+            return
+        total = {m.nome: {} for m in METRICAS}
+        _acumular(total, _ler(encerrados) or {}, com_medidores=False)
+        _acumular(total, conteudo, com_medidores=False)
+        _gravar(encerrados, {nome: [[list(rotulos), valor] for rotulos, valor in series.items()]
+                             for nome, series in total.items()})
+        os.remove(arquivo)
+
+
+def limpar_diretorio():
+    '''Apaga as métricas publicadas por uma execução anterior (master do gunicorn, on_starting).'''
+    if not METRICAS_DIR:
+        return
+    arquivos = glob.glob(os.path.join(METRICAS_DIR, "metricas-*.json*"))
+    for arquivo in arquivos + [os.path.join(METRICAS_DIR, ARQUIVO_ENCERRADOS)]:
+        try:
+            os.remove(arquivo)
+        except FileNotFoundError:
+            pass
+
+
+def _agregar():
+    '''Séries de todos os workers (METRICAS_DIR) ou só deste processo.'''
+    if not METRICAS_DIR:
+        return {m.nome: m.copiar() for m in METRICAS}
+
+    publicar()
+    total = {m.nome: {} for m in METRICAS}
+    with _trava(exclusiva=False):
+        _acumular(total, _ler(os.path.join(METRICAS_DIR, ARQUIVO_ENCERRADOS)) or {},
+                  com_medidores=False)
+        for arquivo in glob.glob(os.path.join(METRICAS_DIR, "metricas-*.json")):
+            conteudo = _ler(arquivo)
+            if conteudo is not None:
+                _acumular(total, conteudo, com_medidores=_processo_vivo(arquivo))
+    return total
+
+
+def exportar():
+    '''Texto no formato de exposição do Prometheus (text/plain; version=0.0.4).'''
+    series = _agregar()
+    linhas = []
+    for metrica in METRICAS:
+        linhas.append(f"# HELP {metrica.nome} {metrica.descricao}")
+        linhas.append(f"# TYPE {metrica.nome} {metrica.tipo}")
+        linhas.extend(metrica.linhas(series[metrica.nome]))
+    return "\n".join(linhas) + "\n"
@@ -0,0 +1,176 @@
+'''
+Tunagem da Regressão Logística com Optuna: estudo persistente, paralelo e com poda.
+
+- O estudo fica num banco SQLite (OPTUNA_STORAGE) e é reaberto com
+  load_if_exists: se o treino for interrompido, a próxima execução continua
+  de onde parou e só roda os trials que faltam para chegar a N trials.
+- Os trials rodam em vários processos (OPTUNA_WORKERS), todos apontando
+  para o mesmo banco; cada processo pega o próximo trial até o estudo
+  atingir N trials concluídos ou podados.
+- A validação cruzada é feita fold a fold: o recall médio parcial é
+  reportado a cada fold e o MedianPruner abandona o trial logo no início
+  se ele estiver abaixo da mediana dos anteriores no mesmo fold.
+- Reamostragem por fold (CV_REAMOSTRAGEM=fold, padrão): a CV parte do
+  treino original e cada fold passa por um pipeline imblearn
+  (StandardScaler -> SMOTE) ajustado só no treino do fold, então nenhum
+  vizinho sintético vaza para a validação. As matrizes de cada fold são
+  preparadas uma vez, antes do primeiro trial, e reaproveitadas por todos.
+  CV_REAMOSTRAGEM=global mantém o modo antigo (CV sobre o treino já
+  balanceado).
+
+Variáveis de ambiente:
+    OPTUNA_STORAGE   URL do banco (padrão sqlite:///optuna_dengue.db)
+    OPTUNA_TRIALS    total de trials do estudo (padrão 50)
+    OPTUNA_WORKERS   processos em paralelo (padrão: núcleos, até 4)
+    CV_REAMOSTRAGEM  fold (padrão) ou global
+'''
+
+import multiprocessing
+import os
+
+import numpy as np
+import optuna
+from imblearn.over_sampling import SMOTE
+from imblearn.pipeline import Pipeline
+from optuna.pruners import MedianPruner
+from optuna.samplers import TPESampler
+from optuna.study import MaxTrialsCallback
+from optuna.trial import TrialState
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import recall_score
+from sklearn.model_selection import StratifiedKFold
+from sklearn.preprocessing import StandardScaler
+
+OPTUNA_STORAGE = os.getenv("OPTUNA_STORAGE", "sqlite:///optuna_dengue.db")
+OPTUNA_TRIALS = int(os.getenv("OPTUNA_TRIALS", "50"))
+OPTUNA_WORKERS = int(os.getenv("OPTUNA_WORKERS", str(min(4, os.cpu_count() or 1))))
+CV_REAMOSTRAGEM = os.getenv("CV_REAMOSTRAGEM", "fold")
+N_FOLDS = 5
+
+# Folds da validação cruzada, preparados antes do fork e herdados pelos workers
+_FOLDS = []
+_RANDOM_STATE = 42
+
+
+def preparar_folds(X, y, random_state=42, reamostrar=True):
+    '''
+    Divide (X, y) em N_FOLDS estratificados e prepara cada fold uma única vez.
+
+    Com `reamostrar`, X é o treino original (sem escala nem SMOTE): o
+    pipeline scaler -> SMOTE é ajustado no treino de cada fold e a
+    validação do fold só recebe a escala. Retorna uma lista de
+    (X_treino, y_treino, X_validacao, y_validacao).
+    '''
+    X = np.asarray(X)
+    y = np.asarray(y)
+    cv = StratifiedKFold(n_splits=N_FOLDS, shuffle=True, random_state=random_state)
+
+    folds = []
+    for treino, validacao in cv.split(X, y):
+        if reamostrar:
+            pipeline = Pipeline([
+                ('scaler', StandardScaler()),
+                ('smote', SMOTE(random_state=random_state)),
+            ])
+            X_treino, y_treino = pipeline.fit_resample(X[treino], y[treino])
+            X_validacao = pipeline.named_steps['scaler'].transform(X[validacao])
+        else:
+            X_treino, y_treino, X_validacao = X[treino], y[treino], X[validacao]
+        folds.append((X_treino, y_treino, X_validacao, y[validacao]))
+    return folds
+
+
+def parametros(trial):
+    '''Espaço de busca da Regressão Logística.'''
+    return {
+        'C': trial.suggest_float('C', 0.001, 100.0, log=True),
+        'penalty': trial.suggest_categorical('penalty', ['l1', 'l2']),
+        'solver': 'saga',
+        'max_iter': 2000,
+        'random_state': _RANDOM_STATE,
+        'class_weight': trial.suggest_categorical('class_weight', ['balanced', None])
+    }
+
+
+def objective(trial):
+    '''Recall médio em CV estratificada, reportado fold a fold para a poda.'''
+    params = parametros(trial)
+
+    scores = []
+    for fold, (X_treino, y_treino, X_validacao, y_validacao) in enumerate(_FOLDS):
+        model = LogisticRegression(**params)
+        model.fit(X_treino, y_treino)
+        scores.append(recall_score(y_validacao, model.predict(X_validacao)))
+
+        trial.report(float(np.mean(scores)), fold)
+        if trial.should_prune():
+            raise optuna.TrialPruned()
+    return float(np.mean(scores))
+
+
+def _criar_estudo(nome, storage, seed):
+    return optuna.create_study(
+        study_name=nome,
+        storage=storage,
+        direction='maximize',
+        load_if_exists=True,
+        sampler=TPESampler(seed=seed),
+        # Sem poda nos 5 primeiros trials; depois, pode abandonar já no 1º fold
+        pruner=MedianPruner(n_startup_trials=5, n_warmup_steps=0),
+    )
+
+
+def _worker(nome, storage, n_trials, seed):
+    '''Processo de otimização: roda trials até o estudo atingir n_trials.'''
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    study = _criar_estudo(nome, storage, seed)
+    study.optimize(
+        objective,
+        callbacks=[MaxTrialsCallback(n_trials, states=(TrialState.COMPLETE, TrialState.PRUNED))],
+        show_progress_bar=False,
+    )
+
+
+def otimizar(X, y, nome, random_state=42, reamostrar=True, n_trials=OPTUNA_TRIALS,
+             n_workers=OPTUNA_WORKERS, storage=OPTUNA_STORAGE):
+    '''
+    Roda (ou retoma) o estudo `nome` e retorna o optuna.Study.
+
+    `nome` deve identificar os dados de treino (ex.: chave do pipeline),
+    para que um estudo antigo não seja retomado com dados diferentes.
+    `reamostrar` indica que X é o treino original e o SMOTE deve ser feito
+    dentro de cada fold (ver preparar_folds).
+    '''
+    global _FOLDS, _RANDOM_STATE
+    _RANDOM_STATE = random_state
+
+    study = _criar_estudo(nome, storage, random_state)
+    feitos = len(study.get_trials(deepcopy=False, states=(TrialState.COMPLETE, TrialState.PRUNED)))
+    if feitos >= n_trials:
+        print(f"Estudo '{nome}' já tem {feitos} trials; usando resultado salvo")
+        return study
+    print(f"Estudo '{nome}': {feitos}/{n_trials} trials feitos, "
+          f"rodando o restante em {n_workers} processo(s)")
+
+    _FOLDS = preparar_folds(X, y, random_state, reamostrar)
+    print(f"Folds preparados ({'SMOTE por fold' if reamostrar else 'treino já balanceado'}): "
+          f"{len(_FOLDS[0][0]):,} linhas de treino por fold")
+
+    if n_workers <= 1:
+        _worker(nome, storage, n_trials, random_state)
+    else:
+        # fork: os workers herdam _FOLDS sem serializar as matrizes
+        contexto = multiprocessing.get_context("fork")
+        processos = [
+            contexto.Process(target=_worker, args=(nome, storage, n_trials, random_state + i))
+            for i in range(n_workers)
+        ]
+        for p in processos:
+            p.start()
+        for p in processos:
+            p.join()
+
+    study = optuna.load_study(study_name=nome, storage=storage)
+    podados = len(study.get_trials(deepcopy=False, states=(TrialState.PRUNED,)))
+    print(f"Trials podados: {podados} de {len(study.trials)}")
+    return study
@@ -0,0 +1,274 @@
+'''
+Pipeline de preparação dos dados de treino com cache em disco por etapa.
+
+Etapas (na ordem): carregar -> limpar -> filtrar_qualidade -> features -> split.
+
+Cada etapa tem uma chave de conteúdo: SHA-256 da chave da etapa anterior,
+do código-fonte da função da etapa, do código de que ela depende
+(DEPENDENCIAS: funções auxiliares, features_modelo.py com PESOS_SEVERIDADE
+e as regras das features, constantes como EXCLUDE_COLS), dos seus
+parâmetros e de VERSAO_PIPELINE. A primeira etapa
+parte do SHA-256 do CSV. A saída é gravada em <csv>.etapas/<etapa>-<chave>.pkl
+(joblib); se o arquivo já existe, a etapa é pulada e a saída é lida do disco.
+
+Assim, rodar o treino de novo mudando só Optuna ou modelo vai direto para o
+treinamento, e alterar uma etapa (código ou parâmetro) muda a sua chave e a
+de todas as etapas seguintes, sem invalidar as anteriores.
+
+Desligar o cache: PIPELINE_CACHE=0 python treinar_modelo_final.py
+Invalidar o cache de todas as etapas (ex.: a limpeza mudou por causa de
+outra versão do pandas, que não aparece no código): incrementar
+VERSAO_PIPELINE.
+'''
+
+import hashlib
+import inspect
+import json
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+
+import features_modelo
+from dados import checksum_arquivo
+from features_modelo import (
+    CAMPOS_BINARIOS, MODEL_FEATURES, VALORES_PADRAO, contar_ignorados, features_derivadas,
+    montar_matriz
+)
+
+# Versão do pipeline: incrementar invalida o cache de todas as etapas
+VERSAO_PIPELINE = 1
+
+# Colunas que não entram como feature (texto, datas, target e auxiliares)
+EXCLUDE_COLS = [
+    'HOSPITALIZ', 'HOSPITALIZ_BIN', 'DT_NOTIFIC', 'DT_SIN_PRI',
+    'CS_SEXO', 'CS_RACA', 'FENOMENO', 'INTENS_FENOM', 'IDADE_FAIXA',
+    'FEBRE', 'MIALGIA', 'CEFALEIA', 'VOMITO', 'EXANTEMA',
+    'PETEQUIA_N', 'DIABETES', 'HEMATOLOG', 'HEPATOPAT', 'RENAL',
+    'MUNICÍPIO', 'ESTADO', 'CS_GESTANT', 'RESUL_SORO', 'RESUL_NS1',
+    'RESUL_VI_N', 'SOROTIPO', 'IMUNOH_N', 'CLASSI_FIN', 'CRITERIO',
+    'TPAUTOCTO', 'EVOLUCAO', 'QTD_IGNORADOS'
+]
+
+
+def caminho_etapas(csv_path):
+    '''Diretório do cache das etapas ao lado do CSV (ex.: df_dengue_tratado.etapas/).'''
+    return os.path.splitext(csv_path)[0] + ".etapas"
+
+
+def _fonte(dependencia):
+    '''Código-fonte de uma função ou módulo; valor (repr) de uma constante.'''
+    if inspect.isfunction(dependencia) or inspect.ismodule(dependencia):
+        return inspect.getsource(dependencia)
+    return repr(dependencia)
+
+
+def chave_etapa(nome, funcao, chave_entrada, params):
+    '''Chave de conteúdo da etapa: entrada + código da função e das dependências + parâmetros.'''
+    conteudo = json.dumps({
+        "etapa": nome,
+        "entrada": chave_entrada,
+        "codigo": inspect.getsource(funcao),
+        "dependencias": [_fonte(d) for d in DEPENDENCIAS.get(nome, [])],
+        "params": params,
+        "versao": VERSAO_PIPELINE,
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+
+# ==============================================================================
+# ETAPAS
+# ==============================================================================
+
+def carregar(csv_path):
+    '''1. Lê o CSV e remove IGNORADO em HOSPITALIZ.'''
+    df = pd.read_csv(csv_path)
+    print(f"Dataset original: {len(df):,} registros")
+
+    df = df[df['HOSPITALIZ'].isin(['SIM', 'NÃO'])].copy()
+    print(f"Após remover IGNORADO: {len(df):,} registros")
+    return df
+
+
+def remover_outliers(df, idade_max=120, dias_max=30):
+    '''Regras de outliers de idade e de dias sintoma -> notificação (sem prints).'''
+    df = df[(df['IDADE'] >= 0) & (df['IDADE'] <= idade_max)].copy()
+
+    df['DT_NOTIFIC'] = pd.to_datetime(df['DT_NOTIFIC'], errors='coerce')
+    df['DT_SIN_PRI'] = pd.to_datetime(df['DT_SIN_PRI'], errors='coerce')
+    df['DIAS_SINTOMA_NOTIFIC'] = (df['DT_NOTIFIC'] - df['DT_SIN_PRI']).dt.days
+    df['DIAS_SINTOMA_NOTIFIC'] = df['DIAS_SINTOMA_NOTIFIC'].fillna(0)
+    return df[(df['DIAS_SINTOMA_NOTIFIC'] >= 0) & (df['DIAS_SINTOMA_NOTIFIC'] <= dias_max)]
+
+
+def filtrar_ignorados(df, max_ignorados=3):
+    '''Mantém os casos com menos de `max_ignorados` sintomas IGNORADO (sem prints).'''
+    df = df.copy()
+    df['QTD_IGNORADOS'] = contar_ignorados(df)
+    return df[df['QTD_IGNORADOS'] < max_ignorados]
+
+
+def limpar(df, idade_max=120, dias_max=30):
+    '''2. Remove outliers de idade e de dias entre sintoma e notificação.'''
+    antes = len(df)
+    df = remover_outliers(df, idade_max, dias_max)
+    print(f"Idade > {idade_max} ou dias > {dias_max}: removidos {antes - len(df)} registros")
+
+    print(f"\n✅ Dataset após remoção de outliers: {len(df):,} registros")
+    return df
+
+
+def filtrar_qualidade(df, max_ignorados=3):
+    '''3. Remove casos com muitos sintomas IGNORADO.'''
+    antes = len(df)
+    df = filtrar_ignorados(df, max_ignorados)
+    print(f"Removidos {antes - len(df)} casos com ≥ {max_ignorados} sintomas IGNORADO")
+    print(f"✅ Dataset final: {len(df):,} registros")
+    return df
+
+
+def features(df, colunas="todas"):
+    '''
+    4-5. Feature engineering e seleção das colunas (X, y).
+
+    As features compartilhadas com a API (binárias, SEVERITY_SCORE, scores,
+    temporais) vêm de features_modelo.py. `colunas="todas"` usa todas as
+    colunas numéricas; `colunas="modelo"` treina exatamente nas 14
+    MODEL_FEATURES servidas pela API.
+    '''
+    df = df.copy()
+    derivadas = features_derivadas(df)
+
+    # 4.1 Features temporais
+    for coluna in ['MES', 'ANO', 'TRIMESTRE']:
+        df[coluna] = derivadas[coluna]
+
+    # 4.2 Features clínicas (binárias)
+    for feature in CAMPOS_BINARIOS:
+        if feature in df.columns:
+            df[f'{feature}_BIN'] = derivadas[f'{feature}_BIN']
+
+    # 4.3 Features demográficas
+    df['SEXO_BIN'] = (df['CS_SEXO'] == 'M').astype(int)
+    # Mesmo valor do treino em streaming e da API (montar_matriz), e não a
+    # mediana desta base; remover_outliers já descarta idades ausentes
+    df['IDADE'] = df['IDADE'].fillna(VALORES_PADRAO['IDADE'])
+
+    # Raça (one-hot)
+    raca_dummies = pd.get_dummies(df['CS_RACA'], prefix='RACA', drop_first=True)
+    df = pd.concat([df, raca_dummies], axis=1)
+
+    # 4.4 Features climáticas
+    if 'FENOMENO' in df.columns:
+        fenomeno_dummies = pd.get_dummies(df['FENOMENO'], prefix='FENOMENO', drop_first=True)
+        df = pd.concat([df, fenomeno_dummies], axis=1)
+
+    if 'INTENS_FENOM' in df.columns:
+        intens_dummies = pd.get_dummies(df['INTENS_FENOM'], prefix='INTENS', drop_first=True)
+        df = pd.concat([df, intens_dummies], axis=1)
+
+    # 4.5 ⭐ SEVERITY_SCORE (pesos clínicos em features_modelo.PESOS_SEVERIDADE)
+    # 4.6 Scores de sintomas e comorbidades
+    for coluna in ['SEVERITY_SCORE', 'SINTOMAS_SCORE', 'COMORBIDADE_SCORE', 'TEM_COMORBIDADE']:
+        df[coluna] = derivadas[coluna]
+
+    # 4.7 Faixas etárias (grupos de risco)
+    df['IDADE_FAIXA'] = pd.cut(
+        df['IDADE'],
+        bins=[0, 5, 18, 60, 120],
+        labels=['Criança', 'Adolescente', 'Adulto', 'Idoso']
+    )
+    faixa_dummies = pd.get_dummies(df['IDADE_FAIXA'], prefix='FAIXA', drop_first=True)
+    df = pd.concat([df, faixa_dummies], axis=1)
+
+    # 4.8 Target
+    df['HOSPITALIZ_BIN'] = (df['HOSPITALIZ'] == 'SIM').astype(int)
+
+    print("✅ Feature Engineering completo!")
+
+    # 5. Seleção das colunas
+    if colunas == "modelo":
+        feature_cols = list(MODEL_FEATURES)
+        X = pd.DataFrame(montar_matriz(df), columns=feature_cols, index=df.index)
+    else:
+        all_numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+        feature_cols = [col for col in all_numeric_cols
+                        if col not in EXCLUDE_COLS and col != 'HOSPITALIZ_BIN']
+        X = df[feature_cols].fillna(0)
+    y = df['HOSPITALIZ_BIN'].copy()
+    return {"df": df, "feature_cols": feature_cols, "X": X, "y": y}
+
+
+def split(dados, test_size=0.2, random_state=42):
+    '''6. Train/test split estratificado.'''
+    X_train, X_test, y_train, y_test = train_test_split(
+        dados["X"], dados["y"], test_size=test_size, random_state=random_state, stratify=dados["y"]
+    )
+    return {**dados, "X_train": X_train, "X_test": X_test, "y_train": y_train, "y_test": y_test}
+
+
+# Nome, função e cabeçalho impresso de cada etapa, na ordem de execução
+ETAPAS = [
+    ("carregar", carregar, "📊 1. CARREGAMENTO E LIMPEZA DE DADOS"),
+    ("limpar", limpar, "🧹 2. REMOÇÃO DE OUTLIERS"),
+    ("filtrar_qualidade", filtrar_qualidade, "🔍 3. FILTRO DE QUALIDADE DE DADOS"),
+    ("features", features, "🔧 4. FEATURE ENGINEERING"),
+    ("split", split, "🔀 6. TRAIN/TEST SPLIT (80/20)"),
+]
+
+# O que cada etapa usa além do próprio código: mudar qualquer um invalida a
+# etapa (e as seguintes). features_modelo.py entra inteiro: pesos do
+# SEVERITY_SCORE, features_derivadas, montar_matriz e constantes.
+DEPENDENCIAS = {
+    "limpar": [remover_outliers],
+    "filtrar_qualidade": [filtrar_ignorados, features_modelo],
+    "features": [features_modelo, EXCLUDE_COLS],
+}
+
+
+def executar_pipeline(csv_path, params=None, usar_cache=None):
+    '''
+    Roda as etapas reaproveitando o cache em disco.
+
+    `params` mapeia nome da etapa -> kwargs (ex.: {"split": {"random_state": 42}}).
+    Retorna a saída da última etapa (dict com df, feature_cols, X, y,
+    X_train, X_test, y_train, y_test) mais a "chave" de conteúdo dela.
+    '''
+    params = params or {}
+    if usar_cache is None:
+        usar_cache = os.getenv("PIPELINE_CACHE", "1") != "0"
+    pasta = caminho_etapas(csv_path)
+    if usar_cache:
+        os.makedirs(pasta, exist_ok=True)
+
+    # Chaves de todas as etapas (encadeadas a partir do SHA-256 do CSV)
+    chave = checksum_arquivo(csv_path)
+    arquivos = []
+    for nome, funcao, _ in ETAPAS:
+        chave = chave_etapa(nome, funcao, chave, params.get(nome, {}))
+        arquivos.append(os.path.join(pasta, f"{nome}-{chave[:16]}.pkl"))
+
+    # Só a última etapa em cache é lida do disco; as anteriores nem são abertas
+    inicio, saida = 0, csv_path
+    if usar_cache:
+        for i in reversed(range(len(ETAPAS))):
+            if os.path.exists(arquivos[i]):
+                inicio, saida = i + 1, joblib.load(arquivos[i])
+                break
+
+    for i, (nome, funcao, titulo) in enumerate(ETAPAS):
+        print(f"\n{titulo}")
+        print("-"*80)
+        if i < inicio:
+            print(f"♻️  Cache: {os.path.basename(arquivos[i])}")
+            continue
+
+        saida = funcao(saida, **params.get(nome, {}))
+        if usar_cache:
+            # Grava em arquivo temporário e publica com os.replace (nunca um .pkl pela metade)
+            temporario = arquivos[i] + ".tmp"
+            joblib.dump(saida, temporario)
+            os.replace(temporario, arquivos[i])
+    return {**saida, "chave": chave}
@@ -0,0 +1,277 @@
+'''
+Predição em lote, pontuador NumPy e tabela de predições pré-computadas.
+
+A matriz de features vem de features_modelo.py (o mesmo módulo usado no
+treino): o usuário informa os 5 sintomas principais e, opcionalmente,
+comorbidades, datas ou qualquer feature do modelo (ex.: "IDADE": 70); o
+resto recebe valores padrão. Um lote de N pacientes vira uma única matriz
+N×14, pontuada com uma só chamada vetorizada (PontuadorLogistico ou
+predict_proba).
+'''
+
+import csv
+import hashlib
+import io
+import itertools
+import json
+import math
+
+import numpy as np
+import pandas as pd
+
+from features_modelo import (
+    CAMPOS_BINARIOS, CAMPOS_ENTRADA, MODEL_FEATURES, USER_INPUT_FEATURES, VALORES_PADRAO,
+    montar_matriz
+)
+
+# Limite de registros por requisição de lote
+MAX_REGISTROS_LOTE = 100_000
+
+# Linhas serializadas por bloco da resposta em streaming
+TAMANHO_BLOCO = 1000
+
+
+def ler_registros(req):
+    '''
+    Extrai os registros de uma requisição Flask de lote.
+
+    Aceita:
+    - JSON: lista de registros ou {"registros": [...]}
+    - CSV: upload multipart no campo "arquivo" ou corpo text/csv
+    Retorna (DataFrame, formato) onde formato é "json" ou "csv".
+    '''
+    if 'arquivo' in req.files:
+        return pd.read_csv(req.files['arquivo'].stream, dtype=str), "csv"
+    if req.mimetype == 'text/csv':
+        return pd.read_csv(io.BytesIO(req.get_data()), dtype=str), "csv"
+
+    dados = req.get_json(silent=True)
+    if isinstance(dados, dict):
+        dados = dados.get("registros")
+    if not isinstance(dados, list):
+        raise ValueError("Envie uma lista de registros em JSON ou um arquivo CSV")
+    return pd.DataFrame.from_records(dados), "json"
+
+
+def identificadores(df):
+    '''Coluna "id" opcional repassada na resposta; senão usa a posição no lote.'''
+    posicoes = [str(i) for i in range(len(df))]
+    for coluna in ('id', 'ID'):
+        if coluna in df.columns:
+            return [posicao if pd.isna(valor) else str(valor)
+                    for posicao, valor in zip(posicoes, df[coluna])]
+    return posicoes
+
+
+def gerar_resposta_lote(ids, probabilidades, formato):
+    '''
+    Gera a resposta do lote em blocos (NDJSON para JSON, CSV para CSV).
+
+    O modelo já foi chamado uma única vez; aqui só serializamos o resultado,
+    bloco a bloco, para não montar a resposta inteira em memória.
+    '''
+    probs = np.round(probabilidades * 100, 2)
+
+    if formato == "csv":
+        yield "id,probabilidade_hospitalizacao\n"
+        for inicio in range(0, len(ids), TAMANHO_BLOCO):
+            buffer = io.StringIO()
+            escritor = csv.writer(buffer, lineterminator="\n")
+            for i in range(inicio, min(inicio + TAMANHO_BLOCO, len(ids))):
+                escritor.writerow([ids[i], float(probs[i])])
+            yield buffer.getvalue()
+    else:
+        for inicio in range(0, len(ids), TAMANHO_BLOCO):
+            linhas = [
+                json.dumps({"id": ids[i], "probabilidade_hospitalizacao": float(probs[i])},
+                           ensure_ascii=False)
+                for i in range(inicio, min(inicio + TAMANHO_BLOCO, len(ids)))
+            ]
+            yield "\n".join(linhas) + "\n"
+
+
+# --- Pontuador NumPy ---
+
+# Tolerância máxima entre o pontuador NumPy e o predict_proba do sklearn
+TOLERANCIA_PONTUADOR = 1e-9
+
+
+class PontuadorLogistico:
+    '''
+    Regressão logística compilada para NumPy puro.
+
+    Extrai coef_/intercept_ do LogisticRegression e, se houver, funde o
+    StandardScaler nos pesos: ((x - media) / escala) · w + b vira
+    x · w' + b'. A predição fica um produto escalar seguido da sigmoide,
+    sem a validação de entrada e o dispatch do sklearn.
+    '''
+
+    def __init__(self, pesos, intercepto):
+        self.pesos = np.ascontiguousarray(pesos, dtype=float)
+        self.intercepto = float(intercepto)
+        # Cópia em lista para o caminho escalar (1 paciente)
+        self._pesos_lista = self.pesos.tolist()
+
+    @classmethod
+    def compilar(cls, model, scaler=None):
+        '''Cria o pontuador a partir de um LogisticRegression binário (e scaler opcional).'''
+        coef = np.asarray(model.coef_, dtype=float)
+        if coef.shape[0] != 1:
+            raise ValueError("Pontuador suporta apenas regressão logística binária")
+        pesos = coef[0]
+        intercepto = float(np.asarray(model.intercept_, dtype=float)[0])
+
+        if scaler is not None:
+            media = scaler.mean_ if getattr(scaler, 'mean_', None) is not None else np.zeros_like(pesos)
+            escala = scaler.scale_ if getattr(scaler, 'scale_', None) is not None else np.ones_like(pesos)
+            pesos = pesos / np.asarray(escala, dtype=float)
+            intercepto = intercepto - float(np.dot(np.asarray(media, dtype=float), pesos))
+        return cls(pesos, intercepto)
+
+    @staticmethod
+    def _sigmoide(z):
+        '''Sigmoide numericamente estável (sem overflow para |z| grande).'''
+        if z >= 0:
+            return 1.0 / (1.0 + math.exp(-z))
+        e = math.exp(z)
+        return e / (1.0 + e)
+
+    def probabilidade(self, x):
+        '''Probabilidade da classe 1 para um único paciente (vetor 1D).'''
+        z = self.intercepto
+        for xi, wi in zip(x.tolist() if isinstance(x, np.ndarray) else x, self._pesos_lista):
+            z += xi * wi
+        return self._sigmoide(z)
+
+    def probabilidades(self, X):
+        '''Probabilidade da classe 1 para cada linha de uma matriz N×14.'''
+        z = np.asarray(X, dtype=float) @ self.pesos + self.intercepto
+        # exp(-|z|) nunca estoura; recompõe os dois ramos da sigmoide
+        e = np.exp(-np.abs(z))
+        return np.where(z >= 0, 1.0 / (1.0 + e), e / (1.0 + e))
+
+    def predict_proba(self, X):
+        '''Mesma interface do sklearn: colunas [P(classe 0), P(classe 1)].'''
+        p = self.probabilidades(X)
+        return np.column_stack([1.0 - p, p])
+
+    def verificar(self, model, scaler=None, X_referencia=None):
+        '''
+        Compara com o sklearn e retorna o maior desvio absoluto.
+
+        Por padrão usa as 32 combinações dos 5 sintomas mais uma amostra
+        aleatória em torno dos valores padrão. Levanta ValueError se o
+        desvio passar de TOLERANCIA_PONTUADOR.
+        '''
+        if X_referencia is None:
+            X_referencia = matriz_referencia()
+        X_sklearn = scaler.transform(X_referencia) if scaler is not None else X_referencia
+        esperado = model.predict_proba(X_sklearn)[:, 1]
+
+        obtido = self.probabilidades(X_referencia)
+        obtido_escalar = np.array([self.probabilidade(x) for x in X_referencia])
+        desvio = float(max(np.max(np.abs(obtido - esperado)),
+                           np.max(np.abs(obtido_escalar - esperado))))
+        if desvio > TOLERANCIA_PONTUADOR:
+            raise ValueError(f"Pontuador diverge do sklearn (desvio máx. {desvio:.2e})")
+        return desvio
+
+
+def matriz_referencia(n_aleatorios=200, seed=42):
+    '''Matriz de verificação: 32 combinações de sintomas + linhas aleatórias plausíveis.'''
+    combinacoes = [
+        {sintoma: ("SIM" if (i >> k) & 1 else "NÃO") for k, sintoma in enumerate(USER_INPUT_FEATURES)}
+        for i in range(2 ** len(USER_INPUT_FEATURES))
+    ]
+    X = montar_matriz(combinacoes)
+
+    rng = np.random.default_rng(seed)
+    aleatorios = np.tile(X[:1], (n_aleatorios, 1))
+    for j, feature in enumerate(MODEL_FEATURES):
+        base = VALORES_PADRAO.get(feature, 0)
+        aleatorios[:, j] = base + rng.integers(0, 10, n_aleatorios) * (1 if base else 0.3)
+    return np.vstack([X, aleatorios])
+
+
+# --- Tabela de predições pré-computadas ---
+
+# Grade padrão: só os 5 sintomas variam (2^5 = 32 respostas possíveis)
+GRADE_SINTOMAS = {sintoma: ["NÃO", "SIM"] for sintoma in USER_INPUT_FEATURES}
+
+# Limite de células para uma grade discreta (produto dos tamanhos dos eixos)
+MAX_CELULAS_TABELA = 100_000
+
+
+def _normalizar_valor(campo, valor):
+    '''Normaliza um valor de entrada como montar_vetor o interpretaria.'''
+    if campo in CAMPOS_BINARIOS:
+        texto = "" if valor is None else str(valor).strip().upper()
+        return texto if texto in ("SIM", "IGNORADO") else "NÃO"
+    if campo not in VALORES_PADRAO:
+        return valor
+    try:
+        numero = float(valor)
+    except (TypeError, ValueError):
+        numero = math.nan
+    return float(VALORES_PADRAO[campo]) if math.isnan(numero) else numero
+
+
+class TabelaPredicao:
+    '''
+    Todas as respostas alcançáveis de uma grade discreta de entradas.
+
+    A grade é um dict campo -> valores possíveis (ex.: GRADE_SINTOMAS, ou
+    a mesma grade acrescida de "IDADE": [20, 40, 60]). Na construção cada
+    combinação é pontuada uma única vez, em lote; depois a predição é uma
+    consulta à tabela, sem chamar o modelo. Registros com campos ou valores
+    fora da grade não são cobertos e voltam None.
+    '''
+
+    def __init__(self, grade, prever_probabilidades):
+        self.campos = list(grade)
+        self.valores = {campo: [_normalizar_valor(campo, v) for v in grade[campo]] for campo in self.campos}
+        tamanhos = [len(self.valores[campo]) for campo in self.campos]
+        n_celulas = int(np.prod(tamanhos)) if tamanhos else 1
+        if n_celulas > MAX_CELULAS_TABELA:
+            raise ValueError(f"Grade com {n_celulas:,} células excede o limite de {MAX_CELULAS_TABELA:,}")
+
+        # Posição de cada valor no seu eixo e passo de cada eixo no índice linear
+        self._posicoes = {campo: {v: i for i, v in enumerate(self.valores[campo])} for campo in self.campos}
+        self._passos = [int(np.prod(tamanhos[k + 1:])) for k in range(len(tamanhos))]
+
+        combinacoes = [dict(zip(self.campos, valores))
+                       for valores in itertools.product(*(self.valores[c] for c in self.campos))]
+        self.probabilidades = np.asarray(prever_probabilidades(montar_matriz(combinacoes)), dtype=float)
+        self._combinacoes = combinacoes
+        self.versao = hashlib.sha256(
+            json.dumps(self.como_json(incluir_versao=False), sort_keys=True, ensure_ascii=False).encode()
+        ).hexdigest()[:16]
+
+    def consultar(self, registro):
+        '''Probabilidade da tabela para o registro, ou None se estiver fora da grade.'''
+        registro = {str(k).upper(): v for k, v in registro.items()}
+        for campo in registro:
+            if campo in CAMPOS_ENTRADA and campo not in self._posicoes:
+                return None
+
+        indice = 0
+        for campo, passo in zip(self.campos, self._passos):
+            posicao = self._posicoes[campo].get(_normalizar_valor(campo, registro.get(campo)))
+            if posicao is None:
+                return None
+            indice += posicao * passo
+        return float(self.probabilidades[indice])
+
+    def como_json(self, incluir_versao=True):
+        '''Tabela completa para o frontend manter em cache.'''
+        dados = {
+            "campos": [campo.lower() for campo in self.campos],
+            "entradas": [
+                {**{campo.lower(): valor for campo, valor in combinacao.items()},
+                 "probabilidade_hospitalizacao": round(float(p) * 100, 2)}
+                for combinacao, p in zip(self._combinacoes, self.probabilidades)
+            ]
+        }
+        if incluir_versao:
+            dados["versao"] = self.versao
+        return dados
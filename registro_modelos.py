@@ -0,0 +1,361 @@
+'''
+Registro de modelos: versões com metadados, modelo ativo e modelo sombra.
+
+Estrutura (REGISTRO_MODELOS, padrão models/registro/):
+
+    models/registro/
+        20251115-133945-482113/
+            modelo.pkl
+            scaler.pkl            (opcional)
+            config_modelo.json    (metadados no formato do config_modelo.json)
+        ativo.json                {"versao": "20251115-133945-482113"}
+        sombra.json               {"versao": "..."}   (opcional)
+
+Uma versão é gravada numa pasta temporária e publicada com os.replace; os
+ponteiros ativo.json/sombra.json também. A API (app.py) confere os
+ponteiros a cada INTERVALO_VERIFICACAO_MODELOS segundos e troca o modelo em
+memória sem reiniciar os workers do gunicorn. O modelo sombra é pontuado
+junto com o ativo, só para comparar latência e saídas (ComparacaoSombra);
+a resposta sempre vem do ativo.
+
+Antes de apontar um ponteiro para uma versão ela é carregada e verificada
+(14 MODEL_FEATURES, pontuador NumPy), então uma versão que a API não
+consegue servir nunca é promovida. Sem ativo.json a API serve o modelo
+legado (models/modelo_reglog_otimizado.pkl).
+
+Uso:
+    python registro_modelos.py listar
+    python registro_modelos.py registrar modelo.pkl [scaler.pkl] [config.json]
+    python registro_modelos.py promover <versao>
+    python registro_modelos.py sombra <versao>|nenhuma
+'''
+
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime
+
+import joblib
+import numpy as np
+
+from features_modelo import MODEL_FEATURES, montar_vetor
+from predicao import GRADE_SINTOMAS, PontuadorLogistico, TabelaPredicao
+
+REGISTRO_MODELOS = os.getenv("REGISTRO_MODELOS", "models/registro")
+
+PAPEIS = ("ativo", "sombra")
+
+ARQUIVO_MODELO = "modelo.pkl"
+ARQUIVO_SCALER = "scaler.pkl"
+ARQUIVO_METADADOS = "config_modelo.json"
+
+
+# --- Versões e ponteiros em disco ---
+
+def caminho_versao(versao, pasta=REGISTRO_MODELOS):
+    return os.path.join(pasta, versao)
+
+
+def caminho_ponteiro(papel, pasta=REGISTRO_MODELOS):
+    if papel not in PAPEIS:
+        raise ValueError(f"Papel desconhecido: {papel} (use {', '.join(PAPEIS)})")
+    return os.path.join(pasta, f"{papel}.json")
+
+
+def listar_versoes(pasta=REGISTRO_MODELOS):
+    '''Versões publicadas, da mais antiga para a mais recente.'''
+    if not os.path.isdir(pasta):
+        return []
+    return sorted(nome for nome in os.listdir(pasta)
+                  if not nome.startswith(".") and os.path.isdir(os.path.join(pasta, nome)))
+
+
+def ler_metadados(versao, pasta=REGISTRO_MODELOS):
+    with open(os.path.join(caminho_versao(versao, pasta), ARQUIVO_METADADOS), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _gravar_json(caminho, conteudo):
+    '''Grava JSON em arquivo temporário e publica com os.replace.'''
+    temporario = caminho + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(conteudo, f, indent=4, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+
+def registrar(modelo, metadados, scaler=None, versao=None, pasta=REGISTRO_MODELOS):
+    '''
+    Publica uma nova versão (modelo, scaler opcional e metadados) e retorna o nome dela.
+
+    A versão não vira ativa: a promoção é explícita (promover/apontar).
+    `metadados` segue o config_modelo.json ("modelo", "features",
+    "metricas", "data_treinamento", ...); "aplicar_scaler" indica se o
+    modelo foi treinado sobre as features normalizadas pelo scaler.
+    '''
+    # Microssegundos no nome padrão: dois registros no mesmo segundo não colidem
+    versao = versao or datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    destino = caminho_versao(versao, pasta)
+    if os.path.exists(destino):
+        raise FileExistsError(f"Versão já registrada: {versao}")
+
+    metadados = {
+        **metadados,
+        "versao": versao,
+        "aplicar_scaler": bool(metadados.get("aplicar_scaler", scaler is not None)),
+        "data_registro": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+    # Monta a versão numa pasta oculta e publica tudo de uma vez
+    temporario = os.path.join(pasta, f".{versao}.tmp")
+    shutil.rmtree(temporario, ignore_errors=True)
+    os.makedirs(temporario)
+    joblib.dump(modelo, os.path.join(temporario, ARQUIVO_MODELO))
+    if scaler is not None:
+        joblib.dump(scaler, os.path.join(temporario, ARQUIVO_SCALER))
+    _gravar_json(os.path.join(temporario, ARQUIVO_METADADOS), metadados)
+    os.replace(temporario, destino)
+    return versao
+
+
+def ler_ponteiro(papel, pasta=REGISTRO_MODELOS):
+    '''Versão apontada por ativo.json/sombra.json, ou None.'''
+    try:
+        with open(caminho_ponteiro(papel, pasta), encoding="utf-8") as f:
+            return json.load(f).get("versao")
+    except FileNotFoundError:
+        return None
+
+
+def apontar(papel, versao, pasta=REGISTRO_MODELOS):
+    '''
+    Aponta o papel ("ativo" ou "sombra") para a versão; None remove o ponteiro.
+
+    A versão é carregada e verificada antes, como a API faria.
+    '''
+    caminho = caminho_ponteiro(papel, pasta)
+    if versao is None:
+        if os.path.exists(caminho):
+            os.remove(caminho)
+        return
+    carregar_versao(versao, pasta, com_tabela=False)
+    _gravar_json(caminho, {"versao": versao,
+                           "data": datetime.now().strftime("%Y-%m-%d %H:%M:%S")})
+
+
+def assinatura_ponteiros(pasta=REGISTRO_MODELOS):
+    '''(mtime, tamanho) de cada ponteiro: muda quando algum é regravado ou removido.'''
+    assinatura = []
+    for papel in PAPEIS:
+        try:
+            info = os.stat(caminho_ponteiro(papel, pasta))
+            assinatura.append((info.st_mtime_ns, info.st_size))
+        except FileNotFoundError:
+            assinatura.append(None)
+    return tuple(assinatura)
+
+
+# --- Modelo carregado em memória ---
+
+class ModeloServido:
+    '''
+    Uma versão pronta para servir: modelo, pontuador NumPy, tabela e metadados.
+
+    Instâncias não mudam depois de criadas; a troca de versão na API é a
+    troca da referência para outra instância.
+    '''
+
+    def __init__(self, versao, model, scaler=None, metadados=None, com_tabela=True):
+        self.versao = versao
+        self.model = model
+        self.scaler = scaler
+        self.metadados = metadados or {}
+
+        features = self.metadados.get("features")
+        if isinstance(features, list) and features != MODEL_FEATURES:
+            raise ValueError(f"Versão {versao} usa {len(features)} features; "
+                             f"a API monta as {len(MODEL_FEATURES)} MODEL_FEATURES")
+        n_features = getattr(model, "n_features_in_", len(MODEL_FEATURES))
+        if n_features != len(MODEL_FEATURES):
+            raise ValueError(f"Versão {versao} espera {n_features} features; "
+                             f"a API monta {len(MODEL_FEATURES)}")
+
+        # Pontuador NumPy (coef_/intercept_ extraídos do modelo, verificado contra o sklearn)
+        try:
+            self.pontuador = PontuadorLogistico.compilar(model, scaler)
+            desvio = self.pontuador.verificar(model, scaler)
+            print(f"   ✓ [{versao}] Pontuador NumPy verificado (desvio máx. vs sklearn: {desvio:.1e})")
+        except Exception as e:
+            print(f"AVISO: [{versao}] pontuador NumPy indisponível, usando predict_proba do sklearn: {e}")
+            self.pontuador = None
+
+        # Tabela de predições (todas as combinações de sintomas, zero chamadas ao modelo por request)
+        self.tabela = None
+        if com_tabela:
+            try:
+                self.tabela = TabelaPredicao(GRADE_SINTOMAS, self.prever_probabilidades)
+                print(f"   ✓ [{versao}] Tabela de predições: {len(self.tabela.probabilidades)} combinações")
+            except Exception as e:
+                print(f"AVISO: [{versao}] tabela de predições indisponível: {e}")
+
+    def prever_probabilidades(self, X):
+        '''Probabilidade de hospitalização (classe 1) para cada linha de X.'''
+        if self.pontuador is not None:
+            return self.pontuador.probabilidades(X)
+        if self.scaler is not None:
+            X = self.scaler.transform(X)
+        return self.model.predict_proba(X)[:, 1]
+
+    def prever_probabilidade(self, x):
+        '''Probabilidade de hospitalização para um único paciente (vetor de 14 features).'''
+        if self.pontuador is not None:
+            return self.pontuador.probabilidade(x)
+        return float(self.prever_probabilidades(x.reshape(1, -1))[0])
+
+    def prever_registro(self, registro):
+        '''Probabilidade para um registro do /api/predict: tabela se coberto, senão o vetor de 14 features.'''
+        if self.tabela is not None:
+            probabilidade = self.tabela.consultar(registro)
+            if probabilidade is not None:
+                return probabilidade
+        return self.prever_probabilidade(montar_vetor(registro))
+
+    def resumo(self):
+        '''Versão, tipo e métricas, para o /api/modelos.'''
+        return {
+            "versao": self.versao,
+            "modelo": self.metadados.get("modelo", type(self.model).__name__),
+            "data_treinamento": self.metadados.get("data_treinamento"),
+            "metricas": self.metadados.get("metricas", {}),
+            "aplicar_scaler": self.scaler is not None,
+            "pontuador_numpy": self.pontuador is not None,
+            "tabela": self.tabela.versao if self.tabela is not None else None,
+        }
+
+
+def carregar_versao(versao, pasta=REGISTRO_MODELOS, com_tabela=True):
+    '''Carrega uma versão do registro (levanta exceção se não puder ser servida).'''
+    destino = caminho_versao(versao, pasta)
+    if not os.path.isdir(destino):
+        raise FileNotFoundError(f"Versão não encontrada no registro: {versao}")
+    metadados = ler_metadados(versao, pasta)
+    model = joblib.load(os.path.join(destino, ARQUIVO_MODELO))
+    scaler = None
+    if metadados.get("aplicar_scaler"):
+        scaler = joblib.load(os.path.join(destino, ARQUIVO_SCALER))
+    return ModeloServido(versao, model, scaler, metadados, com_tabela)
+
+
+def carregar_legado(model_path, scaler_path=None, config_path=None, com_tabela=True):
+    '''Modelo fora do registro (models/modelo_reglog_otimizado.pkl), servido como versão "legado".'''
+    model = joblib.load(model_path)
+    scaler = joblib.load(scaler_path) if scaler_path else None
+    metadados = {}
+    if config_path and os.path.exists(config_path):
+        with open(config_path, encoding="utf-8") as f:
+            metadados = json.load(f)
+    return ModeloServido("legado", model, scaler, metadados, com_tabela)
+
+
+# --- Comparação ativo x sombra ---
+
+class ComparacaoSombra:
+    '''
+    Acumula a comparação entre o modelo ativo e o sombra (por processo).
+
+    Para cada predição guarda a diferença absoluta de probabilidade, se a
+    classe (limiar 0.5) concorda e o tempo de cada modelo. Cada worker do
+    gunicorn tem a sua própria comparação.
+    '''
+
+    def __init__(self, ativo=None, sombra=None):
+        self.ativo = ativo
+        self.sombra = sombra
+        self._lock = threading.Lock()
+        self.predicoes = 0
+        self.soma_diferenca = 0.0
+        self.max_diferenca = 0.0
+        self.concordancia = 0
+        self.tempo_ativo = 0.0
+        self.tempo_sombra = 0.0
+        self.chamadas = 0
+
+    def registrar(self, p_ativo, p_sombra, tempo_ativo, tempo_sombra):
+        '''Registra uma chamada (1 paciente ou lote) com os tempos em segundos.'''
+        p_ativo = np.atleast_1d(np.asarray(p_ativo, dtype=float))
+        p_sombra = np.atleast_1d(np.asarray(p_sombra, dtype=float))
+        diferenca = np.abs(p_ativo - p_sombra)
+        with self._lock:
+            self.chamadas += 1
+            self.predicoes += len(diferenca)
+            self.soma_diferenca += float(diferenca.sum())
+            if len(diferenca):
+                self.max_diferenca = max(self.max_diferenca, float(diferenca.max()))
+            self.concordancia += int(((p_ativo >= 0.5) == (p_sombra >= 0.5)).sum())
+            self.tempo_ativo += tempo_ativo
+            self.tempo_sombra += tempo_sombra
+
+    def como_json(self):
+        with self._lock:
+            n, chamadas = self.predicoes, self.chamadas
+            return {
+                "ativo": self.ativo,
+                "sombra": self.sombra,
+                "pid": os.getpid(),
+                "chamadas": chamadas,
+                "predicoes": n,
+                "diferenca_media": self.soma_diferenca / n if n else None,
+                "diferenca_max": self.max_diferenca if n else None,
+                "concordancia_classe": self.concordancia / n if n else None,
+                "latencia_media_ms_ativo": 1000 * self.tempo_ativo / chamadas if chamadas else None,
+                "latencia_media_ms_sombra": 1000 * self.tempo_sombra / chamadas if chamadas else None,
+            }
+
+
+def cronometrar(funcao, *args):
+    '''(resultado, segundos) de funcao(*args).'''
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    return resultado, time.perf_counter() - inicio
+
+
+if __name__ == "__main__":
+    comando = sys.argv[1] if len(sys.argv) > 1 else "listar"
+
+    if comando == "listar":
+        ativo, sombra = ler_ponteiro("ativo"), ler_ponteiro("sombra")
+        versoes = listar_versoes()
+        if not versoes:
+            print(f"Nenhuma versão em {REGISTRO_MODELOS}")
+        for versao in versoes:
+            metadados = ler_metadados(versao)
+            papel = "ativo" if versao == ativo else "sombra" if versao == sombra else ""
+            auc = metadados.get("metricas", {}).get("auc")
+            print(f"{versao:<20} {papel:<7} {metadados.get('modelo', '?'):<35} "
+                  f"AUC={auc if auc is None else round(auc, 4)}  "
+                  f"treino={metadados.get('data_treinamento')}")
+    elif comando == "registrar":
+        modelo = joblib.load(sys.argv[2])
+        scaler = joblib.load(sys.argv[3]) if len(sys.argv) > 3 else None
+        metadados = {}
+        if len(sys.argv) > 4:
+            with open(sys.argv[4], encoding="utf-8") as f:
+                metadados = json.load(f)
+        versao = registrar(modelo, metadados, scaler)
+        print(f"✓ Versão registrada: {versao}")
+        print(f"  Para servir: python registro_modelos.py promover {versao}")
+    elif comando in ("promover", "sombra"):
+        versao = sys.argv[2] if len(sys.argv) > 2 else None
+        if versao in (None, "nenhuma"):
+            if comando == "promover":
+                sys.exit("Informe a versão a promover")
+            apontar("sombra", None)
+            print("✓ Modelo sombra removido")
+        else:
+            apontar("ativo" if comando == "promover" else "sombra", versao)
+            print(f"✓ {'Ativo' if comando == 'promover' else 'Sombra'}: {versao} "
+                  f"(os workers trocam em até INTERVALO_VERIFICACAO_MODELOS segundos)")
+    else:
+        sys.exit(f"Comando desconhecido: {comando}")
@@ -0,0 +1,236 @@
+'''
+Índice de somas acumuladas sobre as datas de notificação (séries diárias,
+por semana epidemiológica e por mês).
+
+Na carga do dataset, as notificações viram um vetor de contagens por dia
+(do primeiro ao último DT_NOTIFIC) e a sua soma acumulada, com um zero na
+frente. O total de qualquer intervalo [a, b] é então
+
+    acumulado[b + 1] - acumulado[a]
+
+ou seja, O(1) por intervalo, sem varrer o DataFrame. Uma série com m
+períodos (dias, semanas ou meses) é uma diferença entre m + 1 posições do
+acumulado; médias móveis e a comparação com o ano anterior são outras
+diferenças do mesmo vetor.
+
+Semana epidemiológica (SE) como no SINAN: semanas de domingo a sábado; a
+SE 1 de um ano é a primeira semana com pelo menos 4 dias nesse ano (a que
+contém a primeira quarta-feira de janeiro), então um ano tem 52 ou 53
+semanas e a SE 1 pode começar no fim de dezembro.
+'''
+
+import numpy as np
+import pandas as pd
+
+from dados import DATA_AUSENTE, dias_para_datas
+
+GRANULARIDADES = ("dia", "semana", "mes")
+
+# Métricas acumuladas (chave do payload -> coluna usada na construção)
+SERIES = ("casos", "hospitalizados")
+
+# Limite de períodos por consulta (inclusive os da média móvel): 100 anos de dias
+MAX_PERIODOS = 36_525
+_DIAS_POR_PERIODO = {"dia": 1, "semana": 7, "mes": 28}
+
+# 1970-01-01 (dia 0) foi uma quinta-feira: (dia + 4) % 7 == 0 nos domingos
+_DESLOCAMENTO_DOMINGO = 4
+
+
+def inicio_semana(dias):
+    '''Domingo que abre a semana de cada dia (dias desde 1970-01-01).'''
+    dias = np.asarray(dias, dtype=np.int64)
+    return dias - (dias + _DESLOCAMENTO_DOMINGO) % 7
+
+
+def semana_epidemiologica(dias):
+    '''(ano epidemiológico, SE) de cada dia: o ano e a semana da quarta-feira da semana.'''
+    quarta = dias_para_datas(inicio_semana(dias) + 3)
+    return quarta.year.to_numpy(), (quarta.dayofyear.to_numpy() - 1) // 7 + 1
+
+
+def inicio_se1(anos):
+    '''Domingo que abre a SE 1 de cada ano.'''
+    anos = np.asarray(anos, dtype=np.int64)
+    primeiro_janeiro = (anos - 1970).astype("datetime64[Y]").astype("datetime64[D]").astype(np.int64)
+    # Primeira quarta-feira de janeiro, menos 3 dias
+    quarta = primeiro_janeiro + (3 - (primeiro_janeiro + _DESLOCAMENTO_DOMINGO)) % 7
+    return quarta - 3
+
+
+def _dia(data):
+    return int(np.datetime64(pd.Timestamp(data).date(), "D").astype(np.int64))
+
+
+def _texto(dias):
+    return [str(d) for d in np.asarray(dias, dtype=np.int64).astype("datetime64[D]")]
+
+
+class SerieTemporal:
+    '''
+    Contagens diárias de casos e hospitalizações com as somas acumuladas.
+
+    As instâncias não mudam depois de criadas (arrays somente leitura);
+    acrescentar() devolve um novo índice, como o CuboAgregado.
+    '''
+
+    def __init__(self, dias, hospitalizado):
+        '''`dias`: DT_NOTIFIC em dias (dados.datas_para_dias); `hospitalizado`: bool por linha.'''
+        dias = np.asarray(dias, dtype=np.int64)
+        validos = dias != DATA_AUSENTE
+        dias = dias[validos]
+        hospitalizado = np.asarray(hospitalizado, dtype=bool)[validos]
+        if len(dias):
+            self.primeiro, self.ultimo = int(dias.min()), int(dias.max())
+        else:
+            self.primeiro = self.ultimo = 0
+        n = self.ultimo - self.primeiro + 1
+        posicoes = dias - self.primeiro
+        self._montar({
+            "casos": np.bincount(posicoes, minlength=n),
+            "hospitalizados": np.bincount(posicoes[hospitalizado], minlength=n),
+        })
+
+    def _montar(self, diarios):
+        self.diarios = diarios
+        self.acumulados = {nome: np.concatenate([[0], np.cumsum(contagens)])
+                           for nome, contagens in diarios.items()}
+        for array in (*self.diarios.values(), *self.acumulados.values()):
+            array.flags.writeable = False
+
+    def acrescentar(self, dias, hospitalizado):
+        '''Novo índice com as notificações acrescentadas (ingestão incremental).'''
+        novo = SerieTemporal(dias, hospitalizado)
+        if novo.acumulados["casos"][-1] == 0:
+            return self
+        primeiro, ultimo = min(self.primeiro, novo.primeiro), max(self.ultimo, novo.ultimo)
+        diarios = {}
+        for nome in SERIES:
+            contagens = np.zeros(ultimo - primeiro + 1, dtype=np.int64)
+            for parte in (self, novo):
+                inicio = parte.primeiro - primeiro
+                contagens[inicio:inicio + len(parte.diarios[nome])] += parte.diarios[nome]
+            diarios[nome] = contagens
+        resultado = object.__new__(SerieTemporal)
+        resultado.primeiro, resultado.ultimo = primeiro, ultimo
+        resultado._montar(diarios)
+        return resultado
+
+    # --- Consultas ---
+
+    def antes_de(self, dias, serie="casos"):
+        '''Notificações com data anterior a cada dia (vetorizado, O(1) por dia).'''
+        posicoes = np.clip(np.asarray(dias, dtype=np.int64) - self.primeiro, 0, self.ultimo - self.primeiro + 1)
+        return self.acumulados[serie][posicoes]
+
+    def contar(self, inicio, fim, serie="casos"):
+        '''Total de notificações em [inicio, fim] (dias, inclusive), em O(1).'''
+        return int(self.antes_de(fim + 1, serie) - self.antes_de(inicio, serie))
+
+    def _periodos(self, inicio, fim, granularidade, anteriores=0):
+        '''
+        Limites dos períodos que cobrem [inicio, fim], mais `anteriores`
+        períodos antes do primeiro (para as médias móveis). Retorna os
+        inícios de m + anteriores + 1 períodos (o último é o fim exclusivo).
+        '''
+        if granularidade == "dia":
+            return np.arange(inicio - anteriores, fim + 2, dtype=np.int64)
+        if granularidade == "semana":
+            primeira = inicio_semana(inicio) - 7 * anteriores
+            return np.arange(primeira, inicio_semana(fim) + 8, 7, dtype=np.int64)
+        meses = np.arange(np.datetime64(int(inicio), "D").astype("datetime64[M]") - anteriores,
+                          np.datetime64(int(fim), "D").astype("datetime64[M]") + 2)
+        return meses.astype("datetime64[D]").astype(np.int64)
+
+    def _contagens(self, limites):
+        return {nome: np.diff(self.antes_de(limites, nome)) for nome in SERIES}
+
+    def _ano_anterior(self, limites, granularidade):
+        '''
+        Limites dos mesmos períodos um ano antes: mesma data (dia), mesma
+        SE do ano epidemiológico anterior (semana) ou mesmo mês (mês). A SE
+        53 não tem par num ano de 52 semanas (NaN).
+        '''
+        inicios = limites[:-1]
+        if granularidade == "dia":
+            anteriores = (dias_para_datas(inicios) - pd.DateOffset(years=1))
+            anteriores = anteriores.to_numpy(dtype="datetime64[D]").astype(np.int64)
+            return anteriores, anteriores + 1, np.ones(len(inicios), dtype=bool)
+        if granularidade == "semana":
+            anos, semanas = semana_epidemiologica(inicios)
+            anteriores = inicio_se1(anos - 1) + 7 * (semanas - 1)
+            return anteriores, anteriores + 7, anteriores < inicio_se1(anos)
+        meses = inicios.astype("datetime64[D]").astype("datetime64[M]")
+        return ((meses - 12).astype("datetime64[D]").astype(np.int64),
+                (meses - 11).astype("datetime64[D]").astype(np.int64),
+                np.ones(len(inicios), dtype=bool))
+
+    def consultar(self, inicio=None, fim=None, granularidade="semana", media_movel=None,
+                  comparar_ano_anterior=False):
+        '''
+        Série de casos e hospitalizações por dia, SE ou mês entre `inicio` e
+        `fim` (datas ou dias; padrão: todo o período).
+
+        Semanas e meses são sempre completos (a primeira e a última semana
+        podem começar antes ou terminar depois do intervalo pedido).
+        `media_movel` = k calcula a média dos k períodos até cada um
+        (inclusive); `comparar_ano_anterior` acrescenta os mesmos períodos
+        do ano anterior e a variação percentual.
+        '''
+        if granularidade not in GRANULARIDADES:
+            raise ValueError(f"granularidade deve ser uma de: {', '.join(GRANULARIDADES)}")
+        inicio = self.primeiro if inicio is None else (inicio if isinstance(inicio, (int, np.integer)) else _dia(inicio))
+        fim = self.ultimo if fim is None else (fim if isinstance(fim, (int, np.integer)) else _dia(fim))
+        if fim < inicio:
+            raise ValueError("fim anterior ao início")
+        janela = int(media_movel or 0)
+        if janela < 0:
+            raise ValueError("media_movel deve ser positiva")
+
+        if (fim - inicio) // _DIAS_POR_PERIODO[granularidade] + janela > MAX_PERIODOS:
+            raise ValueError(f"consulta com mais de {MAX_PERIODOS:,} períodos")
+
+        limites = self._periodos(inicio, fim, granularidade, anteriores=max(janela - 1, 0))
+        contagens = self._contagens(limites)
+        if janela > 1:
+            # Só os períodos pedidos; os (janela - 1) anteriores servem à média móvel
+            limites = limites[janela - 1:]
+        inicios = limites[:-1]
+
+        resultado = {
+            "granularidade": granularidade,
+            "inicio": _texto([inicio])[0],
+            "fim": _texto([fim])[0],
+            "datas": _texto(inicios),
+        }
+        if granularidade == "semana":
+            anos, semanas = semana_epidemiologica(inicios)
+            resultado["periodos"] = [f"{ano}-SE{semana:02d}" for ano, semana in zip(anos, semanas)]
+        elif granularidade == "mes":
+            resultado["periodos"] = [data[:7] for data in resultado["datas"]]
+        else:
+            resultado["periodos"] = list(resultado["datas"])
+
+        for nome in SERIES:
+            resultado[nome] = contagens[nome][-len(inicios):].tolist()
+
+        if janela:
+            resultado["media_movel"] = {"janela": janela}
+            for nome in SERIES:
+                acumulado = np.concatenate([[0], np.cumsum(contagens[nome])])
+                medias = (acumulado[janela:] - acumulado[:-janela]) / janela
+                resultado["media_movel"][nome] = np.round(medias, 3).tolist()
+
+        if comparar_ano_anterior:
+            de, ate, existe = self._ano_anterior(limites, granularidade)
+            resultado["ano_anterior"] = {"datas": _texto(de)}
+            for nome in SERIES:
+                anteriores = (self.antes_de(ate, nome) - self.antes_de(de, nome)).astype(float)
+                anteriores[~existe] = np.nan
+                atuais = np.asarray(resultado[nome], dtype=float)
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    variacao = np.where(anteriores > 0, (atuais - anteriores) / anteriores * 100, np.nan)
+                resultado["ano_anterior"][nome] = [None if np.isnan(v) else int(v) for v in anteriores]
+                resultado["ano_anterior"][f"variacao_pct_{nome}"] = [
+                    None if np.isnan(v) else round(float(v), 2) for v in variacao]
+        return resultado
@@ -0,0 +1,359 @@
+'''
+Serviço de predição assíncrono (ASGI) com micro-lotes, ao lado do app Flask.
+
+No gunicorn síncrono cada /api/predict ocupa um worker inteiro, então a
+concorrência é limitada ao número de workers. Aqui um único event loop
+aceita muitas conexões: os pedidos que chegam dentro de uma janela de
+MICROLOTE_JANELA_MS milissegundos (ou até juntar MICROLOTE_MAXIMO
+pedidos) viram uma matriz N×14 pontuada com uma só chamada vetorizada
+(prever_probabilidades: PontuadorLogistico ou predict_proba).
+
+- POST /api/predict      mesma entrada e saída do app Flask, via micro-lote
+- GET  /api/microlote    configuração e tamanhos dos lotes deste processo
+- demais rotas           encaminhadas ao app Flask (WSGI) numa thread; a
+                         resposta segue ao cliente parte a parte
+
+A janela é o compromisso entre vazão e latência: cada pedido espera até
+uma janela a mais, em troca de dividir o custo da chamada ao modelo com o
+lote. Com janela 0 entram no lote só os pedidos já lidos na mesma volta
+do event loop. O benchmark_microlote.py mede vazão e p50/p99 para cada
+combinação de janela e tamanho máximo.
+
+Os modelos são os mesmos do app Flask (snapshot estado_modelos, registro
+com troca a quente e modelo sombra); a verificação dos ponteiros roda numa
+thread, para que a carga de uma versão nova não pare o event loop.
+
+Uso:
+    uvicorn servico_async:app --host 0.0.0.0 --port 8000
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker servico_async:app
+
+Variáveis de ambiente:
+    MICROLOTE_JANELA_MS   espera máxima para formar um lote (padrão 2)
+    MICROLOTE_MAXIMO      pedidos por lote; um lote cheio é pontuado na hora (padrão 64)
+'''
+
+import asyncio
+import io
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+import app as app_flask
+from features_modelo import montar_vetor
+from metricas import ETAPAS, METRICAS_ATIVAS, MICROLOTES, REQUISICOES, iniciar_publicador
+from registro_modelos import cronometrar
+
+MICROLOTE_JANELA_MS = float(os.getenv("MICROLOTE_JANELA_MS", "2"))
+MICROLOTE_MAXIMO = int(os.getenv("MICROLOTE_MAXIMO", "64"))
+
+ROTA_PREDICAO = "/api/predict"
+
+
+class MicroLote:
+    '''
+    Junta vetores de features de pedidos concorrentes e os pontua de uma vez.
+
+    `prever_lote(X)` recebe a matriz N×14 e retorna as N probabilidades. É
+    chamada no próprio event loop: para a regressão logística, pontuar 64
+    linhas custa dezenas de microssegundos, menos que passar o lote a uma
+    thread.
+    '''
+
+    def __init__(self, prever_lote, janela_ms=MICROLOTE_JANELA_MS, maximo=MICROLOTE_MAXIMO):
+        if maximo < 1:
+            raise ValueError("MICROLOTE_MAXIMO deve ser >= 1")
+        self.prever_lote = prever_lote
+        self.janela = max(janela_ms, 0) / 1000
+        self.maximo = maximo
+        self._pendentes = []      # (vetor, future, instante de chegada)
+        self._disparo = None      # TimerHandle do lote em formação
+        self.lotes = 0
+        self.predicoes = 0
+        self.maior_lote = 0
+
+    async def prever(self, vetor):
+        '''Probabilidade de um vetor de 14 features, pontuado no próximo lote.'''
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pendentes.append((vetor, future, time.perf_counter()))
+        if len(self._pendentes) >= self.maximo:
+            self._pontuar()
+        elif self._disparo is None:
+            if self.janela > 0:
+                self._disparo = loop.call_later(self.janela, self._pontuar)
+            else:
+                self._disparo = loop.call_soon(self._pontuar)
+        return await future
+
+    def _pontuar(self):
+        if self._disparo is not None:
+            self._disparo.cancel()
+            self._disparo = None
+        lote, self._pendentes = self._pendentes, []
+        if not lote:
+            return
+
+        inicio = time.perf_counter()
+        try:
+            probabilidades = self.prever_lote(np.vstack([vetor for vetor, _, _ in lote]))
+        except Exception as e:
+            for _, future, _ in lote:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.lotes += 1
+        self.predicoes += len(lote)
+        self.maior_lote = max(self.maior_lote, len(lote))
+        if METRICAS_ATIVAS:
+            MICROLOTES.observar(len(lote))
+            ETAPAS.observar(time.perf_counter() - inicio, ROTA_PREDICAO, "predicao")
+            for _, _, chegada in lote:
+                ETAPAS.observar(inicio - chegada, ROTA_PREDICAO, "fila")
+        for (_, future, _), probabilidade in zip(lote, probabilidades):
+            # O cliente pode ter desconectado (future cancelado) durante a espera
+            if not future.done():
+                future.set_result(float(probabilidade))
+
+    def como_json(self):
+        return {
+            "pid": os.getpid(),
+            "janela_ms": self.janela * 1000,
+            "maximo": self.maximo,
+            "lotes": self.lotes,
+            "predicoes": self.predicoes,
+            "tamanho_medio": self.predicoes / self.lotes if self.lotes else None,
+            "maior_lote": self.maior_lote,
+        }
+
+
+def pontuar_lote(X):
+    '''Pontua o lote no modelo ativo e, se houver, compara com o modelo sombra.'''
+    estado = app_flask.estado_modelos
+    if estado.ativo is None:
+        raise RuntimeError("Modelo não carregado")
+    probabilidades, tempo = cronometrar(estado.ativo.prever_probabilidades, X)
+    if estado.sombra is not None:
+        try:
+            p_sombra, tempo_sombra = cronometrar(estado.sombra.prever_probabilidades, X)
+            estado.comparacao.registrar(probabilidades, p_sombra, tempo, tempo_sombra)
+        except Exception as e:
+            print(f"AVISO: modelo sombra {estado.sombra.versao} falhou: {e}")
+    return probabilidades
+
+
+microlote = MicroLote(pontuar_lote)
+
+
+# --- Troca a quente dos modelos sem bloquear o event loop ---
+
+_verificador_pid = None
+_verificador = None       # referência à tarefa (o event loop só guarda uma referência fraca)
+
+
+async def _verificar_modelos_periodicamente():
+    while True:
+        await asyncio.sleep(app_flask.INTERVALO_VERIFICACAO_MODELOS)
+        try:
+            await asyncio.to_thread(app_flask.verificar_atualizacao_modelos)
+        except Exception as e:
+            print(f"AVISO: verificação do registro de modelos falhou: {e}")
+
+
+def iniciar_verificador():
+    '''Uma tarefa por processo (depois do fork do gunicorn o pid muda).'''
+    global _verificador_pid, _verificador
+    if _verificador_pid != os.getpid():
+        _verificador_pid = os.getpid()
+        _verificador = asyncio.get_running_loop().create_task(_verificar_modelos_periodicamente())
+
+
+# --- ASGI ---
+
+async def ler_corpo(receive):
+    partes = []
+    while True:
+        mensagem = await receive()
+        if mensagem["type"] == "http.disconnect":
+            raise ConnectionError("Cliente desconectou")
+        partes.append(mensagem.get("body", b""))
+        if not mensagem.get("more_body"):
+            return b"".join(partes)
+
+
+async def responder_json(send, status, conteudo):
+    corpo = json.dumps(conteudo, ensure_ascii=False).encode()
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json"),
+                            (b"content-length", str(len(corpo)).encode())]})
+    await send({"type": "http.response.body", "body": corpo})
+
+
+async def prever(receive):
+    '''POST /api/predict: mesmo contrato do app Flask, pontuado em micro-lote.'''
+    try:
+        registro = json.loads(await ler_corpo(receive) or b"null")
+    except ValueError:
+        return 400, {"error": "JSON inválido"}
+    if not isinstance(registro, dict):
+        return 400, {"error": "Envie um objeto JSON com os sintomas"}
+    if app_flask.estado_modelos.ativo is None:
+        return 500, {"error": "Modelo não carregado"}
+
+    try:
+        probabilidade = await microlote.prever(montar_vetor(registro))
+    except Exception as e:
+        return 500, {"error": f"Erro na predição: {str(e)}"}
+    return 200, {"probabilidade_hospitalizacao": round(probabilidade * 100, 2)}
+
+
+async def _lifespan(receive, send):
+    while True:
+        mensagem = await receive()
+        if mensagem["type"] == "lifespan.startup":
+            iniciar_verificador()
+            await send({"type": "lifespan.startup.complete"})
+        elif mensagem["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    '''Aplicação ASGI: /api/predict e /api/microlote aqui, o resto no Flask.'''
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+
+    iniciar_verificador()
+    caminho, metodo = scope["path"], scope["method"]
+    if caminho == ROTA_PREDICAO and metodo == "POST":
+        inicio = time.perf_counter()
+        try:
+            status, conteudo = await prever(receive)
+        except ConnectionError:
+            return
+        await responder_json(send, status, conteudo)
+        if METRICAS_ATIVAS:
+            REQUISICOES.observar(time.perf_counter() - inicio, ROTA_PREDICAO, metodo, str(status))
+            iniciar_publicador()
+    elif caminho == "/api/microlote" and metodo == "GET":
+        await responder_json(send, 200, microlote.como_json())
+    else:
+        await encaminhar_flask(scope, receive, send)
+
+
+# --- Ponte para o app Flask (WSGI) ---
+
+def montar_environ(scope, corpo):
+    '''Environ WSGI (PEP 3333) a partir do scope ASGI e do corpo já lido.'''
+    servidor = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": servidor[0],
+        "SERVER_PORT": str(servidor[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": (scope.get("client") or ("", 0))[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(corpo),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for nome, valor in scope.get("headers", []):
+        nome, valor = nome.decode("latin-1").upper().replace("-", "_"), valor.decode("latin-1")
+        if nome in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            environ[nome] = valor
+        else:
+            chave = f"HTTP_{nome}"
+            environ[chave] = f"{environ[chave]},{valor}" if chave in environ else valor
+    # O corpo já foi lido inteiro (inclusive se veio em chunked)
+    environ.pop("HTTP_TRANSFER_ENCODING", None)
+    environ["CONTENT_LENGTH"] = str(len(corpo))
+    return environ
+
+
+# Partes da resposta do Flask em trânsito entre a thread e o event loop; com
+# a fila cheia a thread espera o cliente consumir (exportações e lotes
+# grandes não acumulam em memória)
+MAX_PARTES_EM_TRANSITO = 8
+
+_FIM = object()
+
+
+def executar_wsgi(aplicacao, environ, entregar, cancelado):
+    '''
+    Roda o app WSGI e entrega a resposta em partes, na ordem:
+    ("inicio", status, cabeçalhos), ("parte", bytes)... e por fim _FIM.
+
+    `entregar` pode bloquear (contrapressão). Com `cancelado` ligado (o
+    cliente desconectou) a iteração para e o iterável é fechado.
+    '''
+    def start_response(status, cabecalhos, exc_info=None):
+        entregar(("inicio", int(status.split(" ", 1)[0]),
+                  [(nome.lower().encode("latin-1"), valor.encode("latin-1"))
+                   for nome, valor in cabecalhos]))
+        return lambda dados: entregar(("parte", dados))
+
+    try:
+        iteravel = aplicacao(environ, start_response)
+        try:
+            for parte in iteravel:
+                if cancelado.is_set():
+                    break
+                if parte:
+                    entregar(("parte", parte))
+        finally:
+            if hasattr(iteravel, "close"):
+                iteravel.close()
+    finally:
+        entregar(_FIM)
+
+
+async def encaminhar_flask(scope, receive, send):
+    '''
+    Executa a rota no app Flask numa thread, sem ocupar o event loop, e
+    repassa cada parte da resposta ao cliente assim que é gerada.
+    '''
+    try:
+        corpo = await ler_corpo(receive)
+    except ConnectionError:
+        return
+    loop = asyncio.get_running_loop()
+    fila = asyncio.Queue(MAX_PARTES_EM_TRANSITO)
+    cancelado = threading.Event()
+
+    def entregar(evento):
+        if not cancelado.is_set():
+            asyncio.run_coroutine_threadsafe(fila.put(evento), loop).result()
+
+    tarefa = asyncio.ensure_future(asyncio.to_thread(
+        executar_wsgi, app_flask.app, montar_environ(scope, corpo), entregar, cancelado))
+    iniciada = False
+    try:
+        while (evento := await fila.get()) is not _FIM:
+            if evento[0] == "inicio":
+                await send({"type": "http.response.start", "status": evento[1], "headers": evento[2]})
+                iniciada = True
+            else:
+                await send({"type": "http.response.body", "body": evento[1], "more_body": True})
+        if iniciada:
+            await send({"type": "http.response.body", "body": b""})
+        # Erros do app (inclusive antes do início da resposta) sobem para o servidor
+        await tarefa
+    finally:
+        cancelado.set()
+        # Esvazia a fila até a thread terminar, caso esteja esperando espaço nela
+        while not tarefa.done():
+            while not fila.empty():
+                fila.get_nowait()
+            await asyncio.wait({tarefa}, timeout=0.05)
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Gerador de notificações sintéticas de dengue no formato do SINAN tratado.
+
+Produz as mesmas colunas e categorias do data/df_dengue_tratado.csv
+(DT_NOTIFIC, DT_SIN_PRI, IDADE, CS_SEXO, CS_RACA, sintomas e comorbidades
+SIM/NÃO/IGNORADO, FENOMENO/INTENS_FENOM, HOSPITALIZ) em qualquer tamanho,
+para testar o dashboard e o treino em escala estadual ou nacional:
+
+- sazonalidade: pico de fevereiro a maio (PESO_MES) e anos epidêmicos
+  sorteados com a semente (peso lognormal por ano)
+- FENOMENO/INTENS_FENOM fixos por ano, como um ciclo ENSO
+- sintomas e comorbidades com as frequências da base de Sertãozinho
+- HOSPITALIZ: ~20% IGNORADO e, entre os demais, probabilidade logística
+  por petéquias, vômito, comorbidades, idade e atraso da notificação, com
+  intercepto calibrado para a prevalência pedida (padrão 1,5% do total)
+- uma pequena fração de idades ausentes/inválidas e atrasos longos, para
+  exercitar a limpeza do treino
+
+Os registros são gerados em lotes de SINAN_LOTE linhas e gravados à
+medida que saem, então a memória não cresce com o tamanho da base:
+- saída .csv (ou .csv.gz): CSV no formato do df_dengue_tratado.csv
+- saída .cache: o pacote colunar do dados.py (um .npy por coluna, gravado
+  por memmap). O app lê o pacote direto, sem CSV:
+      python sinan_sintetico.py 10M bench_dados/sinan_10M.cache
+      CSV_DADOS=bench_dados/sinan_10M.csv gunicorn -c gunicorn.conf.py app:app
+
+Uso:
+    python sinan_sintetico.py <n_linhas> <saida.csv|saida.csv.gz|saida.cache>
+
+Variáveis de ambiente:
+    SINAN_SEED          semente (padrão 42); a mesma semente gera a mesma base
+    SINAN_LOTE          linhas por lote (padrão 500000)
+    SINAN_PREVALENCIA   fração de HOSPITALIZ=SIM no total (padrão 0.015)
+    SINAN_ANO_INICIAL   primeiro ano (padrão 2000)
+    SINAN_ANO_FINAL     último ano (padrão 2025)
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from dados import VERSAO_FORMATO, _dtype_codigos
+
+SINAN_SEED = int(os.getenv("SINAN_SEED", "42"))
+SINAN_LOTE = int(os.getenv("SINAN_LOTE", "500000"))
+SINAN_PREVALENCIA = float(os.getenv("SINAN_PREVALENCIA", "0.015"))
+SINAN_ANO_INICIAL = int(os.getenv("SINAN_ANO_INICIAL", "2000"))
+SINAN_ANO_FINAL = int(os.getenv("SINAN_ANO_FINAL", "2025"))
+
+# Muda quando as regras de geração mudam (entra na versão da base)
+VERSAO_GERADOR = 1
+
+# Ordem das colunas do df_dengue_tratado.csv
+COLUNAS = [
+    "DT_NOTIFIC", "DT_SIN_PRI", "IDADE", "CS_SEXO", "CS_RACA",
+    "FEBRE", "MIALGIA", "CEFALEIA", "EXANTEMA", "VOMITO", "PETEQUIA_N",
+    "DIABETES", "HEMATOLOG", "HEPATOPAT", "RENAL",
+    "FENOMENO", "INTENS_FENOM", "HOSPITALIZ",
+]
+
+# Categorias de cada coluna, em ordem alfabética (como o pd.factorize(sort=True) do dados.py)
+SIM_NAO = ["IGNORADO", "NÃO", "SIM"]
+IGNORADO, NAO, SIM = range(3)
+CATEGORIAS = {
+    "CS_SEXO": ["F", "I", "M"],
+    "CS_RACA": ["AMARELA", "BRANCA", "IGNORADO", "INDÍGENA", "PARDA", "PRETA"],
+    "FENOMENO": ["El Niño", "La Niña", "Neutro"],
+    "INTENS_FENOM": ["FORTE", "FRACA", "MODERADA", "MUITO FORTE", "NEUTRA"],
+    "HOSPITALIZ": SIM_NAO,
+    **{campo: SIM_NAO for campo in COLUNAS[5:15]},
+}
+
+# Probabilidades na ordem das categorias
+P_SEXO = [0.52, 0.01, 0.47]
+P_RACA = [0.01, 0.38, 0.105, 0.005, 0.42, 0.08]
+
+# (IGNORADO, NÃO, SIM) por campo, como na base de Sertãozinho
+P_CAMPOS = {
+    "FEBRE": (0.15, 0.30, 0.55),
+    "MIALGIA": (0.15, 0.30, 0.55),
+    "CEFALEIA": (0.15, 0.30, 0.55),
+    "EXANTEMA": (0.20, 0.70, 0.10),
+    "VOMITO": (0.20, 0.70, 0.10),
+    "PETEQUIA_N": (0.18, 0.80, 0.02),
+    "DIABETES": (0.17, 0.80, 0.03),
+    "HEMATOLOG": (0.19, 0.80, 0.01),
+    "HEPATOPAT": (0.19, 0.80, 0.01),
+    "RENAL": (0.19, 0.80, 0.01),
+}
+
+# Sazonalidade da dengue no Sudeste: pico de fevereiro a maio
+PESO_MES = np.array([1.6, 2.2, 2.8, 2.6, 1.8, 0.8, 0.4, 0.3, 0.3, 0.4, 0.6, 1.0])
+
+# Idade: faixas (início, fim) e pesos
+FAIXAS_IDADE = [(0, 5), (5, 15), (15, 30), (30, 45), (45, 60), (60, 75), (75, 100)]
+P_FAIXAS_IDADE = [0.05, 0.15, 0.27, 0.23, 0.17, 0.09, 0.04]
+
+# Fração de registros com problemas que a limpeza do treino remove
+FRACAO_IDADE_AUSENTE = 0.0006
+FRACAO_IDADE_INVALIDA = 0.001
+FRACAO_ATRASO_LONGO = 0.002
+
+# HOSPITALIZ=IGNORADO (não entra na prevalência calculada entre os preenchidos)
+FRACAO_HOSPITALIZ_IGNORADO = 0.20
+
+# Contribuições no logito da hospitalização
+RISCO_SIM = {"PETEQUIA_N": 1.6, "VOMITO": 0.9, "HEMATOLOG": 1.0, "HEPATOPAT": 1.0,
+             "RENAL": 1.0, "DIABETES": 0.6}
+RISCO_CRIANCA = 0.5          # idade < 5
+RISCO_IDOSO_POR_ANO = 0.04   # por ano acima de 65
+RISCO_ATRASO_POR_DIA = 0.08  # por dia entre sintomas e notificação
+
+
+def ler_tamanho(texto):
+    '''"33k" -> 33000, "1M" -> 1000000, "250000" -> 250000.'''
+    texto = texto.strip()
+    multiplicador = {"k": 1_000, "K": 1_000, "m": 1_000_000, "M": 1_000_000}.get(texto[-1], 1)
+    return int(float(texto[:-1] if multiplicador > 1 else texto) * multiplicador)
+
+
+class GeradorSinan:
+    '''
+    Gera lotes de notificações sintéticas.
+
+    Tudo o que vale para a base inteira (peso e fenômeno de cada ano,
+    intercepto da hospitalização) é sorteado na construção a partir da
+    semente; cada lote usa o próximo estado do mesmo gerador aleatório.
+    '''
+
+    def __init__(self, seed=SINAN_SEED, prevalencia=SINAN_PREVALENCIA,
+                 ano_inicial=SINAN_ANO_INICIAL, ano_final=SINAN_ANO_FINAL):
+        self.seed = seed
+        self.prevalencia = prevalencia
+        self.anos = np.arange(ano_inicial, ano_final + 1)
+        rng = np.random.default_rng(seed)
+
+        # Anos epidêmicos: peso lognormal por ano
+        peso_ano = rng.lognormal(0.0, 0.6, len(self.anos))
+        self.p_ano = peso_ano / peso_ano.sum()
+        self.p_mes = PESO_MES / PESO_MES.sum()
+
+        # Fenômeno e intensidade fixos por ano (Neutro sempre com intensidade NEUTRA)
+        fenomeno = rng.choice(3, len(self.anos), p=[0.3, 0.3, 0.4])
+        intensidade = rng.choice([0, 1, 2, 3], len(self.anos), p=[0.25, 0.35, 0.3, 0.1])
+        self.fenomeno_ano = fenomeno.astype(np.int8)
+        self.intensidade_ano = np.where(fenomeno == 2, 4, intensidade).astype(np.int8)
+
+        self.intercepto = self._calibrar_intercepto(np.random.default_rng(seed + 1))
+        self.rng = np.random.default_rng(seed + 2)
+
+    def _calibrar_intercepto(self, rng, n_piloto=200_000):
+        '''Intercepto do logito que leva a média de P(SIM) entre os preenchidos à prevalência pedida.'''
+        lote = self._sortear(n_piloto, rng)
+        risco = self._risco(lote)
+        alvo = self.prevalencia / (1 - FRACAO_HOSPITALIZ_IGNORADO)
+        baixo, alto = -20.0, 5.0
+        for _ in range(60):
+            meio = (baixo + alto) / 2
+            if np.mean(1 / (1 + np.exp(-(meio + risco)))) < alvo:
+                baixo = meio
+            else:
+                alto = meio
+        return (baixo + alto) / 2
+
+    def _sortear(self, n, rng):
+        '''Colunas de um lote, exceto HOSPITALIZ (categóricas como códigos).'''
+        lote = {}
+        # Datas: ano e mês com pesos, dia uniforme dentro do mês
+        ano = rng.choice(len(self.anos), n, p=self.p_ano)
+        mes = rng.choice(12, n, p=self.p_mes)
+        inicio_mes = ((self.anos[ano] - 1970) * 12 + mes).astype("datetime64[M]")
+        dias_no_mes = ((inicio_mes + 1).astype("datetime64[D]") - inicio_mes.astype("datetime64[D]")).astype(int)
+        notificacao = (inicio_mes.astype("datetime64[D]").astype(np.int64)
+                       + (rng.random(n) * dias_no_mes).astype(np.int64))
+        atraso = np.minimum(rng.poisson(3.0, n), 30)
+        longo = rng.random(n) < FRACAO_ATRASO_LONGO
+        atraso[longo] = rng.integers(31, 91, longo.sum())
+        lote["DT_NOTIFIC"] = notificacao.astype(np.int32)
+        lote["DT_SIN_PRI"] = (notificacao - atraso).astype(np.int32)
+        lote["_ATRASO"] = atraso
+
+        # Idade por faixa etária, com alguns valores ausentes e inválidos
+        faixa = rng.choice(len(FAIXAS_IDADE), n, p=P_FAIXAS_IDADE)
+        limites = np.array(FAIXAS_IDADE)
+        idade = np.floor(limites[faixa, 0] + rng.random(n) * (limites[faixa, 1] - limites[faixa, 0]))
+        sorteio = rng.random(n)
+        idade[sorteio < FRACAO_IDADE_INVALIDA] = rng.integers(121, 401, (sorteio < FRACAO_IDADE_INVALIDA).sum())
+        idade[sorteio > 1 - FRACAO_IDADE_AUSENTE] = np.nan
+        lote["IDADE"] = idade
+
+        lote["CS_SEXO"] = rng.choice(3, n, p=P_SEXO).astype(np.int8)
+        lote["CS_RACA"] = rng.choice(6, n, p=P_RACA).astype(np.int8)
+        for campo, probabilidades in P_CAMPOS.items():
+            lote[campo] = rng.choice(3, n, p=probabilidades).astype(np.int8)
+        lote["FENOMENO"] = self.fenomeno_ano[ano]
+        lote["INTENS_FENOM"] = self.intensidade_ano[ano]
+        return lote
+
+    @staticmethod
+    def _risco(lote):
+        '''Parte do logito da hospitalização que depende do paciente (sem o intercepto).'''
+        risco = sum(peso * (lote[campo] == SIM) for campo, peso in RISCO_SIM.items())
+        idade = np.nan_to_num(lote["IDADE"], nan=40.0)
+        risco = risco + RISCO_CRIANCA * (idade < 5)
+        risco = risco + RISCO_IDOSO_POR_ANO * np.clip(idade - 65, 0, 35)
+        return risco + RISCO_ATRASO_POR_DIA * np.minimum(lote["_ATRASO"], 30)
+
+    def lote(self, n):
+        '''Próximo lote de `n` notificações: dict coluna -> array, na ordem de COLUNAS.'''
+        lote = self._sortear(n, self.rng)
+        p_sim = 1 / (1 + np.exp(-(self.intercepto + self._risco(lote))))
+        hospitalizado = self.rng.random(n) < p_sim
+        ignorado = self.rng.random(n) < FRACAO_HOSPITALIZ_IGNORADO
+        lote["HOSPITALIZ"] = np.where(ignorado, IGNORADO, np.where(hospitalizado, SIM, NAO)).astype(np.int8)
+        return {coluna: lote[coluna] for coluna in COLUNAS}
+
+
+def lote_para_dataframe(lote):
+    '''Lote em códigos -> DataFrame com os mesmos textos do df_dengue_tratado.csv.'''
+    df = {}
+    for coluna, valores in lote.items():
+        if coluna in CATEGORIAS:
+            df[coluna] = np.array(CATEGORIAS[coluna], dtype=object)[valores]
+        elif coluna.startswith("DT_"):
+            df[coluna] = np.datetime_as_string(valores.astype("datetime64[D]"))
+        else:
+            df[coluna] = valores
+    return pd.DataFrame(df, columns=COLUNAS)
+
+
+def lotes(n_linhas, gerador, tamanho_lote=SINAN_LOTE):
+    for inicio in range(0, n_linhas, tamanho_lote):
+        yield inicio, gerador.lote(min(tamanho_lote, n_linhas - inicio))
+
+
+def gerar_csv(n_linhas, caminho, gerador=None, tamanho_lote=SINAN_LOTE):
+    '''CSV (ou .csv.gz) no formato do df_dengue_tratado.csv, gravado lote a lote.'''
+    gerador = gerador or GeradorSinan()
+    temporario = caminho + ".tmp"
+    abrir = gzip.open if caminho.endswith(".gz") else open
+    with abrir(temporario, "wt", newline="", encoding="utf-8") as f:
+        for inicio, lote in lotes(n_linhas, gerador, tamanho_lote):
+            lote_para_dataframe(lote).to_csv(f, header=(inicio == 0), index=False)
+    os.replace(temporario, caminho)
+    return caminho
+
+
+def versao_base(n_linhas, gerador):
+    '''Identificador da base sintética (faz o papel do SHA-256 do CSV no manifesto).'''
+    conteudo = json.dumps({"gerador": VERSAO_GERADOR, "seed": gerador.seed, "n_linhas": n_linhas,
+                           "prevalencia": gerador.prevalencia, "anos": gerador.anos.tolist()},
+                          sort_keys=True)
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+
+def gerar_cache(n_linhas, caminho, gerador=None, tamanho_lote=SINAN_LOTE):
+    '''
+    Pacote colunar do dados.py (<base>.cache/), sem passar por CSV.
+
+    Cada coluna é um .npy aberto com memmap no tamanho final e preenchido
+    lote a lote. Sem o CSV ao lado, o dados.carregar_dataset usa o pacote
+    como fonte única.
+    '''
+    gerador = gerador or GeradorSinan()
+    temporario = caminho + ".tmp"
+    shutil.rmtree(temporario, ignore_errors=True)
+    os.makedirs(temporario)
+
+    colunas, arrays = [], {}
+    for i, nome in enumerate(COLUNAS):
+        arquivo = f"col_{i:03d}.npy"
+        if nome in CATEGORIAS:
+            coluna = {"nome": nome, "tipo": "categoria", "arquivo": arquivo,
+                      "categorias": CATEGORIAS[nome]}
+            dtype = _dtype_codigos(len(CATEGORIAS[nome]))
+        elif nome.startswith("DT_"):
+            coluna, dtype = {"nome": nome, "tipo": "data", "arquivo": arquivo}, np.int32
+        else:
+            coluna, dtype = {"nome": nome, "tipo": "numero", "arquivo": arquivo}, np.float64
+        colunas.append(coluna)
+        arrays[nome] = np.lib.format.open_memmap(os.path.join(temporario, arquivo), mode="w+",
+                                                 dtype=dtype, shape=(n_linhas,))
+
+    for inicio, lote in lotes(n_linhas, gerador, tamanho_lote):
+        for nome, valores in lote.items():
+            arrays[nome][inicio:inicio + len(valores)] = valores
+    for array in arrays.values():
+        array.flush()
+    del arrays
+
+    manifesto = {
+        "versao_formato": VERSAO_FORMATO,
+        "origem": {
+            "arquivo": os.path.splitext(os.path.basename(caminho))[0] + ".csv",
+            "tamanho": None,
+            "mtime_ns": None,
+            "sha256": versao_base(n_linhas, gerador),
+            "sintetico": True,
+        },
+        "n_linhas": n_linhas,
+        "colunas": colunas,
+    }
+    with open(os.path.join(temporario, "manifesto.json"), "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, indent=2, ensure_ascii=False)
+
+    shutil.rmtree(caminho, ignore_errors=True)
+    os.replace(temporario, caminho)
+    return caminho
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        sys.exit(__doc__)
+    n_linhas = ler_tamanho(sys.argv[1])
+    saida = sys.argv[2].rstrip("/")
+
+    inicio = time.perf_counter()
+    gerador = GeradorSinan()
+    print(f"Gerando {n_linhas:,} notificações (semente {gerador.seed}, "
+          f"prevalência {gerador.prevalencia:.2%}, {gerador.anos[0]}-{gerador.anos[-1]})...")
+    if saida.endswith(".cache"):
+        gerar_cache(n_linhas, saida, gerador)
+        print(f"✓ Pacote colunar: {saida}/")
+        print(f"  Para o app: CSV_DADOS={saida[:-len('.cache')]}.csv")
+    else:
+        gerar_csv(n_linhas, saida, gerador)
+        print(f"✓ CSV: {saida} ({os.path.getsize(saida) / 1e6:,.0f} MB)")
+    print(f"  {time.perf_counter() - inicio:.1f}s")
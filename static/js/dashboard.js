@@ -14,18 +14,20 @@ document.addEventListener('DOMContentLoaded', function() {
 // Load all dashboard data
 async function loadDashboardData() {
     try {
+        // Single request with every series (same shape as /api/data/filtered)
+        const response = await fetch('/api/data/dashboard');
+        const data = await response.json();
+
         // Load summary data
-        await loadSummaryCards();
+        loadSummaryCards(data.summary);
         
         // Load chart data
-        await Promise.all([
-            loadCasosPorAno(),
-            loadDistribuicaoSexo(),
-            loadCasosPorMes(),
-            loadFenomenoClimatico(),
-            loadHospitalizacaoIdade(),
-            loadRacaDistribution() // Adicionado
-        ]);
+        loadCasosPorAno(data.casosPorAno);
+        loadDistribuicaoSexo(data.distribuicaoSexo);
+        loadCasosPorMes(data.casosPorMes);
+        loadFenomenoClimatico(data.fenomenoClimatico);
+        loadHospitalizacaoIdade(data.hospitalizacaoIdade);
+        loadRacaDistribution(data.racaDistribution);
         
     } catch (error) {
         console.error('Erro ao carregar dados do dashboard:', error);
@@ -33,11 +35,8 @@ async function loadDashboardData() {
 }
 
 // Load summary cards data
-async function loadSummaryCards() {
+function loadSummaryCards(data) {
     try {
-        const response = await fetch('/api/data/summary');
-        const data = await response.json();
-        
         document.getElementById('total-casos-dash').textContent = data.total_casos.toLocaleString('pt-BR');
         document.getElementById('casos-hosp-dash').textContent = data.casos_hospitalizados.toLocaleString('pt-BR');
         document.getElementById('taxa-hosp-dash').textContent = data.taxa_hospitalizacao.toFixed(2) + '%';
@@ -49,10 +48,8 @@ async function loadSummaryCards() {
 }
 
 // Load casos por ano chart
-async function loadCasosPorAno() {
+function loadCasosPorAno(data) {
     try {
-        const response = await fetch('/api/data/casos_por_ano');
-        const data = await response.json();
         originalData.casosPorAno = data;
         
         const ctx = document.getElementById('casosPorAnoChart').getContext('2d');
@@ -114,10 +111,8 @@ function updateCasosPorAno(type) {
 }
 
 // Load distribuição por sexo chart
-async function loadDistribuicaoSexo() {
+function loadDistribuicaoSexo(data) {
     try {
-        const response = await fetch('/api/data/distribuicao_sexo');
-        const data = await response.json();
         originalData.distribuicaoSexo = data;
         
         const ctx = document.getElementById('distribuicaoSexoChart').getContext('2d');
@@ -151,10 +146,8 @@ async function loadDistribuicaoSexo() {
 }
 
 // Load casos por mês chart
-async function loadCasosPorMes() {
+function loadCasosPorMes(data) {
     try {
-        const response = await fetch('/api/data/casos_por_mes');
-        const data = await response.json();
         originalData.casosPorMes = data;
         
         const ctx = document.getElementById('casosPorMesChart').getContext('2d');
@@ -192,10 +185,8 @@ async function loadCasosPorMes() {
 }
 
 // Load fenômeno climático chart
-async function loadFenomenoClimatico() {
+function loadFenomenoClimatico(data) {
     try {
-        const response = await fetch('/api/data/fenomeno_climatico');
-        const data = await response.json();
         originalData.fenomenoClimatico = data;
         
         const ctx = document.getElementById('fenomenoClimaticoChart').getContext('2d');
@@ -230,10 +221,8 @@ async function loadFenomenoClimatico() {
 }
 
 // Load hospitalização por idade chart
-async function loadHospitalizacaoIdade() {
+function loadHospitalizacaoIdade(data) {
     try {
-        const response = await fetch('/api/data/hospitalizacao_por_idade');
-        const data = await response.json();
         originalData.hospitalizacaoIdade = data;
         
         const ctx = document.getElementById('hospitalizacaoIdadeChart').getContext('2d');
@@ -272,10 +261,8 @@ async function loadHospitalizacaoIdade() {
 }
 
 // Load distribuição por raça chart
-async function loadRacaDistribution() {
+function loadRacaDistribution(data) {
     try {
-        const response = await fetch('/api/data/distribuicao_raca');
-        const data = await response.json();
         originalData.racaDistribution = data;
         
         const ctx = document.getElementById('racaDistributionChart').getContext('2d');
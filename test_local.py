@@ -3,7 +3,8 @@
 
 import joblib
 import pandas as pd
-import numpy as np
+
+from features_modelo import montar_vetor
 
 print("="*60)
 print("TESTE LOCAL - Dashboard Dengue")
@@ -31,28 +32,10 @@ except Exception as e:
 print("\n3. Testando predição...")
 try:
     # Simular sintomas do usuário
-    febre, mialgia, cefaleia, vomito, exantema = 1, 1, 1, 1, 1
-
-    # Calcular severity
-    severity = exantema * 1 + vomito * 3 + mialgia * 1 + cefaleia * 1 + febre * 1
-
-    # Criar array com 14 features
-    X_input = np.array([[
-        2,          # DIAS_SINTOMA_NOTIFIC_TEMP
-        1,          # TRIMESTRE
-        3,          # MES
-        2,          # DIAS_SINTOMA_NOTIFIC
-        0,          # TEM_COMORBIDADE
-        2024,       # NU_ANO
-        0,          # QTD_IGNORADOS
-        severity,   # SEVERITY_SCORE
-        35,         # IDADE
-        2024,       # ANO
-        0,          # HEPATOPAT_BIN
-        0,          # COMORBIDADE_SCORE
-        0,          # DIABETES_BIN
-        0           # RENAL_BIN
-    ]])
+    paciente = {"febre": "SIM", "mialgia": "SIM", "cefaleia": "SIM", "vomito": "SIM", "exantema": "SIM"}
+
+    # Criar array com 14 features (mesmas regras do treino e da API)
+    X_input = montar_vetor(paciente).reshape(1, -1)
 
     # Fazer predição
     prob = model.predict_proba(X_input)
@@ -67,6 +50,46 @@ except Exception as e:
     traceback.print_exc()
     exit(1)
 
+# 4. Testar filtros: cubo x índice de bitmaps (base sintética, não depende do CSV real)
+print("\n4. Comparando filtros do cubo e do índice de bitmaps...")
+try:
+    import os
+    import tempfile
+
+    from cubo_agregado import CuboAgregado
+    from dados import carregar_dataset, derivar_features
+    from indice_bitmap import IndiceBitmap, filtro_do_cubo
+    from sinan_sintetico import gerar_csv
+
+    with tempfile.TemporaryDirectory() as pasta:
+        df_stats, _ = carregar_dataset(gerar_csv(50_000, os.path.join(pasta, "sinan.csv")))
+    derivadas = derivar_features(df_stats)
+    cubo = CuboAgregado(df_stats, derivadas)
+    bitmaps = IndiceBitmap(df_stats, derivadas)
+
+    # Valores simples: cubo e bitmaps devem dar o mesmo payload
+    for filtros in [{}, {"anoInicial": "2010"}, {"anoInicial": 2005, "anoFinal": 2012, "sexo": "M"},
+                    {"fenomeno": "La Niña", "sexo": "F", "anoFinal": "2003"}, {"sexo": "X"}]:
+        assert filtro_do_cubo(filtros), filtros
+        assert cubo.consultar(filtros) == bitmaps.consultar(filtros), filtros
+
+    # Listas: vão para os bitmaps e somam os casos de cada valor no cubo
+    for chave, valores in [("sexo", ["F", "M"]), ("fenomeno", ["El Niño", "Neutro"])]:
+        filtros = {chave: valores, "anoInicial": 2010}
+        assert not filtro_do_cubo(filtros), filtros
+        esperado = sum(cubo.consultar({chave: valor, "anoInicial": 2010})["summary"]["total_casos"]
+                       for valor in valores)
+        obtido = bitmaps.consultar(filtros)["summary"]["total_casos"]
+        assert obtido == esperado > 0, (filtros, obtido, esperado)
+        assert len(bitmaps.posicoes(filtros)) == obtido
+    print("   ✅ Cubo e bitmaps concordam (valores simples e listas)")
+
+except Exception as e:
+    print(f"   ❌ ERRO nos filtros: {e}")
+    import traceback
+    traceback.print_exc()
+    exit(1)
+
 print("\n" + "="*60)
 print("✅ TODOS OS TESTES PASSARAM!")
 print("="*60)
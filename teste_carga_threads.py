@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Teste de carga com threads para os endpoints de estatísticas.
+
+Verifica que os handlers são somente leitura (nenhuma coluna é criada ou
+alterada em df_stats / df_derivadas durante a carga), que todas as respostas
+concorrentes são idênticas à resposta sequencial e compara o tempo dos
+handlers atuais com o cálculo antigo, que derivava mês e faixa etária a
+cada request.
+
+Uso:
+    python teste_carga_threads.py [threads] [requests_por_thread]
+"""
+
+import sys
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+warnings.filterwarnings('ignore')
+
+import app as dashboard  # noqa: E402  (carrega dataset e modelo)
+from dados import FAIXAS_BINS, FAIXAS_LABELS, mes_de_dias  # noqa: E402
+
+N_THREADS = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+N_REQUESTS = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+ROTAS_GET = [
+    "/api/data/summary",
+    "/api/data/casos_por_ano",
+    "/api/data/casos_por_mes",
+    "/api/data/distribuicao_sexo",
+    "/api/data/fenomeno_climatico",
+    "/api/data/hospitalizacao_por_idade",
+    "/api/data/distribuicao_raca",
+]
+FILTROS = [{}, {"anoInicial": "2010"}, {"sexo": "F", "fenomeno": "La Niña"}]
+
+
+def requisitar(cliente, i):
+    '''Alterna entre as rotas GET e o /api/data/filtered.'''
+    if i % (len(ROTAS_GET) + 1) < len(ROTAS_GET):
+        rota = ROTAS_GET[i % (len(ROTAS_GET) + 1)]
+        return rota, cliente.get(rota).get_json()
+    filtros = FILTROS[i % len(FILTROS)]
+    return repr(filtros), cliente.post("/api/data/filtered", json=filtros).get_json()
+
+
+def worker(_):
+    cliente = dashboard.app.test_client()
+    return [requisitar(cliente, i) for i in range(N_REQUESTS)]
+
+
+def casos_por_mes_antigo(df):
+    '''Cálculo antigo: mês derivado das datas a cada request.'''
+    return pd.Series(mes_de_dias(df["DT_NOTIFIC"])).value_counts().sort_index()
+
+
+def hospitalizacao_por_idade_antigo(df):
+    '''Cálculo antigo: pd.cut e comparação de strings a cada request.'''
+    faixa = pd.cut(df['IDADE'], bins=FAIXAS_BINS, labels=FAIXAS_LABELS, right=False)
+    hosp = faixa[df['HOSPITALIZ'] == 'SIM'].value_counts().sort_index()
+    return hosp, faixa.value_counts().sort_index()
+
+
+def cronometrar(funcao, repeticoes=50):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao()
+    return (time.perf_counter() - inicio) / repeticoes * 1000
+
+
+print("=" * 60)
+print("TESTE DE CARGA COM THREADS - Endpoints de estatísticas")
+print("=" * 60)
+
+if dashboard.estado_dados.df_stats.empty:
+    print("   ❌ ERRO: dataset não carregado (data/df_dengue_tratado.csv)")
+    sys.exit(1)
+
+# 1. Respostas de referência (sequenciais)
+cliente = dashboard.app.test_client()
+referencia = {}
+for i in range(len(ROTAS_GET) + 1):
+    for j in range(len(FILTROS)):
+        chave, resposta = requisitar(cliente, i + j * (len(ROTAS_GET) + 1))
+        referencia[chave] = resposta
+
+estado = dashboard.estado_dados
+colunas_antes = (list(estado.df_stats.columns), list(estado.df_derivadas.columns))
+
+# 2. Carga concorrente
+print(f"\n1. {N_THREADS} threads x {N_REQUESTS} requests...")
+inicio = time.perf_counter()
+with ThreadPoolExecutor(max_workers=N_THREADS) as pool:
+    resultados = [r for lote in pool.map(worker, range(N_THREADS)) for r in lote]
+duracao = time.perf_counter() - inicio
+
+divergentes = sum(1 for chave, resposta in resultados if resposta != referencia[chave])
+colunas_depois = (list(estado.df_stats.columns), list(estado.df_derivadas.columns))
+
+print(f"   Requests: {len(resultados):,} em {duracao:.2f}s ({len(resultados) / duracao:,.0f} req/s)")
+print(f"   {'✅' if divergentes == 0 else '❌'} Respostas divergentes da referência: {divergentes}")
+print(f"   {'✅' if colunas_antes == colunas_depois else '❌'} df_stats/df_derivadas sem colunas novas")
+
+# 3. Handlers atuais vs cálculo antigo por request
+print("\n2. Tempo por request (ms): atual vs antigo")
+df = estado.df_stats
+for rota, antigo in [
+    ("/api/data/casos_por_mes", lambda: casos_por_mes_antigo(df)),
+    ("/api/data/hospitalizacao_por_idade", lambda: hospitalizacao_por_idade_antigo(df)),
+]:
+    atual = cronometrar(lambda: cliente.get(rota))
+    anterior = cronometrar(antigo)
+    print(f"   {rota:<38s} atual: {atual:6.2f} | antigo (só cálculo): {anterior:6.2f}")
+
+print("\n" + "=" * 60)
+if divergentes == 0 and colunas_antes == colunas_depois:
+    print("✅ HANDLERS SOMENTE LEITURA E CONSISTENTES SOB CONCORRÊNCIA")
+    print("=" * 60)
+else:
+    print("❌ FALHA NO TESTE DE CARGA")
+    print("=" * 60)
+    sys.exit(1)
@@ -10,6 +10,13 @@ Versão DEFINITIVA com:
 ✅ Feature selection automática
 ✅ Tunagem com Optuna
 ✅ Validação clínica
+
+O modelo treinado é publicado como nova versão no registro de modelos
+(models/registro/, ver registro_modelos.py); a API só passa a servi-lo
+depois de `python registro_modelos.py promover <versao>`.
+
+Para bases grandes (dezenas de milhões de notificações) que não cabem em
+memória, use o treino em streaming: python treino_streaming.py <csv>
 """
 
 import pandas as pd
@@ -17,204 +24,58 @@ import numpy as np
 import warnings
 warnings.filterwarnings('ignore')
 
-from sklearn.model_selection import train_test_split, StratifiedKFold, cross_val_score
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import (
     confusion_matrix, roc_auc_score, recall_score,
     precision_score, f1_score, accuracy_score
 )
 from sklearn.linear_model import LogisticRegression
-from sklearn.ensemble import RandomForestClassifier
 from sklearn.feature_selection import chi2
-from xgboost import XGBClassifier
 from catboost import CatBoostClassifier
 from imblearn.over_sampling import SMOTE
-import optuna
-import joblib
-import json
+import os
 from datetime import datetime
 
+from otimizacao import CV_REAMOSTRAGEM, OPTUNA_TRIALS, otimizar
+from importancia_features import calcular_importancias
+from features_modelo import MODEL_FEATURES
+from pipeline_treino import caminho_etapas, executar_pipeline
+from registro_modelos import REGISTRO_MODELOS, registrar
+
 # Configurações
 RANDOM_STATE = 42
 np.random.seed(RANDOM_STATE)
+CSV_TREINO = os.getenv("CSV_TREINO", "df_dengue_tratado.csv")
+# "todas" (colunas numéricas) ou "modelo" (as 14 MODEL_FEATURES servidas pela API)
+FEATURES_TREINO = os.getenv("FEATURES_TREINO", "todas")
 
 print("="*80)
 print("🦟 MODELO FINAL: Predição de Hospitalização por Dengue")
 print("="*80)
 
 # ==============================================================================
-# 1. CARREGAMENTO E LIMPEZA
-# ==============================================================================
-
-print("\n📊 1. CARREGAMENTO E LIMPEZA DE DADOS")
-print("-"*80)
-
-df = pd.read_csv('df_dengue_tratado.csv')
-print(f"Dataset original: {len(df):,} registros")
-
-# Remover IGNORADO em HOSPITALIZ
-df = df[df['HOSPITALIZ'].isin(['SIM', 'NÃO'])].copy()
-print(f"Após remover IGNORADO: {len(df):,} registros")
-
-# ==============================================================================
-# 2. REMOÇÃO DE OUTLIERS
-# ==============================================================================
-
-print("\n🧹 2. REMOÇÃO DE OUTLIERS")
-print("-"*80)
-
-# 2.1 Outliers de IDADE
-antes = len(df)
-df = df[(df['IDADE'] >= 0) & (df['IDADE'] <= 120)]
-print(f"Idade > 120: removidos {antes - len(df)} registros")
-
-# 2.2 Outliers temporais
-df['DT_NOTIFIC'] = pd.to_datetime(df['DT_NOTIFIC'], errors='coerce')
-df['DT_SIN_PRI'] = pd.to_datetime(df['DT_SIN_PRI'], errors='coerce')
-df['DIAS_SINTOMA_NOTIFIC'] = (df['DT_NOTIFIC'] - df['DT_SIN_PRI']).dt.days
-df['DIAS_SINTOMA_NOTIFIC'].fillna(0, inplace=True)
-
-antes = len(df)
-df = df[(df['DIAS_SINTOMA_NOTIFIC'] >= 0) & (df['DIAS_SINTOMA_NOTIFIC'] <= 30)]
-print(f"Dias > 30: removidos {antes - len(df)} registros")
-
-print(f"\n✅ Dataset após remoção de outliers: {len(df):,} registros")
-
-# ==============================================================================
-# 3. FILTRAR POR QUALIDADE DE DADOS (remover muitos IGNORADO)
-# ==============================================================================
-
-print("\n🔍 3. FILTRO DE QUALIDADE DE DADOS")
-print("-"*80)
-
-# Contar IGNORADOs
-sintomas_principais = ['FEBRE', 'MIALGIA', 'CEFALEIA', 'VOMITO', 'EXANTEMA']
-df['QTD_IGNORADOS'] = 0
-for sint in sintomas_principais:
-    if sint in df.columns:
-        df['QTD_IGNORADOS'] += (df[sint] == 'IGNORADO').astype(int)
-
-antes = len(df)
-df = df[df['QTD_IGNORADOS'] < 3]  # Manter apenas casos com <= 2 sintomas IGNORADO
-print(f"Removidos {antes - len(df)} casos com ≥ 3 sintomas IGNORADO")
-print(f"✅ Dataset final: {len(df):,} registros")
-
-# ==============================================================================
-# 4. FEATURE ENGINEERING COMPLETO
+# 1-6. CARREGAMENTO, LIMPEZA, FEATURES E SPLIT (pipeline com cache por etapa)
 # ==============================================================================
 
-print("\n🔧 4. FEATURE ENGINEERING")
-print("-"*80)
-
-# 4.1 Features temporais
-df['MES'] = df['DT_NOTIFIC'].dt.month
-df['ANO'] = df['DT_NOTIFIC'].dt.year
-df['TRIMESTRE'] = df['DT_NOTIFIC'].dt.quarter
-
-# 4.2 Features clínicas (binárias)
-clinical_features = [
-    'FEBRE', 'MIALGIA', 'CEFALEIA', 'VOMITO', 'EXANTEMA',
-    'PETEQUIA_N', 'DIABETES', 'HEMATOLOG', 'HEPATOPAT', 'RENAL'
-]
-
-for feature in clinical_features:
-    if feature in df.columns:
-        df[f'{feature}_BIN'] = (df[feature] == 'SIM').astype(int)
-
-# 4.3 Features demográficas
-df['SEXO_BIN'] = (df['CS_SEXO'] == 'M').astype(int)
-df['IDADE'].fillna(df['IDADE'].median(), inplace=True)
-
-# Raça (one-hot)
-raca_dummies = pd.get_dummies(df['CS_RACA'], prefix='RACA', drop_first=True)
-df = pd.concat([df, raca_dummies], axis=1)
-
-# 4.4 Features climáticas
-if 'FENOMENO' in df.columns:
-    fenomeno_dummies = pd.get_dummies(df['FENOMENO'], prefix='FENOMENO', drop_first=True)
-    df = pd.concat([df, fenomeno_dummies], axis=1)
-
-if 'INTENS_FENOM' in df.columns:
-    intens_dummies = pd.get_dummies(df['INTENS_FENOM'], prefix='INTENS', drop_first=True)
-    df = pd.concat([df, intens_dummies], axis=1)
-
-# 4.5 ⭐ SEVERITY_SCORE (pesos clínicos baseados em OMS)
-df['SEVERITY_SCORE'] = (
-    df.get('PETEQUIA_N_BIN', 0) * 5 +      # Sangramento = muito grave
-    df.get('VOMITO_BIN', 0) * 3 +          # Vômito = grave
-    df.get('HEPATOPAT_BIN', 0) * 3 +       # Hepatopatia = grave
-    df.get('HEMATOLOG_BIN', 0) * 3 +       # Hematológico = grave
-    df.get('RENAL_BIN', 0) * 3 +           # Renal = grave
-    df.get('DIABETES_BIN', 0) * 2 +        # Diabetes = moderado
-    df.get('EXANTEMA_BIN', 0) * 1 +        # Erupção = leve
-    df.get('MIALGIA_BIN', 0) * 1 +         # Mialgia = leve
-    df.get('CEFALEIA_BIN', 0) * 1          # Cefaleia = leve
-)
-
-# 4.6 Scores de sintomas e comorbidades
-sintomas = ['FEBRE_BIN', 'MIALGIA_BIN', 'CEFALEIA_BIN', 'VOMITO_BIN', 'EXANTEMA_BIN']
-df['SINTOMAS_SCORE'] = sum(df.get(s, 0) for s in sintomas)
-
-comorbidades = ['DIABETES_BIN', 'HEMATOLOG_BIN', 'HEPATOPAT_BIN', 'RENAL_BIN']
-df['COMORBIDADE_SCORE'] = sum(df.get(c, 0) for c in comorbidades)
-df['TEM_COMORBIDADE'] = (df['COMORBIDADE_SCORE'] > 0).astype(int)
-
-# 4.7 Faixas etárias (grupos de risco)
-df['IDADE_FAIXA'] = pd.cut(
-    df['IDADE'],
-    bins=[0, 5, 18, 60, 120],
-    labels=['Criança', 'Adolescente', 'Adulto', 'Idoso']
-)
-faixa_dummies = pd.get_dummies(df['IDADE_FAIXA'], prefix='FAIXA', drop_first=True)
-df = pd.concat([df, faixa_dummies], axis=1)
-
-# 4.8 Target
-df['HOSPITALIZ_BIN'] = (df['HOSPITALIZ'] == 'SIM').astype(int)
-
-print("✅ Feature Engineering completo!")
+# Etapas em pipeline_treino.py; a saída de cada uma fica em cache no disco e só
+# é recalculada quando o CSV, o código da etapa ou os parâmetros mudam
+dados = executar_pipeline(CSV_TREINO, params={
+    "features": {"colunas": FEATURES_TREINO},
+    "split": {"test_size": 0.2, "random_state": RANDOM_STATE},
+})
 
-# ==============================================================================
-# 5. SELEÇÃO DE FEATURES
-# ==============================================================================
+df = dados["df"]
+feature_cols = dados["feature_cols"]
+X, y = dados["X"], dados["y"]
+X_train, X_test = dados["X_train"], dados["X_test"]
+y_train, y_test = dados["y_train"], dados["y_test"]
 
-print("\n📋 5. SELEÇÃO DE FEATURES")
+print("\n📋 DADOS PREPARADOS")
 print("-"*80)
-
-# Excluir colunas não numéricas e target
-exclude_cols = [
-    'HOSPITALIZ', 'HOSPITALIZ_BIN', 'DT_NOTIFIC', 'DT_SIN_PRI',
-    'CS_SEXO', 'CS_RACA', 'FENOMENO', 'INTENS_FENOM', 'IDADE_FAIXA',
-    'FEBRE', 'MIALGIA', 'CEFALEIA', 'VOMITO', 'EXANTEMA',
-    'PETEQUIA_N', 'DIABETES', 'HEMATOLOG', 'HEPATOPAT', 'RENAL',
-    'MUNICÍPIO', 'ESTADO', 'CS_GESTANT', 'RESUL_SORO', 'RESUL_NS1',
-    'RESUL_VI_N', 'SOROTIPO', 'IMUNOH_N', 'CLASSI_FIN', 'CRITERIO',
-    'TPAUTOCTO', 'EVOLUCAO', 'QTD_IGNORADOS'
-]
-
-all_numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-feature_cols = [col for col in all_numeric_cols
-                if col not in exclude_cols and col != 'HOSPITALIZ_BIN']
-
-# Preparar X e y
-X = df[feature_cols].copy()
-y = df['HOSPITALIZ_BIN'].copy()
-X.fillna(0, inplace=True)
-
 print(f"Features disponíveis: {len(feature_cols)}")
 print(f"Dataset shape: {X.shape}")
 print(f"Hospitalização: {y.sum()} SIM ({y.sum()/len(y)*100:.2f}%)")
 
-# ==============================================================================
-# 6. TRAIN/TEST SPLIT
-# ==============================================================================
-
-print("\n🔀 6. TRAIN/TEST SPLIT (80/20)")
-print("-"*80)
-
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=RANDOM_STATE, stratify=y
-)
-
 # Normalização
 scaler = StandardScaler()
 X_train_scaled = scaler.fit_transform(X_train)
@@ -235,37 +96,11 @@ print(f"Balanced: {X_train_balanced.shape}")
 print("\n📊 7. FEATURE IMPORTANCE (Modelos Baseline)")
 print("-"*80)
 
-baseline_models = {
-    'Logistic Regression': LogisticRegression(random_state=RANDOM_STATE, max_iter=1000),
-    'Random Forest': RandomForestClassifier(n_estimators=100, random_state=RANDOM_STATE),
-    'XGBoost': XGBClassifier(n_estimators=100, random_state=RANDOM_STATE, eval_metric='logloss')
-}
-
-feature_importances = {}
-
-for name, model in baseline_models.items():
-    model.fit(X_train_balanced, y_train_balanced)
-
-    if name == 'Logistic Regression':
-        importance = np.abs(model.coef_[0])
-    else:
-        importance = model.feature_importances_
-
-    feature_importances[name] = pd.DataFrame({
-        'feature': feature_cols,
-        'importance': importance
-    }).sort_values('importance', ascending=False)
-
-# Consolidar
-consolidated = pd.DataFrame({'feature': feature_cols})
-for name, imp_df in feature_importances.items():
-    max_imp = imp_df['importance'].max()
-    normalized = imp_df['importance'] / max_imp if max_imp > 0 else imp_df['importance']
-    imp_dict = dict(zip(imp_df['feature'], normalized))
-    consolidated[name] = consolidated['feature'].map(imp_dict)
-
-consolidated['mean_importance'] = consolidated[list(feature_importances.keys())].mean(axis=1)
-consolidated = consolidated.sort_values('mean_importance', ascending=False)
+# LR, RF e XGBoost em paralelo (um processo cada, threads divididas entre
+# eles); a tabela fica salva e é reaproveitada se a matriz não mudou
+consolidated = calcular_importancias(X_train_balanced, y_train_balanced, feature_cols,
+                                     pasta=caminho_etapas(CSV_TREINO),
+                                     random_state=RANDOM_STATE)
 
 print("\n🏆 TOP 15 FEATURES:")
 for i, row in consolidated.head(15).iterrows():
@@ -275,27 +110,22 @@ for i, row in consolidated.head(15).iterrows():
 # 8. TUNAGEM COM OPTUNA (Regressão Logística)
 # ==============================================================================
 
-print("\n🎯 8. TUNAGEM COM OPTUNA (50 trials)")
+print(f"\n🎯 8. TUNAGEM COM OPTUNA ({OPTUNA_TRIALS} trials)")
 print("-"*80)
 
-def objective(trial):
-    params = {
-        'C': trial.suggest_float('C', 0.001, 100.0, log=True),
-        'penalty': trial.suggest_categorical('penalty', ['l1', 'l2']),
-        'solver': 'saga',
-        'max_iter': 2000,
-        'random_state': RANDOM_STATE,
-        'class_weight': trial.suggest_categorical('class_weight', ['balanced', None])
-    }
-
-    model = LogisticRegression(**params)
-    cv = StratifiedKFold(n_splits=5, shuffle=True, random_state=RANDOM_STATE)
-    scores = cross_val_score(model, X_train_balanced, y_train_balanced,
-                             cv=cv, scoring='recall', n_jobs=-1)
-    return scores.mean()
-
-study = optuna.create_study(direction='maximize')
-study.optimize(objective, n_trials=50, show_progress_bar=False)
+# Estudo persistente (SQLite), paralelo e com poda por fold: ver otimizacao.py.
+# O nome amarra o estudo aos dados de treino, então ele só é retomado se o
+# pipeline produziu exatamente o mesmo split
+if CV_REAMOSTRAGEM == "global":
+    # Modo antigo: CV sobre o treino já balanceado (SMOTE antes dos folds)
+    study = otimizar(X_train_balanced, y_train_balanced,
+                     nome=f"logreg_recall_global_{dados['chave'][:12]}",
+                     random_state=RANDOM_STATE, reamostrar=False)
+else:
+    # Scaler + SMOTE ajustados dentro de cada fold, sem vazamento para a validação
+    study = otimizar(X_train, y_train,
+                     nome=f"logreg_recall_fold_{dados['chave'][:12]}",
+                     random_state=RANDOM_STATE, reamostrar=True)
 
 print(f"✅ Melhor Recall (CV): {study.best_value:.4f}")
 print(f"\n🔧 Melhores hiperparâmetros:")
@@ -371,24 +201,19 @@ print(f"""
 print("\n💾 11. SALVANDO ARTEFATOS")
 print("-"*80)
 
-joblib.dump(modelo_final, 'modelo_final_v2.pkl')
-joblib.dump(scaler, 'scaler_v2.pkl')
-
-with open('features_v2.txt', 'w') as f:
-    for feat in feature_cols:
-        f.write(f"{feat}\n")
-
+# Versão nova no registro (models/registro/<versao>/); a promoção é explícita
 config = {
+    'modelo': 'Logistic Regression (Optuna)',
     'dataset': {
+        'arquivo': os.path.basename(CSV_TREINO),
         'registros_original': int(len(df)),
         'registros_treino': int(len(X_train)),
         'registros_teste': int(len(X_test)),
         'taxa_hospitalizacao': float(y.sum() / len(y))
     },
-    'features': {
-        'total': len(feature_cols),
-        'top_5': consolidated.head(5)['feature'].tolist()
-    },
+    'features_total': len(feature_cols),
+    'features': list(feature_cols),
+    'top_5': consolidated.head(5)['feature'].tolist(),
     'hiperparametros': study.best_params,
     'metricas': {
         'accuracy': float(accuracy),
@@ -401,17 +226,23 @@ config = {
         'fn': int(fn),
         'fp': int(fp)
     },
-    'data_treinamento': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    # O modelo foi treinado sobre as features normalizadas pelo scaler
+    'aplicar_scaler': True,
+    'pipeline': dados['chave'],
+    'data_treinamento': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+    'random_state': RANDOM_STATE
 }
 
-with open('config_v2.json', 'w') as f:
-    json.dump(config, f, indent=4)
+versao = registrar(modelo_final, config, scaler=scaler)
 
-print("✅ Artefatos salvos:")
-print("   - modelo_final_v2.pkl")
-print("   - scaler_v2.pkl")
-print("   - features_v2.txt")
-print("   - config_v2.json")
+print(f"✅ Versão registrada: {REGISTRO_MODELOS}/{versao}/")
+print("   - modelo.pkl, scaler.pkl, config_modelo.json")
+if list(feature_cols) == MODEL_FEATURES:
+    print(f"   Comparar em produção:  python registro_modelos.py sombra {versao}")
+    print(f"   Promover:              python registro_modelos.py promover {versao}")
+else:
+    print(f"   ⚠️  {len(feature_cols)} features: a API só serve versões treinadas nas 14 "
+          f"MODEL_FEATURES (FEATURES_TREINO=modelo)")
 
 print("\n" + "="*80)
 print("✅ TREINAMENTO CONCLUÍDO COM SUCESSO!")
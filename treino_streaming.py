@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Treino em streaming para bases grandes do SINAN (vários anos e municípios).
+
+treinar_modelo_final.py carrega o CSV inteiro e faz várias cópias com
+get_dummies/concat; para dezenas de milhões de notificações isso não cabe
+em memória. Aqui o CSV é lido em lotes (TAMANHO_LOTE linhas) e cada lote
+passa pela mesma limpeza (pipeline_treino) e pelas mesmas features
+(features_modelo) do treino normal. O pico de memória depende só do
+tamanho do lote, não do tamanho do arquivo.
+
+Passadas sobre o arquivo:
+1. StandardScaler.partial_fit e contagem das classes (pesos balanceados,
+   no lugar do SMOTE, que precisaria da base inteira em memória)
+2. EPOCAS passadas de SGDClassifier(loss='log_loss').partial_fit
+3. Avaliação no holdout: confusion matrix e AUC por histograma
+
+O holdout (FRACAO_TESTE) é escolhido por hash da posição da linha no
+arquivo, então é o mesmo em todas as passadas sem guardar índices.
+O modelo é publicado como nova versão no registro (registro_modelos.py);
+com FEATURES_STREAMING=modelo ele pode ser servido pela API.
+Categóricas viram one-hot com um vocabulário fixo (VOCABULARIO), então
+todos os lotes têm as mesmas colunas mesmo que um valor não apareça.
+
+Uso:
+    python treino_streaming.py [caminho_csv]
+
+Variáveis de ambiente:
+    TAMANHO_LOTE        linhas por lote (padrão 200000)
+    EPOCAS              passadas de treino (padrão 3)
+    FRACAO_TESTE        fração do holdout (padrão 0.2)
+    FEATURES_STREAMING  completo (14 features + one-hot, padrão) ou
+                        modelo (só as 14 MODEL_FEATURES servidas pela API)
+"""
+
+import os
+import resource
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import SGDClassifier
+from sklearn.preprocessing import StandardScaler
+
+from features_modelo import CAMPOS_BINARIOS, MODEL_FEATURES, montar_matriz
+from pipeline_treino import filtrar_ignorados, remover_outliers
+from registro_modelos import REGISTRO_MODELOS, registrar
+
+RANDOM_STATE = 42
+TAMANHO_LOTE = int(os.getenv("TAMANHO_LOTE", "200000"))
+EPOCAS = int(os.getenv("EPOCAS", "3"))
+FRACAO_TESTE = float(os.getenv("FRACAO_TESTE", "0.2"))
+FEATURES_STREAMING = os.getenv("FEATURES_STREAMING", "completo")
+
+# Vocabulário fixo das categóricas (valores fora dele ficam com o one-hot zerado)
+VOCABULARIO = {
+    'CS_SEXO': ['F', 'M', 'I'],
+    'CS_RACA': ['AMARELA', 'BRANCA', 'IGNORADO', 'INDÍGENA', 'PARDA', 'PRETA'],
+    'FENOMENO': ['El Niño', 'La Niña', 'Neutro'],
+    'INTENS_FENOM': ['FORTE', 'FRACA', 'MODERADA', 'MUITO FORTE', 'NEUTRA'],
+}
+
+COLUNAS_LEITURA = ['DT_NOTIFIC', 'DT_SIN_PRI', 'IDADE', 'HOSPITALIZ',
+                   *CAMPOS_BINARIOS, *VOCABULARIO]
+
+# Bins do histograma de probabilidades usado na AUC do holdout
+N_BINS_AUC = 1000
+
+
+def colunas_features(modo=FEATURES_STREAMING):
+    if modo == "modelo":
+        return list(MODEL_FEATURES)
+    return list(MODEL_FEATURES) + [f"{campo}_{valor}" for campo, valores in VOCABULARIO.items()
+                                   for valor in valores]
+
+
+def ler_lotes(csv_path, tamanho_lote=TAMANHO_LOTE):
+    '''Lê o CSV em lotes; o índice de cada lote é a posição global da linha.'''
+    categoricas = {c: 'category' for c in ['HOSPITALIZ', *CAMPOS_BINARIOS, *VOCABULARIO]}
+    inicio = 0
+    for lote in pd.read_csv(csv_path, chunksize=tamanho_lote, dtype=categoricas,
+                            usecols=lambda c: c in COLUNAS_LEITURA):
+        lote.index = pd.RangeIndex(inicio, inicio + len(lote))
+        inicio += len(lote)
+        yield lote
+
+
+def one_hot(serie, vocabulario):
+    '''One-hot com colunas fixas, na ordem de `vocabulario`.'''
+    codigos = pd.Categorical(serie, categories=vocabulario).codes
+    matriz = np.zeros((len(serie), len(vocabulario)), dtype=np.float32)
+    linhas = np.flatnonzero(codigos >= 0)
+    matriz[linhas, codigos[linhas]] = 1
+    return matriz
+
+
+def eh_teste(posicoes, fracao=FRACAO_TESTE):
+    '''Holdout determinístico: hash multiplicativo da posição da linha no arquivo.'''
+    h = (posicoes.astype(np.uint64) * np.uint64(2654435761)) % np.uint64(2 ** 32)
+    return h < np.uint64(int(fracao * 2 ** 32))
+
+
+def preparar_lote(lote, modo=FEATURES_STREAMING):
+    '''Limpeza e features de um lote: retorna (X float32, y int8, máscara de teste).'''
+    lote = lote[lote['HOSPITALIZ'].isin(['SIM', 'NÃO'])]
+    lote = filtrar_ignorados(remover_outliers(lote))
+
+    partes = [montar_matriz(lote).astype(np.float32)]
+    if modo != "modelo":
+        for campo, vocabulario in VOCABULARIO.items():
+            if campo in lote.columns:
+                partes.append(one_hot(lote[campo], vocabulario))
+            else:
+                partes.append(np.zeros((len(lote), len(vocabulario)), dtype=np.float32))
+    X = np.hstack(partes)
+    y = (lote['HOSPITALIZ'] == 'SIM').to_numpy(dtype=np.int8)
+    return X, y, eh_teste(lote.index.to_numpy())
+
+
+def auc_histograma(hist_pos, hist_neg):
+    '''AUC a partir de histogramas de probabilidade por classe (empates contam meio).'''
+    n_pos, n_neg = hist_pos.sum(), hist_neg.sum()
+    if n_pos == 0 or n_neg == 0:
+        return float('nan')
+    negativos_abaixo = np.cumsum(hist_neg) - hist_neg
+    return float((hist_pos * (negativos_abaixo + 0.5 * hist_neg)).sum() / (n_pos * n_neg))
+
+
+def memoria_pico_mb():
+    '''Pico de memória residente do processo (ru_maxrss, em KB no Linux).'''
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def treinar(csv_path, modo=FEATURES_STREAMING, epocas=EPOCAS, tamanho_lote=TAMANHO_LOTE):
+    '''Treina o modelo em streaming e retorna (modelo, scaler, features, métricas).'''
+    features = colunas_features(modo)
+
+    # Passada 1: escala e contagem de classes (só linhas de treino)
+    print("\n📏 Passada 1: StandardScaler.partial_fit e contagem de classes")
+    scaler = StandardScaler()
+    contagem = np.zeros(2, dtype=np.int64)
+    lidas = 0
+    for lote in ler_lotes(csv_path, tamanho_lote):
+        lidas += len(lote)
+        X, y, teste = preparar_lote(lote, modo)
+        if (~teste).any():
+            scaler.partial_fit(X[~teste])
+            contagem += np.bincount(y[~teste], minlength=2)
+    if contagem.min() == 0:
+        raise ValueError("O treino precisa de casos hospitalizados e não hospitalizados")
+    # Pesos balanceados: n / (2 * n_classe), como class_weight='balanced'
+    pesos_classe = contagem.sum() / (2 * contagem)
+    print(f"   {lidas:,} linhas lidas | treino: {contagem[1]:,} SIM, {contagem[0]:,} NÃO")
+
+    # Passadas 2..: SGD incremental
+    model = SGDClassifier(loss='log_loss', penalty='l2', alpha=1e-4, random_state=RANDOM_STATE)
+    rng = np.random.default_rng(RANDOM_STATE)
+    for epoca in range(1, epocas + 1):
+        inicio = time.perf_counter()
+        for lote in ler_lotes(csv_path, tamanho_lote):
+            X, y, teste = preparar_lote(lote, modo)
+            X, y = X[~teste], y[~teste]
+            if len(y) == 0:
+                continue
+            ordem = rng.permutation(len(y))
+            model.partial_fit(scaler.transform(X[ordem]), y[ordem], classes=[0, 1],
+                              sample_weight=pesos_classe[y[ordem]])
+        print(f"🔁 Época {epoca}/{epocas}: {time.perf_counter() - inicio:.1f}s")
+
+    # Avaliação no holdout
+    print("\n📊 Avaliação no holdout")
+    confusao = np.zeros((2, 2), dtype=np.int64)
+    hist = np.zeros((2, N_BINS_AUC), dtype=np.int64)
+    for lote in ler_lotes(csv_path, tamanho_lote):
+        X, y, teste = preparar_lote(lote, modo)
+        X, y = X[teste], y[teste]
+        if len(y) == 0:
+            continue
+        proba = model.predict_proba(scaler.transform(X))[:, 1]
+        pred = (proba >= 0.5).astype(np.int8)
+        np.add.at(confusao, (y, pred), 1)
+        bins = np.minimum((proba * N_BINS_AUC).astype(int), N_BINS_AUC - 1)
+        for classe in (0, 1):
+            hist[classe] += np.bincount(bins[y == classe], minlength=N_BINS_AUC)
+
+    (tn, fp), (fn, tp) = confusao
+    metricas = {
+        'sensitivity': float(tp / (tp + fn)) if (tp + fn) > 0 else 0.0,
+        'specificity': float(tn / (tn + fp)) if (tn + fp) > 0 else 0.0,
+        'auc': auc_histograma(hist[1], hist[0]),
+        'tn': int(tn), 'fp': int(fp), 'fn': int(fn), 'tp': int(tp),
+        'registros_lidos': int(lidas),
+        'memoria_pico_mb': round(memoria_pico_mb(), 1),
+    }
+    return model, scaler, features, metricas
+
+
+if __name__ == "__main__":
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else "df_dengue_tratado.csv"
+
+    print("=" * 80)
+    print("🦟 TREINO EM STREAMING: Predição de Hospitalização por Dengue")
+    print("=" * 80)
+    print(f"Arquivo: {csv_path} | lote: {TAMANHO_LOTE:,} linhas | épocas: {EPOCAS} | "
+          f"features: {FEATURES_STREAMING}")
+
+    inicio = time.perf_counter()
+    model, scaler, features, metricas = treinar(csv_path)
+
+    print(f"""
+   Sensitivity: {metricas['sensitivity']:.4f}
+   Specificity: {metricas['specificity']:.4f}
+   ROC-AUC:     {metricas['auc']:.4f}
+   TN: {metricas['tn']:>8}  |  FP: {metricas['fp']:>8}
+   FN: {metricas['fn']:>8}  |  TP: {metricas['tp']:>8}
+
+   Tempo total: {time.perf_counter() - inicio:.1f}s | pico de memória: {metricas['memoria_pico_mb']:.0f} MB
+""")
+
+    versao = registrar(model, {
+        'modelo': "SGDClassifier log_loss (streaming)",
+        'dataset': {'arquivo': os.path.basename(csv_path), 'registros_lidos': metricas['registros_lidos']},
+        'features_total': len(features),
+        'features': features,
+        'metricas': metricas,
+        'tamanho_lote': TAMANHO_LOTE,
+        'epocas': EPOCAS,
+        'aplicar_scaler': True,
+        'data_treinamento': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'random_state': RANDOM_STATE,
+    }, scaler=scaler)
+
+    print(f"💾 Versão registrada: {REGISTRO_MODELOS}/{versao}/ (modelo.pkl, scaler.pkl, config_modelo.json)")
+    if features == MODEL_FEATURES:
+        print(f"   Comparar em produção: python registro_modelos.py sombra {versao}")